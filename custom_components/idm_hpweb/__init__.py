@@ -6,19 +6,42 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant
 from homeassistant.const import CONF_HOST, CONF_PIN, CONF_TIMEOUT
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.typing import ConfigType
 from .const import (
+    DOMAIN,
     CONF_DISPLAY_NAME,
     CONF_CYCLE_TIME,
     CONF_STAT_DIV,
     CONF_CLK_SET,
     CONF_CLK_HOUR,
     CONF_CLK_HOUR_DEFAULT,
+    CONF_RECORD,
+    CONF_FAST_CYCLE_TIME,
+    CONF_FAST_KEYS,
+    DEF_FAST_KEYS,
+    CONF_AGGR_WINDOW,
+    CONF_AGGR_CLASSES,
+    DEF_AGGR_CLASSES,
+    CONF_TIMESERIES_DAYS,
+    CONF_ANOMALY_SIGMA,
     DEF_TIME_BETWEEN_UPDATES,
     DEF_IDM_PIN,
 )
+from .services import async_setup_services
+from .websocket_api import async_setup_websocket
 
 _PLATFORMS: list[Platform] = [Platform.SENSOR]
 
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the iDM Heatpump Web services and websocket commands."""
+    async_setup_services(hass)
+    async_setup_websocket(hass)
+    return True
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up iDM Heatpump Web from a config entry."""
@@ -39,6 +62,13 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     clk_set_hour = entry.data.get(
         CONF_CLK_HOUR, CONF_CLK_HOUR_DEFAULT
     )  # if not yet defined work with default at 2 o clock in the morning
+    record = entry.data.get(CONF_RECORD, 0)  # opt-in, recording is disabled by default
+    fast_cycle_time = entry.data.get(CONF_FAST_CYCLE_TIME, 0)  # 0 = single lane
+    fast_keys = entry.data.get(CONF_FAST_KEYS, DEF_FAST_KEYS)
+    aggr_window = entry.data.get(CONF_AGGR_WINDOW, 0)  # 0 = every value is written
+    aggr_classes = entry.data.get(CONF_AGGR_CLASSES, DEF_AGGR_CLASSES)
+    timeseries_days = entry.data.get(CONF_TIMESERIES_DAYS, 0)  # 0 = disabled
+    anomaly_sigma = entry.data.get(CONF_ANOMALY_SIGMA, 0)  # 0 = disabled
 
     entry.runtime_data = {
         CONF_DISPLAY_NAME: displayname,
@@ -49,6 +79,13 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         CONF_STAT_DIV: stat_div,
         CONF_CLK_SET: clk_set,
         CONF_CLK_HOUR: clk_set_hour,
+        CONF_RECORD: record,
+        CONF_FAST_CYCLE_TIME: fast_cycle_time,
+        CONF_FAST_KEYS: fast_keys,
+        CONF_AGGR_WINDOW: aggr_window,
+        CONF_AGGR_CLASSES: aggr_classes,
+        CONF_TIMESERIES_DAYS: timeseries_days,
+        CONF_ANOMALY_SIGMA: anomaly_sigma,
     }
 
     await hass.config_entries.async_forward_entry_setups(entry, _PLATFORMS)
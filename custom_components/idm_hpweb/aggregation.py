@@ -0,0 +1,85 @@
+# Windowed aggregation of high rate samples, one state per window is written to HA
+
+AGGR_MEAN = "mean"
+AGGR_MIN = "min"
+AGGR_MAX = "max"
+AGGR_LAST = "last"
+AGGR_MODES = (AGGR_MEAN, AGGR_MIN, AGGR_MAX, AGGR_LAST)
+
+idmAggrPrecision = 3  # digits of the mean value
+
+
+class IdmWindow:
+    """Condense the samples of one sensor to mean, min, max and last over a time window.
+
+    The value selected by mode becomes the state, min, max, last and the number of
+    samples are provided as attributes. The first sample is passed on directly, so a
+    new entity does not wait a whole window for its first state.
+    """
+
+    def __init__(self, window: float, mode: str = AGGR_MEAN) -> None:
+        """Initialize the window, length in seconds."""
+        self.window = window
+        self.mode = mode
+        self.started = False  # first sample passed on
+        self._reset(0.0)
+
+    def _reset(self, now: float) -> None:
+        """Start a new window."""
+        self.start = now
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self.last = None
+
+    # value = received typed value, now = monotonic time of the sample
+    # return None while the window is open, else (state, attributes) for the entity
+    def add(self, value, now: float) -> tuple | None:
+        """Add one sample, return the aggregated state if the window is complete."""
+        if not isinstance(value, (int, float)):
+            return (value, None)  # no number (e.g. states), not aggregated
+        if self.count == 0:
+            self.start = now
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.last = value
+        if self.started and (now - self.start) < self.window:
+            return None
+        self.started = True
+        return self.result(now)
+
+    def result(self, now: float) -> tuple:
+        """Return (state, attributes) of the current window and start a new one."""
+        values = {
+            AGGR_MEAN: round(self.sum / self.count, idmAggrPrecision),
+            AGGR_MIN: self.min,
+            AGGR_MAX: self.max,
+            AGGR_LAST: self.last,
+        }
+        attributes = {
+            AGGR_MIN: self.min,
+            AGGR_MAX: self.max,
+            AGGR_LAST: self.last,
+            "samples": self.count,
+        }
+        self._reset(now)
+        return (values[self.mode], attributes)
+
+
+# text = comma separated list of <device class>[:<mode>], e.g. "temperature:mean,power:max"
+# return dict device class -> mode, raise ValueError if text is wrong
+def parseAggregationClasses(text: str) -> dict[str, str]:
+    classes = {}
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        (deviceClass, _, mode) = item.partition(":")
+        mode = mode.strip() or AGGR_MEAN
+        if mode not in AGGR_MODES:
+            raise ValueError("unknown aggregation " + mode)
+        classes[deviceClass.strip()] = mode
+    return classes
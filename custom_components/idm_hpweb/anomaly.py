@@ -0,0 +1,205 @@
+# Online anomaly detection on the refrigerant circuit values, EWMA statistics per signal
+
+import math
+import time
+import logging
+
+from homeassistant.core import HomeAssistant, callback
+from .idmHeatpumpWeb import IdmResponseData, IdmState, IDM_INVALID
+
+_LOGGER = logging.getLogger(__name__)
+
+# key -> (minimum standard deviation, maximum change per minute or None), in sensor units
+idmAnomalySignals = {
+    "B78": (0.2, 3.0),  # evaporator pressure, bar
+    "B86": (0.3, 5.0),  # condenser pressure, bar
+    "B78v": (1.0, 10.0),  # evaporation temperature, °C
+    "B86v": (1.0, 10.0),  # condensing temperature, °C
+    "B71": (2.0, 15.0),  # hot gas temperature, °C
+    "super_heating_1": (0.5, 5.0),  # K
+    "sub_cooling": (0.5, 5.0),  # K
+    "valve_position": (2.0, None),  # %, valves move fast by design
+    "valve_pos_sub_cool": (2.0, None),
+    "valve_pos_evdmini": (2.0, None),
+}
+
+idmAnomalyTau = 600.0  # seconds, time constant of the EWMA mean and variance
+idmAnomalyWarmup = 30  # samples of a signal before it is checked
+idmAnomalySettle = 300.0  # seconds after a compressor start till the circuit is stable
+idmAnomalyRateTau = 60.0  # seconds, smoothing of the value for the change rate
+idmAnomalyMaxDt = 120.0  # seconds, above this no change rate is calculated
+
+ANOMALY_DEVIATION = "deviation"
+ANOMALY_RATE = "rate"
+
+
+class IdmSignalStats:
+    """EWMA mean and variance, smoothed value and anomaly state of one signal."""
+
+    __slots__ = ("mean", "var", "count", "level", "lastTs", "active")
+
+    def __init__(self) -> None:
+        """Initialize without samples."""
+        self.mean = 0.0
+        self.var = 0.0
+        self.count = 0
+        self.level = None  # smoothed value, None = no change rate with the next sample
+        self.lastTs = 0.0
+        self.active = None  # reason of an active anomaly
+
+    def smoothed(self, value: float, now: float) -> float | None:
+        """Return the short term smoothed value with this sample, None after a pause."""
+        dt = now - self.lastTs
+        if self.level is None or not 0 < dt <= idmAnomalyMaxDt:
+            return None
+        return self.level + (1.0 - math.exp(-dt / idmAnomalyRateTau)) * (
+            value - self.level
+        )
+
+    def update(self, value: float, now: float) -> None:
+        """Add one sample to the time weighted mean, variance and smoothed value."""
+        level = self.smoothed(value, now)
+        if self.count == 0:
+            self.mean = value
+        else:
+            alpha = 1.0 - math.exp(-max(0.0, now - self.lastTs) / idmAnomalyTau)
+            diff = value - self.mean
+            incr = alpha * diff
+            self.mean += incr
+            if self.active is None:
+                # the variance is kept during an anomaly, it ends once the mean followed
+                self.var = (1.0 - alpha) * (self.var + diff * incr)
+        self.count += 1
+        self.level = value if level is None else level
+        self.lastTs = now
+
+
+class IdmAnomalyDetector:
+    """Check the refrigerant circuit values of each cycle against their own history.
+
+    Subscribed to the coordinator: push() runs on the event loop and does a fixed
+    amount of work per signal, no history is queried. A value is anomalous if it is
+    more than sigma standard deviations away from its EWMA mean, or if its smoothed
+    value changes faster than the limit of the signal. An event (EVENT_ANOMALY) is fired when an
+    anomaly starts and when the value is back within sigma / 2. Signals are only
+    checked while the compressor runs steadily: not during the first minutes after a
+    start and not while defrosting. A change of the operating mode (heating, hot
+    water, cooling) starts the learning again, each mode has its own working point.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, eventType: str, entryId: str, sigma: float
+    ) -> None:
+        """Initialize the detector, sigma = threshold in standard deviations."""
+        self.hass = hass
+        self.eventType = eventType
+        self.entryId = entryId
+        self.sigma = sigma
+        self.signals = {key: IdmSignalStats() for key in idmAnomalySignals}
+        self._runningSince = None  # monotonic time of the compressor start
+        self._mode = None
+
+    @callback
+    def push(self, data: IdmResponseData, now: float | None = None) -> None:
+        """Check the values of one cycle."""
+        now = time.monotonic() if now is None else now
+        values = {}
+        for i in range(data.lenResp()):
+            (key, value, unit) = data.getResp(i)
+            if value is not IDM_INVALID and not data.getAge(key):
+                values[key] = value
+
+        compressor = values.get("heatpump_compressor")
+        if compressor is not None:
+            if compressor == IdmState.OFF:
+                self._runningSince = None
+            elif self._runningSince is None:
+                self._runningSince = now
+        mode = values.get("heatpump_op_mode")
+        if mode is not None and mode != self._mode:
+            if mode != IdmState.DEFROST and self._mode != IdmState.DEFROST:
+                self._restart()  # new working point, a defrost returns to the old one
+            self._mode = mode
+
+        if (
+            self._runningSince is None
+            or now - self._runningSince < idmAnomalySettle
+            or self._mode == IdmState.DEFROST
+        ):
+            for stats in self.signals.values():
+                stats.level = None  # no change rate over the pause
+            return
+
+        for key, stats in self.signals.items():
+            value = values.get(key)
+            if isinstance(value, (int, float)):
+                self._check(key, stats, value, now)
+                stats.update(value, now)
+
+    def _restart(self) -> None:
+        """Forget the statistics, running anomalies are ended."""
+        for key, stats in self.signals.items():
+            if stats.active:
+                self._fire(key, stats, False, None, 0.0)
+            self.signals[key] = IdmSignalStats()
+
+    def _check(self, key: str, stats: IdmSignalStats, value: float, now: float) -> None:
+        """Compare one value with the statistics before it."""
+        if stats.count < idmAnomalyWarmup:
+            return
+        (minStd, maxRate) = idmAnomalySignals[key]
+        deviation = abs(value - stats.mean) / max(math.sqrt(stats.var), minStd)
+        rate = 0.0
+        level = stats.smoothed(value, now)
+        if level is not None:
+            rate = (level - stats.level) * 60 / (now - stats.lastTs)
+        tooFast = maxRate is not None and abs(rate) > maxRate
+        if stats.active is None:
+            if deviation > self.sigma:
+                stats.active = ANOMALY_DEVIATION
+            elif tooFast:
+                stats.active = ANOMALY_RATE
+            else:
+                return
+            _LOGGER.warning(
+                "Anomaly (%s) of %s: %s, mean %.2f",
+                stats.active,
+                key,
+                value,
+                stats.mean,
+            )
+            self._fire(key, stats, True, value, rate)
+        elif deviation < self.sigma / 2 and not tooFast:
+            self._fire(key, stats, False, value, rate)
+            stats.active = None
+
+    def _fire(
+        self, key: str, stats: IdmSignalStats, active: bool, value, rate: float
+    ) -> None:
+        """Fire the anomaly event of one signal."""
+        self.hass.bus.async_fire(
+            self.eventType,
+            {
+                "config_entry_id": self.entryId,
+                "key": key,
+                "active": active,
+                "reason": stats.active,
+                "value": value,
+                "mean": round(stats.mean, 3),
+                "std": round(math.sqrt(stats.var), 3),
+                "rate_per_min": round(rate, 3),
+            },
+        )
+
+    def summary(self) -> dict:
+        """Return mean, standard deviation and anomaly state per signal (diagnostics)."""
+        return {
+            key: {
+                "samples": stats.count,
+                "mean": round(stats.mean, 3),
+                "std": round(math.sqrt(stats.var), 3),
+                "active": stats.active,
+            }
+            for key, stats in self.signals.items()
+            if stats.count
+        }
@@ -0,0 +1,172 @@
+# idm clock synchronisation, runs decoupled from the data update cycle
+
+import time
+import logging
+
+from datetime import datetime
+from datetime import timedelta
+from homeassistant.util import dt as dt_util
+from .idmHeatpumpWeb import idmHeatpumpWeb
+from .const import (
+    CONF_CLK_HOUR_DEFAULT,
+    DEF_CLK_SYNC_SAMPLES,
+    DEF_CLK_SYNC_MAX_DEVIATION,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# relax time between two samples to avoid idm heatpump web overloads
+idmClkSampleGap = 0.4
+
+
+class IdmClockSample:
+    """One clock sample taken from the iDM info page."""
+
+    def __init__(self, offset: float, rtt: float) -> None:
+        """Store offset (idm - local, in seconds) and round trip time of the request."""
+        self.offset = offset
+        self.rtt = rtt
+
+
+class IdmClockSync:
+    """Measure the iDM clock offset like NTP does and correct it if needed."""
+
+    def __init__(
+        self,
+        idm: idmHeatpumpWeb,
+        clkSet: int,
+        clk_set_hour: int = CONF_CLK_HOUR_DEFAULT,
+        samples: int = DEF_CLK_SYNC_SAMPLES,
+    ) -> None:
+        """Initialize the clock sync for the given iDM interface."""
+        self.idm = idm
+        self.clkSet = clkSet  # accepted deviation in seconds, 0 = disabled
+        self.clkSetHour = clk_set_hour
+        self.samples = samples
+
+    async def async_idm_clock_sync(self) -> None:
+        """Async run the clock check (and correction) in the executor."""
+        await self.idm.executorJob(blocking_idm_clock_sync_function, self)
+
+    def takeSample(self) -> IdmClockSample | None:
+        """Read the iDM clock once and measure the round trip time of the request."""
+        addHeader = {
+            "CSRF-Token": self.idm.csrf_token,
+        }
+        # Developer info: Since HA decided to have only UIC time internally, all easy python local timestamp functions are destroyed
+        # Luckily the dt_util.now seems to work and actually return the local time properly, and with the HA time zone
+        # attached to the idm time as well, both are compared as aware datetimes (no more stripping of tzinfo)
+        with self.idm.sessionLock:  # do not interleave with a running data cycle
+            localStart = dt_util.now()
+            t0 = time.monotonic()
+            response = self.idm.timedRequest(
+                "GET", self.idm.idmInfoUrl, headers=addHeader
+            )
+            rtt = time.monotonic() - t0
+        if response.status_code != 200:
+            return None
+        txt = response.text
+        startPos = txt.find('"datetime":"')
+        if startPos == -1:
+            return None
+        dtIdm = datetime.strptime(
+            txt[startPos + 12 : startPos + 31], "%Y-%m-%d %H:%M:%S"
+        ).replace(tzinfo=dt_util.get_default_time_zone())
+        # idm reports full seconds only, so its real time is in average half a second later
+        # the idm time stamp is taken somewhere during the request, best guess is the middle of the round trip
+        localMid = localStart + timedelta(seconds=rtt / 2)
+        offset = (dtIdm - localMid).total_seconds() + 0.5
+        return IdmClockSample(offset, rtt)
+
+    def measureOffset(self) -> IdmClockSample | None:
+        """Take several samples and estimate the clock offset from the fastest ones."""
+        results = []
+        for i in range(self.samples):
+            if i > 0:
+                time.sleep(idmClkSampleGap)
+            sample = self.takeSample()
+            if sample:
+                results.append(sample)
+        return estimateClockOffset(results)
+
+    def syncClock(self) -> None:
+        """Check the iDM clock and correct it, if it is out of the accepted deviation."""
+        _LOGGER.info("Checking for time sync needs ..")
+        estimate = self.measureOffset()
+        if estimate is None:
+            _LOGGER.warning(".. Timesync could not read iDM clock, skipped for today")
+            return
+
+        delta = abs(estimate.offset)
+        if delta > DEF_CLK_SYNC_MAX_DEVIATION:
+            # if time difference is more than 35 minutes, something is very wrong, do not touch ...
+            _LOGGER.warning(
+                "Timesync: Detected a very big time difference! Adjust iDM clock manually before autosync keeps it in sync"
+                + "Detected deviation: "
+                + str(round(delta / 60, 2))
+                + " minutes; Max. allowed are 35 minutes."
+            )
+            return
+
+        if delta <= (self.clkSet + 0.5):
+            _LOGGER.info(
+                " .. Timesync not needed! Diff: %s (rtt %s ms)",
+                round(delta, 2),
+                round(estimate.rtt * 1000),
+            )
+            return
+
+        # deviation is bigger than acceptable, therefore start correction now...
+        _LOGGER.info(
+            " .. Timesync actually needed! Diff: %s (rtt %s ms)",
+            round(delta, 2),
+            round(estimate.rtt * 1000),
+        )
+        postIDMHeader = {
+            "Content-Type": "application/json;charset=utf-8",
+            "CSRF-Token": self.idm.csrf_token,
+        }
+        time.sleep(idmClkSampleGap)
+        with self.idm.sessionLock:
+            # the idm applies the time when the request arrives, compensate with the measured one way latency
+            setIdmTime = dt_util.now() + timedelta(seconds=estimate.rtt / 2)
+            setDateData = (
+                self.idm.idmSettime_HTTP_PUT_Str
+                + setIdmTime.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]
+                + 'Z"}'
+            )
+            htPut = self.idm.timedRequest(
+                "PUT", self.idm.idmDataUrl, data=setDateData, headers=postIDMHeader
+            )
+        if htPut.status_code != 200:
+            _LOGGER.warning(
+                ".. Timesync received unexpected response code, did not work! Code: "
+                + str(htPut.status_code)
+            )
+        if htPut.text.find('"status": "OK"') == -1:
+            # log warning, timesync received unexpected result, may not working
+            _LOGGER.warning(
+                ".. Timesync received unexpected answer, may not work: Answer: "
+                + htPut.text
+            )
+
+
+# samples = list of clock samples
+# return the sample representing the best offset estimation or None if no samples given
+def estimateClockOffset(samples: list[IdmClockSample]) -> IdmClockSample | None:
+    if not samples:
+        return None
+    # like the NTP clock filter, samples with the lowest round trip time are the most trustworthy
+    # the idm clock has just a resolution of seconds, averaging samples taken at different
+    # fractions of a second gives a better estimation than a single sample
+    fastest = sorted(samples, key=lambda s: s.rtt)[: max(1, (len(samples) + 1) // 2)]
+    offset = sum(s.offset for s in fastest) / len(fastest)
+    return IdmClockSample(offset, fastest[0].rtt)
+
+
+def blocking_idm_clock_sync_function(clkSync: IdmClockSync) -> None:
+    """Run the clock check, never raise into the caller."""
+    try:
+        clkSync.syncClock()
+    except Exception as e:  # noqa: BLE001
+        _LOGGER.warning("Timesync failed: " + str(e))
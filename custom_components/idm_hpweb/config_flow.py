@@ -8,15 +8,22 @@ from typing import Any
 import voluptuous as vol
 
 from .idmHeatpumpWeb import idmHeatpumpWeb
-from homeassistant.config_entries import ConfigFlow, ConfigFlowResult
+from .login_guard import async_getLoginGuard
+from homeassistant.config_entries import (
+    ConfigEntry,
+    ConfigEntryState,
+    ConfigFlow,
+    ConfigFlowResult,
+)
 from homeassistant.const import CONF_HOST, CONF_PIN, CONF_TIMEOUT
 from homeassistant.core import HomeAssistant
+from homeassistant.data_entry_flow import AbortFlow
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers import config_entry_flow, config_validation as cv
 from functools import partial
 
 from .const import DEF_TIME_BETWEEN_UPDATES, DOMAIN
-from .const import DEF_IDM_PIN
+from .const import DEF_IDM_PIN, DATA_HANDOVER, DATA_COORDINATOR
 from .const import (
     CONF_DISPLAY_NAME,
     CONF_CYCLE_TIME,
@@ -25,10 +32,33 @@ from .const import (
     CONF_CLK_SET,
     CONF_CLK_HOUR,
     CONF_CLK_HOUR_DEFAULT,
+    CONF_RECORD,
+    CONF_FAST_CYCLE_TIME,
+    CONF_FAST_KEYS,
+    DEF_FAST_KEYS,
+    CONF_AGGR_WINDOW,
+    CONF_AGGR_CLASSES,
+    DEF_AGGR_CLASSES,
+    CONF_TIMESERIES_DAYS,
+    CONF_ANOMALY_SIGMA,
 )
+from .aggregation import parseAggregationClasses
 
 _LOGGER = logging.getLogger(__name__)
 
+# settings applied to the running entry by reconfigure, all others need a reload
+HOT_APPLY_KEYS = {
+    CONF_TIMEOUT,
+    CONF_CYCLE_TIME,
+    CONF_STAT_DIV,
+    CONF_CLK_SET,
+    CONF_CLK_HOUR,
+    CONF_FAST_CYCLE_TIME,
+    CONF_FAST_KEYS,
+    CONF_AGGR_WINDOW,
+    CONF_AGGR_CLASSES,
+}
+
 STEP_USER_DATA_SCHEMA = vol.Schema(
     {
         vol.Required(CONF_DISPLAY_NAME, default="iDM_Web"): cv.string,
@@ -41,10 +71,53 @@ STEP_USER_DATA_SCHEMA = vol.Schema(
         vol.Optional(CONF_STAT_DIV, default=0): int,
         vol.Optional(CONF_CLK_SET, default=0): int,
         vol.Optional(CONF_CLK_HOUR, default=CONF_CLK_HOUR_DEFAULT): int,
+        vol.Optional(CONF_RECORD, default=0): int,
+        vol.Optional(CONF_FAST_CYCLE_TIME, default=0): int,
+        vol.Optional(CONF_FAST_KEYS, default=DEF_FAST_KEYS): cv.string,
+        vol.Optional(CONF_AGGR_WINDOW, default=0): int,
+        vol.Optional(CONF_AGGR_CLASSES, default=DEF_AGGR_CLASSES): cv.string,
+        vol.Optional(CONF_TIMESERIES_DAYS, default=0): int,
+        vol.Optional(CONF_ANOMALY_SIGMA, default=0): int,
     }
 )
 
 
+def _aggregationValid(user_input: dict[str, Any]) -> bool:
+    """Check window and class list of the aggregation."""
+    if user_input[CONF_AGGR_WINDOW] < 0:
+        return False
+    try:
+        parseAggregationClasses(user_input[CONF_AGGR_CLASSES])
+    except ValueError:
+        return False
+    return True
+
+
+def _hotApply(
+    hass: HomeAssistant, entry: ConfigEntry, user_input: dict[str, Any]
+) -> bool:
+    """Apply changed poll settings to the loaded entry, False if it needs a reload."""
+    changed = {key for key, value in user_input.items() if entry.data.get(key) != value}
+    if entry.state is not ConfigEntryState.LOADED or not changed <= HOT_APPLY_KEYS:
+        return False
+    coordinator = entry.runtime_data.get(DATA_COORDINATOR)
+    if coordinator is None:
+        return False
+    hass.config_entries.async_update_entry(entry, data={**entry.data, **user_input})
+    entry.runtime_data.update({key: entry.data[key] for key in changed})
+    coordinator.async_apply_config(entry.data)
+    return True
+
+
+def _handOver(hass: HomeAssistant, host: str, idm: idmHeatpumpWeb) -> None:
+    """Keep the validated client, its session and login are taken over by the entry setup."""
+    handovers = hass.data.setdefault(DATA_HANDOVER, {})
+    unused = handovers.pop(host, None)
+    if unused is not None:
+        hass.async_add_executor_job(unused.close)  # validated before, but never set up
+    handovers[host] = idm
+
+
 class idmWebConfigFlow(ConfigFlow, domain=DOMAIN):
     """Handle a config flow for iDM Heatpump Web."""
 
@@ -74,6 +147,24 @@ class idmWebConfigFlow(ConfigFlow, domain=DOMAIN):
                 errors[CONF_CLK_SET] = "clock_set_deviation_too_small"
             elif (user_input[CONF_CLK_HOUR] < 0) or (user_input[CONF_CLK_HOUR] > 23):
                 errors[CONF_CLK_HOUR] = "clock_set_hour_wrong"
+            elif user_input[CONF_RECORD] < 0:
+                errors[CONF_RECORD] = "record_size_negative"
+            elif (user_input[CONF_FAST_CYCLE_TIME] != 0) and (
+                (
+                    user_input[CONF_FAST_CYCLE_TIME]
+                    < DEF_MIN_TIME_BETWEEN_UPDATES.total_seconds()
+                )
+                or (user_input[CONF_FAST_CYCLE_TIME] >= user_input[CONF_CYCLE_TIME])
+            ):
+                errors[CONF_FAST_CYCLE_TIME] = "fast_cycle_time_wrong"
+            elif not _aggregationValid(user_input):
+                errors[CONF_AGGR_CLASSES] = "aggregation_wrong"
+            elif user_input[CONF_TIMESERIES_DAYS] < 0:
+                errors[CONF_TIMESERIES_DAYS] = "timeseries_days_negative"
+            elif (user_input[CONF_ANOMALY_SIGMA] < 3) and (
+                user_input[CONF_ANOMALY_SIGMA] != 0
+            ):
+                errors[CONF_ANOMALY_SIGMA] = "anomaly_sigma_too_small"
             else:
                 self._async_abort_entries_match(
                     {CONF_DISPLAY_NAME: user_input[CONF_DISPLAY_NAME]}
@@ -87,13 +178,19 @@ class idmWebConfigFlow(ConfigFlow, domain=DOMAIN):
                     user_input[CONF_TIMEOUT],
                     0,  # during test we do not use stat values
                 )
+                # shared with the running coordinator, the flow cannot bypass a backoff
+                idm.loginGuard = await async_getLoginGuard(
+                    self.hass, user_input[CONF_HOST]
+                )
                 result = await idm.async_idm_async_login()
 
                 if result != "success":
+                    await idm.async_close()
                     if result == "invalid_pin":
                         errors[CONF_PIN] = result
                     errors["base"] = result
                 else:
+                    _handOver(self.hass, user_input[CONF_HOST], idm)
                     devUniqueId = str(user_input[CONF_DISPLAY_NAME]) + "WP"
                     # await self.async_set_unique_id(devUniqueId)
                     # self._abort_if_unique_id_configured()  # this should not happen, since we checked the name, however safe is safe ;-)
@@ -112,8 +209,9 @@ class idmWebConfigFlow(ConfigFlow, domain=DOMAIN):
     ) -> ConfigFlowResult:
         """Handle reconfigure step."""
         errors: dict[str, str] = {}
+        entry = self._get_reconfigure_entry()
         if user_input is not None:
-            self._async_abort_entries_match({CONF_HOST: user_input[CONF_HOST]})
+            self._abortIfOtherEntry(entry, CONF_HOST, user_input[CONF_HOST])
 
             if user_input[CONF_DISPLAY_NAME].find(" ") != -1:
                 errors[CONF_DISPLAY_NAME] = "display_name_no_spaces"
@@ -130,13 +228,35 @@ class idmWebConfigFlow(ConfigFlow, domain=DOMAIN):
                 errors[CONF_CLK_SET] = "clock_set_deviation_too_small"
             elif (user_input[CONF_CLK_HOUR] < 0) or (user_input[CONF_CLK_HOUR] > 23):
                 errors[CONF_CLK_HOUR] = "clock_set_hour_wrong"
+            elif user_input[CONF_RECORD] < 0:
+                errors[CONF_RECORD] = "record_size_negative"
+            elif (user_input[CONF_FAST_CYCLE_TIME] != 0) and (
+                (
+                    user_input[CONF_FAST_CYCLE_TIME]
+                    < DEF_MIN_TIME_BETWEEN_UPDATES.total_seconds()
+                )
+                or (user_input[CONF_FAST_CYCLE_TIME] >= user_input[CONF_CYCLE_TIME])
+            ):
+                errors[CONF_FAST_CYCLE_TIME] = "fast_cycle_time_wrong"
+            elif not _aggregationValid(user_input):
+                errors[CONF_AGGR_CLASSES] = "aggregation_wrong"
+            elif user_input[CONF_TIMESERIES_DAYS] < 0:
+                errors[CONF_TIMESERIES_DAYS] = "timeseries_days_negative"
+            elif (user_input[CONF_ANOMALY_SIGMA] < 3) and (
+                user_input[CONF_ANOMALY_SIGMA] != 0
+            ):
+                errors[CONF_ANOMALY_SIGMA] = "anomaly_sigma_too_small"
             else:
                 # user_input[CONF_DISPLAY_NAME] = user_input[CONF_DISPLAY_NAME].replace(" ", "_")  # we cannot have spaces
-                self._async_abort_entries_match(
-                    {CONF_DISPLAY_NAME: user_input[CONF_DISPLAY_NAME]}
+                self._abortIfOtherEntry(
+                    entry, CONF_DISPLAY_NAME, user_input[CONF_DISPLAY_NAME]
                 )
                 # we want both be unique, the host name and the display name!
 
+                if _hotApply(self.hass, entry, user_input):
+                    # same heatpump and login, no need to validate the access again
+                    return self.async_abort(reason="reconfigure_successful")
+
                 idm = idmHeatpumpWeb(
                     self.hass,
                     user_input[CONF_HOST],
@@ -144,18 +264,24 @@ class idmWebConfigFlow(ConfigFlow, domain=DOMAIN):
                     user_input[CONF_TIMEOUT],
                     0,  # during test we do not use stat values
                 )
+                # shared with the running coordinator, the flow cannot bypass a backoff
+                idm.loginGuard = await async_getLoginGuard(
+                    self.hass, user_input[CONF_HOST]
+                )
                 result = await idm.async_idm_async_login()
 
                 if result != "success":
+                    await idm.async_close()
                     if result == "invalid_pin":
                         errors[CONF_PIN] = result
                     errors["base"] = result
                 else:
+                    _handOver(self.hass, user_input[CONF_HOST], idm)
                     # devUniqueId = str(user_input[CONF_DISPLAY_NAME]) + "web"
                     # await self.async_set_unique_id(devUniqueId)
 
                     return self.async_update_reload_and_abort(
-                        self._get_reconfigure_entry(),
+                        entry,
                         data_updates=user_input,
                     )
 
@@ -164,3 +290,9 @@ class idmWebConfigFlow(ConfigFlow, domain=DOMAIN):
             data_schema=STEP_USER_DATA_SCHEMA,
             errors=errors,
         )
+
+    def _abortIfOtherEntry(self, entry: ConfigEntry, key: str, value: Any) -> None:
+        """Abort if another entry than the reconfigured one uses the value already."""
+        for other in self._async_current_entries(include_ignore=False):
+            if other.entry_id != entry.entry_id and other.data.get(key) == value:
+                raise AbortFlow("already_configured")
@@ -13,3 +13,38 @@ DEF_DEVICE_NAME = "iDMwb"
 DEF_MIN_TIME_BETWEEN_UPDATES = timedelta(seconds=2)
 DEF_TIME_BETWEEN_UPDATES = timedelta(seconds=10)
 DEF_IDM_PIN = "4444"
+DEF_CLK_SYNC_SAMPLES = 5  # number of clock reads to estimate the iDM clock offset
+# above this deviation (seconds) the clock is not touched
+DEF_CLK_SYNC_MAX_DEVIATION = 60 * 35
+DATA_COORDINATOR = "coordinator"  # key of the coordinator in the entry runtime data
+# hass.data key, host -> client validated by the config flow
+DATA_HANDOVER = DOMAIN + "_handover"
+SERVICE_PROFILE = "profile"
+SERVICE_SET_VALUE = "set_value"
+WS_SUBSCRIBE = DOMAIN + "/subscribe"  # websocket command streaming the parsed values
+DEF_PROFILE_CYCLES = 3
+DEF_PROFILE_MAX_CYCLES = 20
+DEF_PROFILE_INTERVAL_MS = 5
+DEF_PROFILE_TOP_ENTRIES = 15
+CONF_RECORD = "RECORD_PAYLOADS"  # size in MB for recorded raw responses, 0 = disabled
+DEF_RECORD_FILES = 10  # recording is rotated over this number of segment files
+# cycle time (seconds) of the fast lane, 0 = disabled
+CONF_FAST_CYCLE_TIME = "FAST_CYCLE_TIME"
+CONF_FAST_KEYS = "FAST_KEYS"  # comma separated sensor keys updated in the fast lane
+# flow, return, flow rate and compressor
+DEF_FAST_KEYS = "B33,B34,B2,heatpump_compressor"
+# window (seconds) of the aggregation, 0 = disabled
+CONF_AGGR_WINDOW = "AGGREGATION_WINDOW"
+CONF_AGGR_CLASSES = "AGGREGATION_CLASSES"  # <device class>[:mean|min|max|last],...
+DEF_AGGR_CLASSES = "temperature:mean,pressure:mean,power:mean,volume_flow_rate:mean"
+# retention (days) of the local time series, 0 = disabled
+CONF_TIMESERIES_DAYS = "TIMESERIES_DAYS"
+DEF_TIMESERIES_FLUSH = 60  # seconds between two batched writes of the time series
+STORE_CYCLES = DOMAIN + ".cycles"  # storage key prefix of the cycle analytics state
+STORE_VERSION = 1
+DEF_STORE_DELAY = 60  # seconds a change of the cycle analytics is written delayed
+STORE_LOGIN = DOMAIN + ".login"  # storage key of the login history of all heatpumps
+DATA_LOGIN_GUARDS = DOMAIN + "_login"  # hass.data key, loading of the login guards
+DEF_LOGIN_STORE_DELAY = 1  # seconds, a login result is written soon (crash loops)
+CONF_ANOMALY_SIGMA = "ANOMALY_SIGMA"  # threshold in standard deviations, 0 = disabled
+EVENT_ANOMALY = DOMAIN + "_anomaly"  # fired when an anomaly starts or ends
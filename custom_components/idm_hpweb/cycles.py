@@ -0,0 +1,229 @@
+# Compressor and defrost cycle analytics, updated incrementally with each received cycle
+
+import time
+
+from homeassistant.core import callback
+from homeassistant.util import dt as dt_util
+from .idmHeatpumpWeb import IdmResponseData, IdmState, IDM_INVALID
+
+CYCLE_STARTS_HOUR = "cycle_starts_hour"  # starts of the last 60 minutes (estimate)
+CYCLE_STARTS_TODAY = "cycle_starts_today"
+CYCLE_LAST_RUN = "cycle_last_run"  # minutes of the last complete run
+CYCLE_LAST_PAUSE = "cycle_last_pause"  # minutes of the last complete pause
+CYCLE_MEAN_RUN_TODAY = "cycle_mean_run_today"  # minutes per run today
+CYCLE_MEAN_RUN_TOTAL = "cycle_mean_run_total"  # minutes per start from the idm counters
+DEFROST_TODAY = "defrost_today"
+DEFROST_LAST_DURATION = "defrost_last_duration"  # minutes
+DEFROST_INTERVAL = "defrost_interval"  # hours between the last two defrost starts
+CYCLE_METRICS = (
+    CYCLE_STARTS_HOUR,
+    CYCLE_STARTS_TODAY,
+    CYCLE_LAST_RUN,
+    CYCLE_LAST_PAUSE,
+    CYCLE_MEAN_RUN_TODAY,
+    CYCLE_MEAN_RUN_TOTAL,
+    DEFROST_TODAY,
+    DEFROST_LAST_DURATION,
+    DEFROST_INTERVAL,
+)
+
+idmCycleMaxGap = 900  # seconds without samples, then the open phase has no known start
+
+# persisted state, all values are plain numbers (or None) and survive a restart
+idmCycleState = {
+    "lastTs": None,  # time stamp of the last sample
+    "day": None,  # local day (ordinal) of the day counters
+    "running": None,  # compressor state of the last sample
+    "since": None,  # start of the current run or pause, None = unknown
+    "lastRun": None,
+    "lastPause": None,
+    "hour": None,  # hour (since epoch) of hourStarts
+    "hourStarts": 0,
+    "prevHourStarts": 0,  # starts of the hour before
+    "startsToday": 0,
+    "runsToday": 0,  # complete runs today
+    "runToday": 0.0,  # seconds of the complete runs today
+    "startsSinceCounter": 0,  # starts seen since the last change of the idm counter
+    "counterStarts": None,  # last switch_cycles_nb_1
+    "counterRuntime": None,  # last runtime_nb_1 (hours)
+    "defrost": None,  # defrost state of the last sample
+    "defrostSince": None,
+    "defrostLastStart": None,
+    "defrostLastDuration": None,
+    "defrostInterval": None,
+    "defrostToday": 0,
+}
+
+
+class IdmCycleAnalytics:
+    """Turn the compressor state and operating mode of each cycle into cycle metrics.
+
+    Subscribed to the coordinator like the time series sink: push() runs on the event
+    loop, updates a fixed set of numbers and notifies the sensors. Nothing is queried
+    from the recorder. Starts per hour is a sliding estimate from the current and the
+    previous hour. Starts too short to be seen between two polls are added from the
+    start counter of the heatpump. After a gap of more than idmCycleMaxGap the open run
+    or pause is not measured, its start is unknown.
+    """
+
+    def __init__(self, state: dict | None = None) -> None:
+        """Initialize the analytics, state = persisted state of asDict()."""
+        self.state = dict(idmCycleState)
+        if state:
+            self.state.update(
+                {key: value for key, value in state.items() if key in idmCycleState}
+            )
+        self.listeners = []  # called after each cycle (sensors, store)
+        self.changed = False  # a start, run or defrost was counted in the last cycle
+
+    def asDict(self) -> dict:
+        """Return the state to persist."""
+        return dict(self.state)
+
+    @callback
+    def push(self, data: IdmResponseData, now: float | None = None) -> None:
+        """Update the metrics with the values of one cycle."""
+        values = {}
+        for i in range(data.lenResp()):
+            (key, value, unit) = data.getResp(i)
+            if value is not IDM_INVALID and not data.getAge(key):
+                values[key] = value
+        if not values:
+            return
+        self.changed = False
+        s = self.state
+        now = time.time() if now is None else now
+        if s["lastTs"] is not None and now - s["lastTs"] > idmCycleMaxGap:
+            s["since"] = None
+            s["defrostSince"] = None
+        s["lastTs"] = now
+        self._newDay(now)
+        self._newHour(now)
+
+        compressor = values.get("heatpump_compressor")
+        if compressor is not None:
+            self._compressor(compressor != IdmState.OFF, now)
+        mode = values.get("heatpump_op_mode")
+        if mode is not None:
+            self._defrost(mode == IdmState.DEFROST, now)
+        starts = values.get("switch_cycles_nb_1")
+        if isinstance(starts, (int, float)):
+            self._counters(starts, values.get("runtime_nb_1"))
+
+        for listener in self.listeners:
+            listener()
+
+    def _newDay(self, now: float) -> None:
+        """Reset the day counters at local midnight."""
+        day = dt_util.as_local(dt_util.utc_from_timestamp(now)).date().toordinal()
+        if day != self.state["day"]:
+            self.state.update(
+                day=day, startsToday=0, runsToday=0, runToday=0.0, defrostToday=0
+            )
+
+    def _newHour(self, now: float) -> None:
+        """Move the starts of the hour to the previous hour."""
+        s = self.state
+        hour = int(now // 3600)
+        if hour != s["hour"]:
+            s["prevHourStarts"] = s["hourStarts"] if s["hour"] == hour - 1 else 0
+            s["hourStarts"] = 0
+            s["hour"] = hour
+
+    def _addStarts(self, count: int) -> None:
+        """Add starts to the hour and the day."""
+        self.changed = True
+        s = self.state
+        s["hourStarts"] += count
+        s["startsToday"] += count
+
+    def _compressor(self, running: bool, now: float) -> None:
+        """Count a start and measure the run or pause ended by a change."""
+        s = self.state
+        if running == s["running"]:
+            return
+        if s["running"] is not None:
+            if s["since"] is not None:
+                duration = now - s["since"]
+                if running:
+                    s["lastPause"] = duration
+                else:
+                    s["lastRun"] = duration
+                    s["runsToday"] += 1
+                    s["runToday"] += duration
+                    self.changed = True
+            if running:
+                self._addStarts(1)
+                s["startsSinceCounter"] += 1
+            s["since"] = now
+        # with the first sample the phase started before, its start stays unknown
+        s["running"] = running
+
+    def _defrost(self, active: bool, now: float) -> None:
+        """Count a defrost and measure its duration and the time since the last one."""
+        s = self.state
+        if active == s["defrost"]:
+            return
+        if s["defrost"] is not None:
+            self.changed = True
+            if active:
+                s["defrostToday"] += 1
+                if s["defrostLastStart"] is not None:
+                    s["defrostInterval"] = now - s["defrostLastStart"]
+                s["defrostLastStart"] = now
+            elif s["defrostSince"] is not None:
+                s["defrostLastDuration"] = now - s["defrostSince"]
+            s["defrostSince"] = now
+        s["defrost"] = active
+
+    def _counters(self, starts, runtime) -> None:
+        """Add the starts missed between two polls, seen by the idm start counter."""
+        s = self.state
+        if s["counterStarts"] is not None and starts > s["counterStarts"]:
+            missed = int(starts - s["counterStarts"]) - s["startsSinceCounter"]
+            if missed > 0:
+                self._addStarts(missed)
+        if s["counterStarts"] is None or starts != s["counterStarts"]:
+            s["startsSinceCounter"] = 0
+        s["counterStarts"] = starts
+        if isinstance(runtime, (int, float)):
+            s["counterRuntime"] = runtime
+
+    # return value of metric in the unit of its sensor, None if not known yet
+    def value(self, metric: str, now: float | None = None):
+        """Return the current value of one metric."""
+        s = self.state
+        if metric == CYCLE_STARTS_HOUR:
+            if s["hour"] is None:
+                return None
+            now = time.time() if now is None else now
+            if int(now // 3600) != s["hour"]:
+                return 0.0  # no sample this hour yet
+            passed = (now % 3600) / 3600
+            return round(s["hourStarts"] + s["prevHourStarts"] * (1 - passed), 1)
+        if metric == CYCLE_STARTS_TODAY:
+            return s["startsToday"] if s["day"] is not None else None
+        if metric == CYCLE_LAST_RUN:
+            return _minutes(s["lastRun"])
+        if metric == CYCLE_LAST_PAUSE:
+            return _minutes(s["lastPause"])
+        if metric == CYCLE_MEAN_RUN_TODAY:
+            return _minutes(s["runToday"] / s["runsToday"]) if s["runsToday"] else None
+        if metric == CYCLE_MEAN_RUN_TOTAL:
+            if not s["counterStarts"] or s["counterRuntime"] is None:
+                return None
+            return round(s["counterRuntime"] * 60 / s["counterStarts"], 1)
+        if metric == DEFROST_TODAY:
+            return s["defrostToday"] if s["day"] is not None else None
+        if metric == DEFROST_LAST_DURATION:
+            return _minutes(s["defrostLastDuration"])
+        if metric == DEFROST_INTERVAL:
+            if s["defrostInterval"] is None:
+                return None
+            return round(s["defrostInterval"] / 3600, 2)
+        raise KeyError(metric)
+
+
+# seconds = duration or None, return minutes rounded to 0.1 or None
+def _minutes(seconds):
+    return None if seconds is None else round(seconds / 60, 1)
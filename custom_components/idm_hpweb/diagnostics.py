@@ -0,0 +1,30 @@
+"""Diagnostics of the iDM Heatpump Web integration."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_PIN
+from homeassistant.core import HomeAssistant
+
+from .const import DATA_COORDINATOR
+
+TO_REDACT = {CONF_PIN}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return configuration, impact on HA, latencies, writes, logins and anomalies."""
+    result: dict[str, Any] = {"config": async_redact_data(dict(entry.data), TO_REDACT)}
+    coordinator = entry.runtime_data.get(DATA_COORDINATOR)
+    if coordinator is not None:
+        result["impact"] = coordinator.my_impact.summary()
+        result["latency"] = coordinator.my_api.latency.summary()
+        result["writes"] = coordinator.my_api.writes.status()
+        result["login"] = coordinator.my_api.loginGuard.summary()
+        if coordinator.my_anomalies is not None:
+            result["anomalies"] = coordinator.my_anomalies.summary()
+    return result
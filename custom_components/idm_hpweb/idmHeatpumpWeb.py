@@ -1,15 +1,36 @@
-# idm Web Interface implementation
+# idm Web Interface implementation, plain Python: used by the HA integration and the tools/idm_cli.py
 
+import re
+import json
+import math
 import time
-import requests
+import asyncio
 import logging
+import threading
 
-from functools import partial
-from homeassistant.core import HomeAssistant
-from datetime import datetime
-from datetime import timedelta
-from homeassistant.util import dt as dt_util
-from .const import CONF_CLK_HOUR_DEFAULT
+from enum import StrEnum
+from typing import TYPE_CHECKING
+from collections.abc import Callable
+
+from .latency import IdmLatencyTracker
+from .write_queue import IdmWriteQueue
+from .login_guard import (
+    IdmLoginGuard,
+    LOGIN_SUCCESS,
+    LOGIN_CANNOT_CONNECT,
+    LOGIN_BACKOFF,
+)
+from .payload_recorder import (
+    IdmPayloadRecorder,
+    IdmReplaySession,
+    idmReplayPrefix,
+    idmReplayHost,
+    parseReplayHost,
+    urlKey,
+)
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -24,6 +45,21 @@ idmURL_Stat_GenHeat = "/data/statistics.php?type=amountofheat"
 idmURL_Stat_ElCons = "/data/statistics.php?type=baenergyhp"
 
 idmReadAheadBlock = 4092
+# seconds, last-good values of a failed endpoint are used this long
+idmCacheMaxAge = 300
+# full parses in a row a key is missing, before it is not searched anymore
+idmAbsentMisses = 3
+idmAbsentReprobe = 100  # each n-th full parse all absent keys are searched again
+idmHintSlack = 256  # bytes around the last offset of a row, which are searched first
+idmSectionIntro = '"edesc":"'
+idmSectionIO = "_INPUTS_OUTPUTS_INFO"
+idmSectionPV = "_PV"
+idmPoolSize = 2  # connections kept to the device: data cycle and clock sync
+# seconds to wait before a login after a failed request (lockout protection)
+idmReloginRelax = 10
+idmWriteGap = 0.4  # seconds between two writes, like between two reads
+idmEndpointSettings = "settings"
+idmEndpointHeatpump = "heatpump"
 idmKeyIntro = "<tr><td>"
 idmKeyEnding = "</td><td>"
 idmDescrIntro = "</td><td>"
@@ -219,19 +255,169 @@ idmStatDefinitions_en = {
 }
 
 
+# definitions = sensor definitions of one language
+# return list of (group, [(key, name), ...]) for the io, service and pv values in payload order
+def splitSensorGroups(definitions: dict) -> list:
+    groups = [("io", []), ("service", []), ("pv", [])]
+    index = 0
+    for k, v in definitions.items():
+        if v == "super_heating_1":
+            index = 1
+        elif v == "cur_exp_power_heating":
+            index = 2
+        groups[index][1].append((k, v))
+    return groups
+
+
+idmSensorGroups_de = splitSensorGroups(idmSensorDefinitions_de)
+idmSensorGroups_en = splitSensorGroups(idmSensorDefinitions_en)
+
+# known languages of the web interface, further ones just need their definitions and an entry here
+# language -> (identification string, extra data, sensor definitions, sensor groups, statistics, set time string)
+idmLanguages = {
+    "en": (
+        iDM_IdentificationString_en,
+        iDMExtraData_en,
+        idmSensorDefinitions_en,
+        idmSensorGroups_en,
+        idmStatDefinitions_en,
+        iDM_Settime_HTTP_PUT_Str_en,
+    ),
+    "de": (
+        iDM_IdentificationString_de,
+        iDMExtraData_de,
+        idmSensorDefinitions_de,
+        idmSensorGroups_de,
+        idmStatDefinitions_de,
+        iDM_Settime_HTTP_PUT_Str_de,
+    ),
+}
+idmDefaultLanguage = "en"  # used till the first settings.php response is received
+# all identification strings in one pattern, the language is detected with one scan of the payload
+idmLanguageSignatures = re.compile(
+    "|".join(re.escape(defn[0]) for defn in idmLanguages.values())
+)
+idmLanguageOfSignature = {defn[0]: lang for lang, defn in idmLanguages.items()}
+idmTextKeys = {"software_version"}  # values kept as text, e.g. "2.10" is no number
+
+
 # Helper classes and functions for parsing responses
+class IdmState(StrEnum):
+    """States the parser maps digital values and modes to."""
+
+    ON = "on"
+    OFF = "off"
+    OK = "OK"
+    PROBLEM = "Problem!"
+    ON_0 = "on_0"
+    ON_2 = "on_2"
+    HEATING = "heating"
+    COOLING = "cooling"
+    HOTWATER = "hotwater"
+    DEFROST = "defrost"
+
+
+class IdmInvalid:
+    """Marker for a value, which was found but cannot be used (e.g. broken frame)."""
+
+    __slots__ = ()
+
+    def __bool__(self) -> bool:
+        return False
+
+    def __repr__(self) -> str:
+        return "IDM_INVALID"
+
+
+IDM_INVALID = IdmInvalid()  # the only instance, check with "is IDM_INVALID"
+idmStates = {state.value: state for state in IdmState}
+
+
+# valStr = raw value string of the response
+# return int (counters), float (measurements), IdmState (modes) or valStr (text)
+def toValue(valStr: str):
+    state = idmStates.get(valStr)
+    if state is not None:
+        return state
+    if valStr.isdigit():
+        return int(valStr)
+    try:
+        value = float(valStr)
+    except ValueError:
+        return valStr
+    return value if math.isfinite(value) else valStr  # "nan" or "inf" is no measurement
+
+
+class IdmDeadlineExceeded(Exception):
+    """The time budget of the data cycle is used up, the remaining requests are skipped."""
+
+
 class IdmResponseData:  # to store parsed response data  # noqa: D101
-    _response = []  # list of tuples (key, answer)
+    _response = []  # list of tuples (key, value, unit)
 
-    def __init__(self):
+    def __init__(
+        self,
+        keys: frozenset[str] | None = None,
+        numericKeys: frozenset[str] = frozenset(),
+    ):
         self._response = []
+        # key -> age in seconds of values taken from the last-good cache
+        self._ages = {}
+        # keys = None collects all values, otherwise only these keys are collected (partial update)
+        self._keys = keys
+        self._missing = set(keys) if keys is not None else set()
+        # text in the values of these keys is invalid (e.g. a broken frame), other keys keep it
+        self._numericKeys = numericKeys
+        # duplicate keys (M73#1..) are found by position, so all rows with the same base key are searched
+        self._searchKeys = (
+            keys | {k.split("#")[0] for k in keys} if keys is not None else None
+        )
+
+    def addResp(self, key: str, answer: str, unit: str | None = None) -> None:
+        if self._keys is not None:
+            if key not in self._keys:
+                return
+            self._missing.discard(key)
+        # typed once here, entities and sinks do not need to convert strings again
+        value = answer if key in idmTextKeys else toValue(answer)
+        if type(value) is str and key in self._numericKeys:
+            value = IDM_INVALID
+        self._response.append((key, value, unit))
+
+    def newPart(self) -> "IdmResponseData":
+        """Return an empty response with the same keys, for the values of one endpoint."""
+        return IdmResponseData(self._keys, self._numericKeys)
 
-    def addResp(self, key: str, answer: str) -> None:
-        self._response.append((key, answer))
+    def merge(self, part: "IdmResponseData", age: float = 0.0) -> None:
+        """Add the (already typed) values of part, age > 0 marks them as cached."""
+        for key, value, unit in part._response:
+            if self._keys is not None:
+                if key not in self._keys:
+                    continue
+                self._missing.discard(key)
+            self._response.append((key, value, unit))
+            if age:
+                self._ages[key] = age
+
+    def getAge(self, key: str) -> float:
+        """Return the age of a cached value in seconds, 0 for fresh values."""
+        return self._ages.get(key, 0.0)
+
+    def isPartial(self) -> bool:
+        return self._keys is not None
+
+    def wants(self, key: str) -> bool:
+        """Return True, if the row of key needs to be searched in the response."""
+        return self._searchKeys is None or key in self._searchKeys
+
+    def allFound(self) -> bool:
+        """Return True, if a partial update has found all its keys."""
+        return self._keys is not None and not self._missing
 
     def lenResp(self) -> int:
         return len(self._response)
 
+    # return tuple (key, value, unit), value may be IDM_INVALID, unit is None if not reported
     def getResp(self, i):
         return self._response[i]
 
@@ -241,57 +427,180 @@ class idmHeatpumpWeb:
 
     def __init__(
         self,
-        hass: HomeAssistant,
+        hass: "HomeAssistant | None",
         host: str,
         pin: str,
         timeout: int,
         statDiv: int,
-        clkSet: int = 0,
-        clk_set_hour: int = CONF_CLK_HOUR_DEFAULT,
+        session=None,
     ) -> None:
-        """Initialize the iDM Heatpump Web interface."""
+        """Initialize the iDM Heatpump Web interface, session = validated session to take over.
+
+        hass is only used to run the blocking calls in its executor, without it (None)
+        the default executor of the running event loop is used.
+        """
         self.hass = hass
+        if host.startswith(idmReplayPrefix):
+            # no heatpump attached, feed recorded frames through parser and coordinator
+            (replayPath, replaySpeed) = parseReplayHost(host)
+            self.session = IdmReplaySession(replayPath, replaySpeed)
+            host = idmReplayHost  # recorded frames are matched by url path only
+        else:
+            self.session = session or createSession()
         self._host = host
         self._pin = pin
         self._timeout = timeout
-        self.session = requests.Session()
+        self.latency = IdmLatencyTracker(timeout)  # adaptive timeout per endpoint
+        # opt-in recording of raw responses
+        self.recorder: IdmPayloadRecorder | None = None
+        # keys of numeric sensors, in HA taken from the sensor descriptions
+        self.numericKeys = frozenset()
+        self.writes = IdmWriteQueue()  # settings to write at the end of a data cycle
+        self.loginGuard = IdmLoginGuard()  # in HA the persisted guard of the host
+        # data cycle and clock sync share the session
+        self.sessionLock = threading.Lock()
+        self.deadline = None  # monotonic end of the running data cycle, None = no limit
+        # login after a failed request postponed to the next cycle
+        self.loginPending = False
+        self.loginPostponed = False  # the guard lets the pending login wait
+        self._inFlight = None  # executor future of the running data cycle
+        # (queue wait, duration) in seconds of the last data cycle job
+        self.lastJobTimes = None
         self.csrf_token = None
         self.idmUrl = "http://" + host + idmURL_Index
         self.idmDataUrl = "http://" + host + idmURL_Settings
         self.idmHeatpumpUrl = "http://" + host + idmURL_Heatpump
         self.idmInfoUrl = "http://" + host + idmURL_Info
-        self.idmExtraDefn = iDMExtraData_en  # try first english version
-        self.idmSensorDefn = idmSensorDefinitions_en
-        self.iDM_IdentificationString = iDM_IdentificationString_en
-        self.idmStatDefn = idmStatDefinitions_en
-        self.idmSettime_HTTP_PUT_Str = iDM_Settime_HTTP_PUT_Str_en
+        self.setLanguage(idmDefaultLanguage)
         self.my_counter = -1
         self.statDiv = statDiv
+        # settings key -> full parses in a row the key was not found
+        self.keyMisses = {}
+        # settings key -> position after its value in the last payload
+        self.keyOffsets = {}
+        self.lastServiceMode = False
+        # endpoint -> (monotonic time, IdmResponseData) of the last full read
+        self.endpointCache = {}
         self.hasQheatSensor = 0  # by default we assume no heat sesnor is available, once a Q heat sensor values is seen it is set to 1
-        self.clkSet = clkSet
-        self.clkSetHour = clk_set_hour
-        self.clkCheckSetToday = False
+
+    def setTimeout(self, timeout: int) -> None:
+        """Change the configured request timeout."""
+        self._timeout = timeout
+        self.latency.setTimeout(timeout)
+
+    def executorJob(self, func: Callable, *args) -> asyncio.Future:
+        """Run a blocking function in the executor of HA, or of the event loop without HA."""
+        if self.hass is not None:
+            return self.hass.async_add_executor_job(func, *args)
+        return asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    def close(self) -> None:
+        """Close the session and its pooled connections, after a running cycle."""
+        with self.sessionLock:
+            self.session.close()
+
+    async def async_close(self) -> None:
+        """Async close the session (unload of the config entry)."""
+        await self.executorJob(self.close)
 
     async def async_idm_async_login(self) -> str:
         """Async Login to the heatpump web interface."""
-        return await self.hass.async_add_executor_job(blocking_idm_login_function, self)
+        return await self.executorJob(blocking_idm_login_function, self)
 
-    async def async_idm_async_get_data(self) -> IdmResponseData:
-        """Async get data from the heatpump web interface."""
-        return await self.hass.async_add_executor_job(
-            blocking_idm_get_data_function, self
-        )
+    async def async_idm_async_get_data(
+        self,
+        keys: frozenset[str] | None = None,
+        deadline: float | None = None,
+        runner: Callable | None = None,
+    ) -> IdmResponseData:
+        """Async get data from the heatpump web interface, only keys if given.
 
-    # return str: "success" or "cannot_connect" or "invalid_pin" or "unknown"
+        Single flight: while the executor job of a cycle is still running (e.g. its
+        caller was cancelled by a timeout), no second one is started on the same
+        session, the caller waits for the result of the running one instead.
+        runner(func, *args) runs a new job in the executor, e.g. the profiler.
+        """
+        if self._inFlight is None or self._inFlight.done():
+            job = (blocking_idm_get_data_function, self, keys, deadline)
+            if runner is not None:
+                job = (runner, *job)
+            self._inFlight = self.executorJob(self._timedJob, time.perf_counter(), *job)
+        else:
+            _LOGGER.debug("Previous data cycle still running, waiting for its result")
+        # a cancelled caller must not cancel the shared job, a later caller takes its result
+        return await asyncio.shield(self._inFlight)
+
+    def _timedJob(self, submitted: float, func: Callable, *args):
+        """Run func in the executor, measure the wait in the executor queue and the run time."""
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.lastJobTimes = (start - submitted, time.perf_counter() - start)
+
+    def requestTimeout(self, url: str) -> float:
+        """Return the timeout of the next request to url, limited by the rest of the cycle budget."""
+        timeout = self.latency.timeoutFor(urlKey(url))
+        if self.deadline is None:
+            return timeout
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise IdmDeadlineExceeded
+        return min(timeout, remaining)
+
+    def timedRequest(self, method: str, url: str, **kwargs):
+        """Send a request with the adaptive timeout of url, measure and record it."""
+        kwargs["timeout"] = self.requestTimeout(url)
+        start = time.monotonic()
+        try:
+            response = getattr(self.session, method.lower())(url, **kwargs)
+        finally:
+            # failed requests count as well, a timeout raises the timeout of the endpoint again
+            self.latency.observe(urlKey(url), time.monotonic() - start)
+        self.recordResponse(method, url, response)
+        return response
+
+    def relax(self, seconds: float) -> None:
+        """Sleep between requests, skip the rest of the cycle if its budget is used up."""
+        if self.deadline is not None and time.monotonic() + seconds >= self.deadline:
+            raise IdmDeadlineExceeded
+        time.sleep(seconds)
+
+    def idmGet(self, url: str, headers: dict):
+        """Get url from the heatpump web interface, record response if enabled."""
+        return self.timedRequest("GET", url, headers=headers)
+
+    def recordResponse(self, method: str, url: str, response) -> None:
+        """Hand a raw response to the recorder, if recording is enabled."""
+        if self.recorder:
+            self.recorder.record(method, url, response.status_code, response.text)
+
+    # return str: "success" or "cannot_connect" or "invalid_pin" or "unknown" or "login_backoff"
     def idm_login(self) -> str:
-        """Log in to the heatpump web interface."""
+        """Log in to the heatpump web interface, if the login guard allows it now."""
+        wait = self.loginGuard.acquire()
+        if wait > 0:
+            # each cycle asks again, only the start of the wait is worth a warning
+            _LOGGER.log(
+                logging.DEBUG if self.loginPostponed else logging.WARNING,
+                "Login postponed for %d seconds (lockout protection)",
+                wait,
+            )
+            self.loginPostponed = True
+            return LOGIN_BACKOFF
+        self.loginPostponed = False
+        result = self.idm_login_request()
+        self.loginGuard.result(result, self.csrf_token)
+        return result
+
+    # return str: "success" or "cannot_connect" or "invalid_pin" or "unknown"
+    def idm_login_request(self) -> str:
+        """Send the login request to the heatpump web interface."""
+        import requests  # noqa: PLC0415 - lazy, see __init__
+
         try:
             payload = {"pin": self._pin}
-            response = self.session.post(
-                self.idmUrl,
-                payload,
-                self._timeout,
-            )
+            response = self.timedRequest("POST", self.idmUrl, data=payload)
             response.raise_for_status()
             if response.status_code == 200:
                 txt = response.text
@@ -305,519 +614,623 @@ class idmHeatpumpWeb:
                 if endpos == -1:
                     return "unknown"
                 self.csrf_token = txt[startpos + 12 : endpos]
-                return "success"
+                return LOGIN_SUCCESS
 
-            return "cannot_connect"
+            return LOGIN_CANNOT_CONNECT
         except requests.RequestException:
-            return "cannot_connect"
+            return LOGIN_CANNOT_CONNECT
 
-    def get_DataUpdate(self) -> IdmResponseData:
+    # keys = None for all values, or the keys of a partial (fast lane) update
+    def get_DataUpdate(self, keys: frozenset[str] | None = None) -> IdmResponseData:
         """Get new data from the heatpump web interface."""
-        answerData = IdmResponseData()
+        import requests  # noqa: PLC0415 - lazy, see __init__
+
+        answerData = IdmResponseData(keys, self.numericKeys)
         addHeader = {
             "CSRF-Token": self.csrf_token,
         }
-        postIDMHeader = {
-            "Content-Type": "application/json;charset=utf-8",
-            "CSRF-Token": self.csrf_token,
-        }
 
         _LOGGER.debug(
             "Fetching data from IDM Heatpump Web interface: CSRF-Token=%s",
             self.csrf_token,
         )
 
+        # endpoints of this cycle not read yet, on errors they are served from the last-good cache
+        pending = [idmEndpointSettings, idmEndpointHeatpump]
         try:
-            response = self.session.get(
-                self.idmDataUrl, headers=addHeader, timeout=self._timeout
+            if self.loginPending:
+                # the login after the last failed request did not fit into that cycle or had to wait
+                self.loginPending = self.idm_login() == LOGIN_BACKOFF
+                addHeader["CSRF-Token"] = self.csrf_token
+            ok = self.readEndpoint(
+                idmEndpointSettings,
+                self.idmDataUrl,
+                addHeader,
+                self.parseSettingsAndWrites,
+                answerData,
             )
-            if response.status_code == 200:
-                txt = response.text
-                startPos = txt.find('"invalid csrf token"', 0, 128)
-                if startPos != -1:
-                    _LOGGER.warning("CSRF token invalid, redoing login")
-                    ## redo login with pin and csrf token extraction
-                    time.sleep(1)
-                    result = self.idm_login()
-                    return answerData
+            pending.remove(idmEndpointSettings)
+            if not ok:
+                # no (usable) settings, do not stress the idm web with further requests now
+                self.mergeCached(answerData, pending)
+                return answerData
+            if answerData.allFound():
+                # partial update complete, heatpump.php not needed
+                return answerData
 
-                startPos = txt.find(self.iDM_IdentificationString, 0, len(txt))
-                if startPos == -1:
-                    _LOGGER.debug("Identification string not found, switch languange.")
-                    if (
-                        self.iDM_IdentificationString == iDM_IdentificationString_en
-                    ):  # was till now English -> try German now
-                        self.iDM_IdentificationString = iDM_IdentificationString_de
-                        self.idmExtraDefn = iDMExtraData_de
-                        self.idmSensorDefn = idmSensorDefinitions_de
-                        self.idmStatDefn = idmStatDefinitions_de
-                        self.idmSettime_HTTP_PUT_Str = iDM_Settime_HTTP_PUT_Str_de
-                    else:  # there needs to be more checks, if further languanges are supported, but for now it is OK that way
-                        self.iDM_IdentificationString = iDM_IdentificationString_en
-                        self.idmExtraDefn = iDMExtraData_en
-                        self.idmSensorDefn = idmSensorDefinitions_en
-                        self.idmStatDefn = idmStatDefinitions_en
-                        self.idmSettime_HTTP_PUT_Str = iDM_Settime_HTTP_PUT_Str_en
-
-                    # now check the new language
-                    startPos = txt.find(self.iDM_IdentificationString, 0, len(txt))
-                    if startPos == -1:
-                        _LOGGER.warning(
-                            "Identification string not found, wrong frame, or unknown language!"
-                        )
-                        return answerData  # we cannot do anything else with this frame, so discard it and stop processing here
-
-                self.my_counter += 1  # count this loop
-                afterPos = 0
-                for i in self.idmExtraDefn:
-                    (key, startDel, endDel, sensorKey) = i
-                    # _LOGGER.debug("Extracting extra key: startPos=%d key=%s", startPos, key)
-                    (valStr, afterPos) = extractParameterRaw(
-                        txt,
-                        startPos,
-                        startPos + idmReadAheadBlock,
-                        key,
-                        startDel,
-                        endDel,
-                    )
-                    if afterPos > startPos:  # something found
-                        answerData.addResp(sensorKey, valStr)
-                        startPos = afterPos
-                        # _LOGGER.debug("Extracting extra key: afterPos=%d key=%s value=%s",afterPos,key,valStr,
-                    else:
-                        _LOGGER.debug(
-                            "Extra Key %s not found in response for sensor",
-                            key,
-                            sensorKey,
-                        )
+            self.relax(0.4)  # relax a little bit to avoid idm heatpump web overloads
+            self.readEndpoint(
+                idmEndpointHeatpump,
+                self.idmHeatpumpUrl,
+                addHeader,
+                self.parseHeatpump,
+                answerData,
+            )
+            pending.remove(idmEndpointHeatpump)
 
-                afterPos = txt.find('"edesc":"_INPUTS_OUTPUTS_INFO"', startPos)
-                if afterPos == -1:
-                    _LOGGER.warning(
-                        "Wrong answer received, no values can be extracted!"
+            if (self.statDiv >= 3) and not answerData.isPartial():
+                idmUrlStat = None
+                keyValIntro = ""
+                if (self.my_counter % self.statDiv) == 0:
+                    # get statistics for runtime
+                    idmUrlStat = "http://" + self._host + idmURL_Stat_Runtime
+                    keyValIntro = "stat_runtime_"
+                elif (self.my_counter % self.statDiv) == 1:
+                    # get statistics for generated heat
+                    idmUrlStat = "http://" + self._host + idmURL_Stat_GenHeat
+                    keyValIntro = "stat_genheat_"
+                elif (self.my_counter % self.statDiv) == 2:
+                    # get statistics for electrical heat consumption
+                    idmUrlStat = "http://" + self._host + idmURL_Stat_ElCons
+                    keyValIntro = "stat_elcons_"
+                if idmUrlStat:
+                    # each statistics page is an own endpoint
+                    pending.append(keyValIntro)
+                    self.relax(1)  # relax to avoid idm heatpump web overloads
+                    self.readEndpoint(
+                        keyValIntro,
+                        idmUrlStat,
+                        addHeader,
+                        lambda txt, data: self.parseStatistics(txt, data, keyValIntro),
+                        answerData,
                     )
+                    pending.remove(keyValIntro)
+            return answerData  # return collected answer to caller
+
+        except IdmDeadlineExceeded:
+            _LOGGER.debug("Cycle budget used up, skipped endpoints %s", pending)
+            self.mergeCached(answerData, pending)
+            return answerData
+        except requests.RequestException as e:
+            # the failed and not yet read endpoints
+            self.mergeCached(answerData, pending)
+            ## redo login with pin and csrf token extraction
+            _LOGGER.warning("Exception during data fetch, redoing login" + str(e))
+            try:
+                if self.loginGuard.wait() > 0:
+                    self.loginPending = True  # no relax, the guard asks to wait
                     return answerData
+                self.relax(idmReloginRelax)  # relax to avoid idm heatpump web lockout
+                result = self.idm_login()  # we do not care about the result here, if it fails we will trzy again next time
+                self.loginPending = result == LOGIN_BACKOFF  # tried again next cycle
+            except IdmDeadlineExceeded:
+                self.loginPending = True  # the relax time passes till the next cycle
+            return answerData
+        except Exception:
+            # unknown exception occured stop task controlled, the traceback shows parser bugs
+            _LOGGER.exception(
+                "Unknown Exception during data fetch, stopping reading data!"
+            )
+            self.mergeCached(answerData, pending)
+            return answerData
 
-                # extract all defined sensor values
-                _LOGGER.debug("Parsing data response from IDM Heatpump Web")
-                startPos = afterPos
-                serviceMode = False
-                for k, v in self.idmSensorDefn.items():
-                    sensorKey = k  # by default use k as sensor key
-                    if (v == "super_heating_1") or (v == "cur_exp_power_heating"):
-                        if serviceMode:
-                            # we need to help, since service mode responses are very long
-                            afterPos = txt.find(k, startPos)
-                            if afterPos != -1:
-                                startPos = (
-                                    afterPos - 50
-                                )  # set startPos shortly before finding, so intro can be found as well
-                        else:
-                            # check if there are PV data in response
-                            startPos = txt.find('"edesc":"_PV"', startPos)
-                            if startPos == -1:
-                                break  # if not PV data break loop here to avoid endless searching for nothing
-
-                    if len(k) <= 5:
-                        searchK = k
-                        hashPos = k.find("#")
-                        if hashPos != -1:
-                            searchK = k[0:hashPos]
-                            # unfortunately some keys are used more than once, we solve this with the context (position of the data)
-                        (valStr, afterPos) = extractParameterStr(txt, startPos, searchK)
-                    else:
-                        sensorKey = v  # by long search strings (localized) use the description field as index
-                        (valStr, afterPos) = extractParameterStr(txt, startPos, "", k)
-                    # _LOGGER.debug("Parsed %s: %s", k, valStr)
-
-                    # extra interpretation of digital input values
-                    if v in (
-                        "flow_pump_on",
-                        "external_request",
-                        "ext_switch_heating_cooling",
-                        "ext_hotwater_signal",
-                        "hotwater_circulation_pump",
-                        "siphon_heating",
-                        "pump_heating_circuitA",
-                        "pump_heating_circuitC",
-                        "4way_valve_circuit1",
-                        "e_heater_1kw_on",
-                        "e_heater_2kw_on",
-                        "e_heater_3kw_on",
-                    ):
-                        if valStr == "1":
-                            valStr = "on"
-                        elif valStr == "0":
-                            valStr = "off"
-                    elif v in (
-                        "failure_eheating",
-                        "dewpoint_humidity_alarm",
-                        "high_pressure_error",
-                    ):
-                        if valStr == "1":
-                            valStr = "OK"
-                        elif valStr == "0":
-                            valStr = "Problem!"
-                    elif v in ("ew_evu_lock_contact"):
-                        if valStr == "1":
-                            valStr = "off"
-                        elif valStr == "0":
-                            valStr = "on"
-                    elif (v == "ainout_80_81") and (afterPos > startPos):
-                        serviceMode = (
-                            True  # detected Service mode, longer search needed
-                        )
+    # endpoint = cache key, url = page to read, parse = parser function(txt, data) of the page
+    # return True if fresh values were read, else still fresh cached values of the endpoint are merged
+    def readEndpoint(
+        self,
+        endpoint: str,
+        url: str,
+        headers: dict,
+        parse: Callable,
+        answerData: IdmResponseData,
+    ) -> bool:
+        """Read and parse one page, keep full results as last-good values of the endpoint."""
+        response = self.idmGet(url, headers)
+        if response.status_code == 200:
+            txt = response.text
+            if txt.find('"invalid csrf token"', 0, 128) != -1:
+                _LOGGER.warning("CSRF token invalid, redoing login")
+                ## redo login with pin and csrf token extraction
+                self.relax(1)
+                self.loginPending = self.idm_login() == LOGIN_BACKOFF
+            else:
+                part = answerData.newPart()
+                if parse(txt, part) is not False:
+                    # the session works (e.g. with the persisted token), no login needed
+                    self.loginPending = False
+                    self.loginPostponed = False
+                    if not part.isPartial():
+                        self.endpointCache[endpoint] = (time.monotonic(), part)
+                    answerData.merge(part)
+                    return True
+        self.mergeCached(answerData, [endpoint])
+        return False
 
-                    if afterPos > startPos:  # something found
-                        answerData.addResp(sensorKey, valStr)
-                        startPos = afterPos
-                    else:
-                        _LOGGER.debug("Key %s not found in response", k)
-
-                time.sleep(
-                    0.4
-                )  # relax a little bit to avoid idm heatpump web overloads
-                response = self.session.get(
-                    self.idmHeatpumpUrl, headers=addHeader, timeout=self._timeout
+    def mergeCached(self, answerData: IdmResponseData, endpoints: list[str]) -> None:
+        """Merge the still fresh last-good values of the endpoints, with their age."""
+        now = time.monotonic()
+        for endpoint in endpoints:
+            cached = self.endpointCache.get(endpoint)
+            if cached is None:
+                continue
+            age = now - cached[0]
+            if age > idmCacheMaxAge:
+                # too old, better no value than a wrong one
+                del self.endpointCache[endpoint]
+                continue
+            _LOGGER.debug("Using cached %s values, age %d seconds", endpoint, age)
+            answerData.merge(cached[1], age)
+
+    # txt = settings.php response, answerData = parsed values are added here
+    # return False if the frame is not usable, like parseSettings
+    def parseSettingsAndWrites(self, txt: str, answerData: IdmResponseData) -> bool:
+        """Parse the settings.php response and read back the queued writes."""
+        ok = self.parseSettings(txt, answerData)
+        if ok is not False and self.writes:
+            # only a settings frame tells, if a parameter is unknown or was written
+            self.writes.observe(txt)
+        return ok
+
+    def sendWrites(self) -> None:
+        """Send the due writes, after the reads of the cycle and in its session lock."""
+        if not self.writes:
+            return
+        putHeader = {
+            "Content-Type": "application/json;charset=utf-8",
+            "CSRF-Token": self.csrf_token,
+        }
+        for paramId, body in self.writes.due(time.monotonic()):
+            ok = False
+            try:
+                self.relax(idmWriteGap)
+                response = self.timedRequest(
+                    "PUT",
+                    self.idmDataUrl,
+                    data=json.dumps(body, ensure_ascii=False).encode("utf-8"),
+                    headers=putHeader,
                 )
-                if response.status_code == 200:
-                    txt = response.text
-                    startPos = txt.find('{"flow":{')
-                    while startPos != -1:
-                        hc_mode = ""  # default for not found
-                        afterPos = txt.find(
-                            '"hcmode":', startPos, startPos + idmReadAheadBlock
-                        )
-                        if afterPos > startPos:
-                            if txt[afterPos + 9] == "0":
-                                hc_mode = "off"
-                            elif txt[afterPos + 9] == "1":
-                                hc_mode = "heating"
-                            elif txt[afterPos + 9] == "2":
-                                hc_mode = "cooling"  # according ModbusTCP documentation, this should be correct
-                            else:
-                                hc_mode = txt[afterPos + 9]
-
-                        (valStr, afterPos) = extractParameterRaw(
-                            txt,
-                            startPos,
-                            startPos + idmReadAheadBlock,
-                            '"temperatures":{',
-                            '"set":"',
-                            '"',
-                        )
-                        if afterPos > startPos:
-                            startPos = afterPos
-                            afterPos = txt.find('"hk":"', startPos)
-                            if afterPos != -1:
-                                heatCircuitLetter = txt[afterPos + 6]
-                                if (heatCircuitLetter >= "A") and (
-                                    heatCircuitLetter <= "G"
-                                ):
-                                    answerData.addResp(
-                                        "flow_temp_set_hc_" + heatCircuitLetter,
-                                        valStr,
-                                    )
-                                    if hc_mode != "":
-                                        answerData.addResp(
-                                            "mode_heatcirc_" + heatCircuitLetter,
-                                            hc_mode,
-                                        )
-                                startPos = afterPos
-                            else:
-                                afterPos = (
-                                    startPos  # restore afterPos for futher values
-                                )
-                                startPos = -1  # to abort this while loop
-                        else:
-                            startPos = -1  # this aborts while loop
-
-                    startPos = afterPos  # search new values after heat circuit set temperatures
-                    (valStr, afterPos) = extractParameterRaw(
-                        txt,
-                        startPos,
-                        startPos + idmReadAheadBlock,
-                        '"pv":{',
-                        '"hp":"',
-                        '"',
+                ok = (
+                    response.status_code == 200
+                    and response.text.find('"status": "OK"') != -1
+                )
+            except IdmDeadlineExceeded:
+                return  # the rest is written with the next cycle
+            except Exception as e:  # noqa: BLE001
+                _LOGGER.warning("Write of %s failed: %s", paramId, e)
+            self.writes.sent(paramId, body, ok)
+
+    # txt = settings.php response, answerData = parsed values are added here
+    # return False if the frame is not usable (unknown language or wrong frame)
+    def parseSettings(self, txt: str, answerData: IdmResponseData) -> bool:
+        """Parse the settings.php response (general, io, service and pv values)."""
+        # the detected language is kept, as long as its identification string is found
+        startPos = txt.find(self.iDM_IdentificationString)
+        if startPos == -1:
+            # first frame or structural mismatch, check all known languages with one scan
+            match = idmLanguageSignatures.search(txt)
+            if match is None:
+                _LOGGER.warning(
+                    "Identification string not found, wrong frame, or unknown language!"
+                )
+                # nothing else to do with this frame, discard it and stop processing here
+                return False
+            language = idmLanguageOfSignature[match.group()]
+            _LOGGER.debug("Language of the web interface detected: %s", language)
+            self.setLanguage(language)
+            self.keyMisses.clear()  # learned for the other language
+            self.keyOffsets.clear()
+            startPos = match.start()
+
+        if not answerData.isPartial():
+            self.my_counter += 1  # count this loop (full updates only)
+
+        # one pass over the payload finds all sections, each value group is searched in its own section only
+        sections = indexSections(txt)
+        ioSection = sections.get(idmSectionIO)
+        generalEnd = len(txt)
+        if ioSection is not None and ioSection[0] > startPos:
+            # the general values are read ahead like before, but never from the io values
+            generalEnd = ioSection[0]
+        afterPos = 0
+        for i in self.idmExtraDefn:
+            (key, startDel, endDel, sensorKey) = i
+            if not answerData.wants(sensorKey):
+                continue
+            # _LOGGER.debug("Extracting extra key: startPos=%d key=%s", startPos, key)
+            (valStr, afterPos) = extractParameterRaw(
+                txt,
+                startPos,
+                min(startPos + idmReadAheadBlock, generalEnd),
+                key,
+                startDel,
+                endDel,
+            )
+            if afterPos > startPos:  # something found
+                answerData.addResp(sensorKey, valStr)
+                startPos = afterPos
+                # _LOGGER.debug("Extracting extra key: afterPos=%d key=%s value=%s",afterPos,key,valStr,
+            else:
+                _LOGGER.debug(
+                    "Extra Key %s not found in response for sensor",
+                    key,
+                    sensorKey,
+                )
+
+        if ioSection is None:
+            _LOGGER.warning("Wrong answer received, no values can be extracted!")
+            return False
+        pvSection = sections.get(idmSectionPV)
+        groupBounds = {
+            "io": ioSection,
+            # service values (service mode only) follow the io values, up to the pv data
+            "service": (ioSection[0], pvSection[0] if pvSection else len(txt)),
+            "pv": pvSection,  # None if no PV is configured
+        }
+
+        # extract all defined sensor values
+        _LOGGER.debug("Parsing data response from IDM Heatpump Web")
+        startPos = ioSection[0]
+        # partial parses skip the AInOut row like all rows not wanted, they cannot see
+        # the service mode (lastServiceMode is only updated by full parses)
+        serviceMode = False
+        for group, definitions in self.idmSensorGroups:
+            if groupBounds[group] is None or answerData.allFound():
+                continue
+            (groupStart, groupEnd) = groupBounds[group]
+            startPos = max(startPos, groupStart)
+            foundInGroup = False
+            for k, v in definitions:
+                if answerData.allFound():
+                    # partial update, all wanted keys found, skip the rest of the frame
+                    break
+                sensorKey = k  # by default use k as sensor key
+                # till the first row of a group is found, its whole section is searched (long service mode responses)
+                endPos = groupEnd
+                if foundInGroup:
+                    endPos = min(startPos + idmReadAheadBlock, groupEnd)
+
+                if len(k) <= 5:
+                    searchK = k
+                    hashPos = k.find("#")
+                    if hashPos != -1:
+                        searchK = k[0:hashPos]
+                        # unfortunately some keys are used more than once, we solve this with the context (position of the data)
+                    if not answerData.wants(searchK):
+                        # partial update, the next wanted row is searched from here
+                        continue
+                    if self.isAbsent(k, v):
+                        continue
+                    # duplicate keys are found by context only, near their last offset could be the wrong one
+                    hint = self.keyOffsets.get(k, -1) if hashPos == -1 else -1
+                    (valStr, afterPos) = extractParameterStr(
+                        txt, startPos, searchK, "", hint, endPos
                     )
-                    if afterPos > startPos:
-                        answerData.addResp(
-                            "cur_el_power_pre",
-                            valStr,
-                        )
-                    startPos = afterPos  # search new values after heat circuit set temperatures
-                    (valStr, afterPos) = extractParameterRaw(
-                        txt,
-                        startPos,
-                        startPos + idmReadAheadBlock,
-                        '"system":{"q":{',
-                        '"value":"',
-                        '"',
+                else:
+                    sensorKey = v  # by long search strings (localized) use the description field as index
+                    if not answerData.wants(v) or self.isAbsent(k, v):
+                        continue
+                    hint = self.keyOffsets.get(k, -1)
+                    (valStr, afterPos) = extractParameterStr(
+                        txt, startPos, "", k, hint, endPos
                     )
-                    if afterPos > startPos:
+                # _LOGGER.debug("Parsed %s: %s", k, valStr)
+
+                # extra interpretation of digital input values
+                if v in (
+                    "flow_pump_on",
+                    "external_request",
+                    "ext_switch_heating_cooling",
+                    "ext_hotwater_signal",
+                    "hotwater_circulation_pump",
+                    "siphon_heating",
+                    "pump_heating_circuitA",
+                    "pump_heating_circuitC",
+                    "4way_valve_circuit1",
+                    "e_heater_1kw_on",
+                    "e_heater_2kw_on",
+                    "e_heater_3kw_on",
+                ):
+                    if valStr == "1":
+                        valStr = "on"
+                    elif valStr == "0":
+                        valStr = "off"
+                elif v in (
+                    "failure_eheating",
+                    "dewpoint_humidity_alarm",
+                    "high_pressure_error",
+                ):
+                    if valStr == "1":
+                        valStr = "OK"
+                    elif valStr == "0":
+                        valStr = "Problem!"
+                elif v in ("ew_evu_lock_contact"):
+                    if valStr == "1":
+                        valStr = "off"
+                    elif valStr == "0":
+                        valStr = "on"
+                elif (v == "ainout_80_81") and (afterPos > startPos):
+                    serviceMode = True  # detected Service mode
+
+                if afterPos > startPos:  # something found
+                    answerData.addResp(sensorKey, valStr, extractUnit(txt, afterPos))
+                    startPos = afterPos
+                    foundInGroup = True
+                    self.keyOffsets[k] = afterPos
+                    self.keyMisses.pop(k, None)
+                else:
+                    _LOGGER.debug("Key %s not found in response", k)
+                    if not answerData.isPartial():
+                        self.keyMisses[k] = self.keyMisses.get(k, 0) + 1
+
+        if not answerData.isPartial() and serviceMode != self.lastServiceMode:
+            # service mode changes the payload completely, learn absent keys and offsets again
+            self.lastServiceMode = serviceMode
+            self.keyMisses.clear()
+            self.keyOffsets.clear()
+        return True
+
+    def setLanguage(self, language: str) -> None:
+        """Use the definitions of language for parsing and writing."""
+        (
+            self.iDM_IdentificationString,
+            self.idmExtraDefn,
+            self.idmSensorDefn,
+            self.idmSensorGroups,
+            self.idmStatDefn,
+            self.idmSettime_HTTP_PUT_Str,
+        ) = idmLanguages[language]
+        self.idmLanguage = language
+
+    def isAbsent(self, k: str, v: str) -> bool:
+        """Return True, if the key was learned to be absent on this heatpump and is not probed now."""
+        if v == "ainout_80_81":
+            return False  # always searched, it detects the service mode
+        return (self.keyMisses.get(k, 0) >= idmAbsentMisses) and (
+            self.my_counter % idmAbsentReprobe != 0
+        )
+
+    def parseHeatpump(self, txt: str, answerData: IdmResponseData) -> None:
+        """Parse the heatpump.php response (heat circuits, power and states)."""
+        startPos = txt.find('{"flow":{')
+        # no heat circuit block, the values below are searched from the start
+        afterPos = 0
+        while startPos != -1:
+            hc_mode = ""  # default for not found
+            afterPos = txt.find('"hcmode":', startPos, startPos + idmReadAheadBlock)
+            if afterPos > startPos:
+                if txt[afterPos + 9] == "0":
+                    hc_mode = "off"
+                elif txt[afterPos + 9] == "1":
+                    hc_mode = "heating"
+                elif txt[afterPos + 9] == "2":
+                    hc_mode = "cooling"  # according ModbusTCP documentation, this should be correct
+                else:
+                    hc_mode = txt[afterPos + 9]
+
+            (valStr, afterPos) = extractParameterRaw(
+                txt,
+                startPos,
+                startPos + idmReadAheadBlock,
+                '"temperatures":{',
+                '"set":"',
+                '"',
+            )
+            if afterPos > startPos:
+                startPos = afterPos
+                afterPos = txt.find('"hk":"', startPos)
+                if afterPos != -1:
+                    heatCircuitLetter = txt[afterPos + 6]
+                    if (heatCircuitLetter >= "A") and (heatCircuitLetter <= "G"):
                         answerData.addResp(
-                            "cur_heat_power",
+                            "flow_temp_set_hc_" + heatCircuitLetter,
                             valStr,
                         )
-                        self.hasQheatSensor = 1  # we have seen the Q value, so a gen. heat sesnor is available (may not be the case for all iDM heatpumps)
-                    elif self.hasQheatSensor == 1:
-                        # if we previously have seen a Q sensor, not providing it now means 0 heat generation, however do not create sensor, if no sensor have seen at all
-                        answerData.addResp(
-                            "cur_heat_power",
-                            "0.0",
-                        )
+                        if hc_mode != "":
+                            answerData.addResp(
+                                "mode_heatcirc_" + heatCircuitLetter,
+                                hc_mode,
+                            )
                     startPos = afterPos
-                    afterPos = txt.find(
-                        '"stages":', startPos, startPos + idmReadAheadBlock
-                    )
-                    valStr = "off"  # there is no value for compressor off, therefore we default it to off
-                    if afterPos > startPos:
-                        # if stages exist, it means the heatpump compressor or heater runs
-                        valStr = txt[afterPos + 9]
-                        if valStr == "0":
-                            valStr = "on_0"  # not expected, but added to be shown in case it happens...
-                        elif valStr == "1":
-                            valStr = "on"
-                        elif valStr == "2":
-                            valStr = "on_2"  # assuming this is seens as the 2nd source
-                        # we do not expect other values than 0,1,2 if it occurs we just leave it to the entity...
-                        startPos = afterPos
-                    answerData.addResp(  # this is special to compressor state, we always write the state, even attribute is not found
-                        "heatpump_compressor",
-                        valStr,
-                    )
-                    afterPos = txt.find(
-                        '"sysmode":', startPos, startPos + idmReadAheadBlock
-                    )
-                    if afterPos > startPos:
-                        valStr = txt[afterPos + 10]
-                        if valStr == "0":
-                            valStr = "off"
-                        elif valStr == "1":
-                            valStr = "heating"
-                        elif valStr == "2":
-                            valStr = "cooling"
-                        elif valStr == "4":
-                            valStr = "hotwater"
-                        elif valStr == "8":
-                            valStr = "defrost"
-
-                        # we do not expect other values than 0 to 8, if it occurs we just leave it to the entity...
+                else:
+                    afterPos = startPos  # restore afterPos for futher values
+                    startPos = -1  # to abort this while loop
+            else:
+                startPos = -1  # this aborts while loop
+
+        startPos = afterPos  # search new values after heat circuit set temperatures
+        (valStr, afterPos) = extractParameterRaw(
+            txt,
+            startPos,
+            startPos + idmReadAheadBlock,
+            '"pv":{',
+            '"hp":"',
+            '"',
+        )
+        if afterPos > startPos:
+            answerData.addResp(
+                "cur_el_power_pre",
+                valStr,
+            )
+        startPos = afterPos  # search new values after heat circuit set temperatures
+        (valStr, afterPos) = extractParameterRaw(
+            txt,
+            startPos,
+            startPos + idmReadAheadBlock,
+            '"system":{"q":{',
+            '"value":"',
+            '"',
+        )
+        if afterPos > startPos:
+            answerData.addResp(
+                "cur_heat_power",
+                valStr,
+            )
+            self.hasQheatSensor = 1  # we have seen the Q value, so a gen. heat sesnor is available (may not be the case for all iDM heatpumps)
+        elif self.hasQheatSensor == 1:
+            # if we previously have seen a Q sensor, not providing it now means 0 heat generation, however do not create sensor, if no sensor have seen at all
+            answerData.addResp(
+                "cur_heat_power",
+                "0.0",
+            )
+        startPos = afterPos
+        afterPos = txt.find('"stages":', startPos, startPos + idmReadAheadBlock)
+        valStr = "off"  # there is no value for compressor off, therefore we default it to off
+        if afterPos > startPos:
+            # if stages exist, it means the heatpump compressor or heater runs
+            valStr = txt[afterPos + 9]
+            if valStr == "0":
+                valStr = (
+                    "on_0"  # not expected, but added to be shown in case it happens...
+                )
+            elif valStr == "1":
+                valStr = "on"
+            elif valStr == "2":
+                valStr = "on_2"  # assuming this is seens as the 2nd source
+            # we do not expect other values than 0,1,2 if it occurs we just leave it to the entity...
+            startPos = afterPos
+        answerData.addResp(  # this is special to compressor state, we always write the state, even attribute is not found
+            "heatpump_compressor",
+            valStr,
+        )
+        afterPos = txt.find('"sysmode":', startPos, startPos + idmReadAheadBlock)
+        if afterPos > startPos:
+            valStr = txt[afterPos + 10]
+            if valStr == "0":
+                valStr = "off"
+            elif valStr == "1":
+                valStr = "heating"
+            elif valStr == "2":
+                valStr = "cooling"
+            elif valStr == "4":
+                valStr = "hotwater"
+            elif valStr == "8":
+                valStr = "defrost"
+
+            # we do not expect other values than 0 to 8, if it occurs we just leave it to the entity...
+            answerData.addResp(
+                "heatpump_op_mode",
+                valStr,
+            )
+
+    # keyValIntro = prefix of the statistics type, e.g. "stat_runtime_"
+    def parseStatistics(
+        self, txt: str, answerData: IdmResponseData, keyValIntro: str
+    ) -> None:
+        """Parse a statistics.php response."""
+        startPos = txt.find(',"total":')
+        if startPos != -1:
+            index = 0
+            foundStat = [0] * len(self.idmStatDefn)
+            for k, v in self.idmStatDefn.items():
+                (valStr, afterPos) = extractParameterRaw(
+                    txt,
+                    startPos,
+                    startPos + idmReadAheadBlock,
+                    k,
+                    '"value":',
+                    "}",
+                )
+                if afterPos > startPos:  # something found
+                    answerData.addResp(keyValIntro + "total_" + v, valStr)
+                    startPos = afterPos
+                    foundStat[index] = 1
+                else:
+                    _LOGGER.debug("Key %s not found in response", k)
+                index += 1
+
+            index = 0
+            (valStr, afterPos) = extractParameterRaw(
+                txt,
+                startPos,
+                startPos + idmReadAheadBlock,
+                ',"yearly":[',
+                '"values":[[',
+                ",",
+            )
+            if afterPos > startPos:
+                for k, v in self.idmStatDefn.items():
+                    if foundStat[index] == 1:
+                        if (
+                            valStr == ""
+                        ):  # happens for defrost at begin of year, prevent writing unvalid string to entity
+                            valStr = "0.0"
                         answerData.addResp(
-                            "heatpump_op_mode",
+                            keyValIntro + "cur_year_" + v,
                             valStr,
                         )
+                        startPos = afterPos
+                        while (afterPos < len(txt)) and (
+                            ((txt[afterPos] >= "0") and (txt[afterPos] <= "9"))
+                            or (txt[afterPos] == ".")
+                        ):
+                            afterPos += 1
+                        valStr = txt[startPos:afterPos]
+                        while (afterPos < len(txt)) and (
+                            (txt[afterPos] == ",")
+                            or (txt[afterPos] == "[")
+                            or (txt[afterPos] == "]")
+                        ):
+                            afterPos += 1
+                    index += 1
 
-                if self.statDiv >= 3:
-                    idmUrlStat = None
-                    keyValIntro = ""
-                    if (self.my_counter % self.statDiv) == 0:
-                        # get statistics for runtime
-                        idmUrlStat = "http://" + self._host + idmURL_Stat_Runtime
-                        keyValIntro = "stat_runtime_"
-                    elif (self.my_counter % self.statDiv) == 1:
-                        # get statistics for generated heat
-                        idmUrlStat = "http://" + self._host + idmURL_Stat_GenHeat
-                        keyValIntro = "stat_genheat_"
-                    elif (self.my_counter % self.statDiv) == 2:
-                        # get statistics for electrical heat consumption
-                        idmUrlStat = "http://" + self._host + idmURL_Stat_ElCons
-                        keyValIntro = "stat_elcons_"
-                    if idmUrlStat:
-                        time.sleep(1)  # relax to avoid idm heatpump web overloads
-                        response = self.session.get(
-                            idmUrlStat, headers=addHeader, timeout=self._timeout
-                        )
-                        if response.status_code == 200:
-                            txt = response.text
-
-                            startPos = txt.find(',"total":')
-                            if startPos != -1:
-                                index = 0
-                                foundStat = [0] * len(self.idmStatDefn)
-                                for k, v in self.idmStatDefn.items():
-                                    (valStr, afterPos) = extractParameterRaw(
-                                        txt,
-                                        startPos,
-                                        startPos + idmReadAheadBlock,
-                                        k,
-                                        '"value":',
-                                        "}",
-                                    )
-                                    if afterPos > startPos:  # something found
-                                        answerData.addResp(
-                                            keyValIntro + "total_" + v, valStr
-                                        )
-                                        startPos = afterPos
-                                        foundStat[index] = 1
-                                    else:
-                                        _LOGGER.debug("Key %s not found in response", k)
-                                    index += 1
-
-                                index = 0
-                                (valStr, afterPos) = extractParameterRaw(
-                                    txt,
-                                    startPos,
-                                    startPos + idmReadAheadBlock,
-                                    ',"yearly":[',
-                                    '"values":[[',
-                                    ",",
-                                )
-                                if afterPos > startPos:
-                                    for k, v in self.idmStatDefn.items():
-                                        if foundStat[index] == 1:
-                                            if (
-                                                valStr == ""
-                                            ):  # happens for defrost at begin of year, prevent writing unvalid string to entity
-                                                valStr = "0.0"
-                                            answerData.addResp(
-                                                keyValIntro + "cur_year_" + v,
-                                                valStr,
-                                            )
-                                            startPos = afterPos
-                                            while (afterPos < len(txt)) and (
-                                                (
-                                                    (txt[afterPos] >= "0")
-                                                    and (txt[afterPos] <= "9")
-                                                )
-                                                or (txt[afterPos] == ".")
-                                            ):
-                                                afterPos += 1
-                                            valStr = txt[startPos:afterPos]
-                                            while (afterPos < len(txt)) and (
-                                                (txt[afterPos] == ",")
-                                                or (txt[afterPos] == "[")
-                                                or (txt[afterPos] == "]")
-                                            ):
-                                                afterPos += 1
-                                        index += 1
-                if self.clkSet != 0:
-                    # we should check iDM clock and correct it in case out of sync
-                    # accept self.clkSet as max. deviation, if bigger, correct clock, if tooooo big, generate error message and do not touch
-
-                    # Developer info: Since HA decided to have only UIC time internally, all easy python local timestamp functions are destroyed
-                    # Thanks community for this crazy decision. Python would offer UTC on all locals, but they know everything better and destroyed it.
-                    # Due to that, the defined a buggy dt helper, which should do the trick to have actual local time
-                    # However only 50% of it is working and instead of converting a UTC time to local with dt_util.as_local() it just adds the timezone in the end, but not coverts the time
-                    # Luckily the dt_util.now seems to work and actually return the time properly. Cross fingers this will stay like this ...
-
-                    if dt_util.now().hour == self.clkSetHour:
-                        if not self.clkCheckSetToday:
-                            time.sleep(
-                                0.4
-                            )  # relax a little bit to avoid idm heatpump web overloads
-                            _LOGGER.info("Checking for time sync needs ..")
-                            response = self.session.get(
-                                self.idmInfoUrl,
-                                headers=addHeader,
-                                timeout=self._timeout,
-                            )
-                            compareTime = dt_util.now()  # store compare time as close as possible after receiving data
-                            if response.status_code == 200:
-                                txt = response.text
-                                startPos = txt.find('"datetime":"')
-                                if startPos != -1:
-                                    idmTime = txt[startPos + 12 : startPos + 31]
-                                    dtIdm = datetime.strptime(
-                                        idmTime, "%Y-%m-%d %H:%M:%S"
-                                    )
-                                    delta = abs(
-                                        (
-                                            dtIdm - compareTime.replace(tzinfo=None)
-                                        ).total_seconds()
-                                    )  # we need to remove the local string, because the dtIdm object do not have it as well
-                                    if (
-                                        delta > (60 * 35)
-                                    ):  # if time difference is more than 35 minutes, something is very wrong, do not touch ...
-                                        _LOGGER.warning(
-                                            "Timesync: Detected a very big time difference! Adjust iDM clock manually before autosync keeps it in sync"
-                                            + "Detected deviation: "
-                                            + str(round(delta / 60, 2))
-                                            + " minutes; Max. allowed are 35 minutes."
-                                        )
-
-                                    elif delta > (self.clkSet + 0.5):
-                                        # deviation is bigger than acceptable, therefore start correction now...
-                                        _LOGGER.info(
-                                            " .. Timesync actually needed! Diff: "
-                                            + str(round(delta, 2))
-                                        )
-                                        time.sleep(0.4)
-                                        setIdmTime = (
-                                            dt_util.now() + timedelta(seconds=2)
-                                        )  # emperical tests showed, adding 2 seconds give most accurate results
-                                        setDateData = (
-                                            self.idmSettime_HTTP_PUT_Str
-                                            + setIdmTime.strftime(
-                                                "%Y-%m-%dT%H:%M:%S.%f"
-                                            )[:-3]
-                                            + 'Z"}'
-                                        )
-                                        htPut = self.session.put(
-                                            self.idmDataUrl,
-                                            setDateData,
-                                            headers=postIDMHeader,
-                                            timeout=self._timeout,
-                                        )
-                                        if htPut.status_code != 200:
-                                            _LOGGER.warning(
-                                                ".. Timesync received unexpected response code, did not work! Code: "
-                                                + str(htPut.status_code)
-                                            )
-                                        afterPos = htPut.text.find('"status": "OK"')
-                                        if afterPos == -1:
-                                            _LOGGER.warning(
-                                                ".. Timesync received unexpected answer, may not work: Answer: "
-                                                + htPut.text
-                                            )
-                                            # log warning, timesync received unexpected result, may not working
-                                    else:
-                                        _LOGGER.info(
-                                            " .. Timesync not needed! Diff: "
-                                            + str(round(delta, 2))
-                                        )
-
-                            self.clkCheckSetToday = True
-                    else:
-                        self.clkCheckSetToday = False
-
-            return answerData  # return collected answer to caller
 
-        except requests.RequestException as e:
-            ## redo login with pin and csrf token extraction
-            _LOGGER.warning("Exception during data fetch, redoing login" + str(e))
-            time.sleep(10)  # relax to avoid idm heatpump web lockout
-            result = self.idm_login()  # we do not care about the result here, if it fails we will trzy again next time
-            return answerData
-        except:
-            # unknown exception occured stop task controlled
-            _LOGGER.warning(
-                "Unknown Exception during data fetch, stopping reading data!"
-            )
-            return answerData
+# return a requests session for one device: a small keep-alive pool and compressed responses
+def createSession():
+    import requests  # noqa: PLC0415 - loaded with the first heatpump, not at HA boot
+    from requests.adapters import HTTPAdapter  # noqa: PLC0415
 
-        return answerData
+    session = requests.Session()
+    # one host only, retries are done by the next cycle (with a new login if needed)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=idmPoolSize, max_retries=0)
+    session.mount("http://", adapter)
+    session.headers.update({"Connection": "keep-alive", "Accept-Encoding": "gzip"})
+    return session
 
 
 def blocking_idm_login_function(idm: idmHeatpumpWeb) -> str:
     """Validate the user input allows us to connect."""
     try:
-        return idm.idm_login()
+        with idm.sessionLock:
+            return idm.idm_login()
 
     except Exception:
         return "unknown"
     # return "unknown"
 
 
-def blocking_idm_get_data_function(idm: idmHeatpumpWeb) -> IdmResponseData:
-    """Get data from the heatpump web interface."""
-    emptyData = IdmResponseData()
+def blocking_idm_get_data_function(
+    idm: idmHeatpumpWeb,
+    keys: frozenset[str] | None = None,
+    deadline: float | None = None,
+) -> IdmResponseData:
+    """Get data from the heatpump web interface, within the cycle deadline if given."""
+    emptyData = IdmResponseData(keys)
+    wait = -1 if deadline is None else max(0.0, deadline - time.monotonic())
+    if not idm.sessionLock.acquire(timeout=wait):
+        _LOGGER.debug("Session busy till the cycle deadline, cycle skipped")
+        return emptyData
     try:
-        return idm.get_DataUpdate()
+        idm.deadline = deadline
+        data = idm.get_DataUpdate(keys)
+        idm.sendWrites()  # queued settings, read back with the next cycle
+        return data
 
     except Exception:
+        _LOGGER.exception("Data cycle failed, no values in this cycle")
         return emptyData
+    finally:
+        idm.deadline = None
+        idm.sessionLock.release()
     # return emptyData
 
 
@@ -828,18 +1241,19 @@ def blocking_idm_get_data_function(idm: idmHeatpumpWeb) -> IdmResponseData:
 # valueIntro = key for value intro
 # valueEnding = key for value ending
 # return (string, afterPos) a tuple of the valueString and the position in text after that value string
+# not found: ("", startPos), the callers test afterPos > startPos
 def extractParameterRaw(txt, startPos, endPos, searchStrKey, valueIntro, valueEnding):
     startP = txt.find(searchStrKey, startPos, endPos)
     if startP == -1:
-        return ("SearchStrKey <" + searchStrKey + "> not found", startPos)
+        return ("", startPos)  # no allocation per miss, callers test afterPos
     newPos = startP + len(searchStrKey)
     startPosVal = txt.find(valueIntro, newPos, endPos)
     if startPosVal == -1:
-        return ("Value intro not found", startPos)
+        return ("", startPos)
     newPos = startPosVal + len(valueIntro)
     endPosVal = txt.find(valueEnding, newPos, endPos)
     if endPosVal == -1:
-        return ("Value ending not found", startPos)
+        return ("", startPos)
 
     return (txt[newPos:endPosVal], endPosVal + len(valueEnding))
 
@@ -847,16 +1261,62 @@ def extractParameterRaw(txt, startPos, endPos, searchStrKey, valueIntro, valueEn
 # txt = text to search value for,
 # startpos = index where to start (to overjump begin of string for performance and avoid ambiguity)
 # pattern = pattern or idmKey description e.g. "B32"
+# hint = position after the value in the last payload, the row is searched around it first (-1 = no hint)
+# endPos = index where search ends, None for the read ahead block behind startPos
 # return (string, afterPos) a tuple of the valueString and the position in text after that value string
-def extractParameterStr(txt, startPos, pattern, descr=""):
+def extractParameterStr(txt, startPos, pattern, descr="", hint=-1, endPos=None):
     searchStr = idmKeyIntro + pattern + idmKeyEnding
     if descr != "":
         searchStr = idmDescrIntro + descr
+    if endPos is None:
+        endPos = startPos + idmReadAheadBlock
+    if hint >= 0:
+        rowPos = txt.find(
+            searchStr,
+            max(startPos, hint - idmHintSlack),
+            min(hint + len(searchStr), endPos),
+        )
+        if rowPos != -1:
+            # found near the last offset, skip the scan up to it
+            (valStr, afterPos) = extractParameterRaw(
+                txt, rowPos, endPos, searchStr, idmValueIntro, idmValueEnding
+            )
+            if afterPos > rowPos:
+                return (valStr, afterPos)
+            return ("", startPos)  # a miss reports the start of the caller
     return extractParameterRaw(
         txt,
         startPos,
-        startPos + idmReadAheadBlock,
+        endPos,
         searchStr,
         idmValueIntro,
         idmValueEnding,
     )
+
+
+# txt = settings.php response, afterPos = position after a value found by extractParameterStr
+# return the unit of the value (next table cell), None if the row has no unit
+def extractUnit(txt, afterPos):
+    endPos = txt.find("</td>", afterPos, afterPos + 32)
+    if endPos <= afterPos:
+        return None
+    return txt[afterPos:endPos]
+
+
+# txt = settings.php response
+# return dict section name -> (start, end) of all "edesc" sections, found in one pass over txt
+def indexSections(txt):
+    sections = {}
+    pos = txt.find(idmSectionIntro)
+    while pos != -1:
+        nameStart = pos + len(idmSectionIntro)
+        nameEnd = txt.find('"', nameStart)
+        if nameEnd == -1:
+            break
+        nextPos = txt.find(idmSectionIntro, nameEnd)
+        # a section ends where the next one starts, the first one of a name counts
+        sections.setdefault(
+            txt[nameStart:nameEnd], (pos, nextPos if nextPos != -1 else len(txt))
+        )
+        pos = nextPos
+    return sections
@@ -0,0 +1,76 @@
+# Impact of the update cycle on the HA event loop and the shared executor
+
+import asyncio
+import time
+import statistics
+
+from collections import deque
+
+IMPACT_EXECUTOR = "executor_time"  # fetch and parse in the executor
+IMPACT_QUEUE_WAIT = "executor_queue_wait"  # submitted till started in the executor
+IMPACT_LOOP = "loop_time"  # processing of the data (entity writes) on the event loop
+IMPACT_LOOP_LAG = "loop_lag"  # loop busy after the update (listeners of the writes)
+IMPACT_METRICS = (IMPACT_EXECUTOR, IMPACT_QUEUE_WAIT, IMPACT_LOOP, IMPACT_LOOP_LAG)
+
+idmImpactSamples = 100  # last cycles kept per metric
+
+
+class IdmImpactMonitor:
+    """Measure how much each update cycle costs the event loop and the executor.
+
+    The times of the last cycles are kept per metric in seconds. The loop lag is the
+    delay of a callback scheduled right after the entity writes: it contains all work
+    queued on the loop before it, e.g. the state changed listeners of our writes.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the monitor."""
+        self.samples = {
+            metric: deque(maxlen=idmImpactSamples) for metric in IMPACT_METRICS
+        }
+        self.listeners = []  # called after each cycle (sensors)
+
+    def add(self, metric: str, seconds: float) -> None:
+        """Add one measurement."""
+        self.samples[metric].append(seconds)
+
+    def addJobTimes(self, jobTimes: tuple[float, float] | None) -> None:
+        """Add (queue wait, duration) of the executor job of a cycle."""
+        if jobTimes:
+            self.add(IMPACT_QUEUE_WAIT, jobTimes[0])
+            self.add(IMPACT_EXECUTOR, jobTimes[1])
+
+    def measureLoopLag(self) -> None:
+        """Measure the loop lag after the update, on the event loop."""
+        loop = asyncio.get_running_loop()
+        scheduled = time.perf_counter()
+
+        def _lag() -> None:
+            self.add(IMPACT_LOOP_LAG, time.perf_counter() - scheduled)
+            for listener in self.listeners:
+                listener()
+
+        loop.call_soon(_lag)
+
+    def last(self, metric: str) -> float | None:
+        """Return the last measurement of metric in seconds."""
+        samples = self.samples[metric]
+        return samples[-1] if samples else None
+
+    def summary(self) -> dict:
+        """Return last, mean, p95 and max per metric in milliseconds (diagnostics)."""
+        result = {}
+        for metric, samples in self.samples.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            result[metric] = {
+                "cycles": len(ordered),
+                "last_ms": round(samples[-1] * 1000, 3),
+                "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+                "p95_ms": round(
+                    ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 3
+                ),
+                "max_ms": round(ordered[-1] * 1000, 3),
+            }
+        return result
@@ -0,0 +1,70 @@
+# Latency tracking per idm web endpoint, the request timeouts are derived from it
+
+from collections import deque
+
+idmLatencySamples = 100  # last request durations kept per endpoint
+idmLatencyMinSamples = 10  # below this the configured timeout is used
+idmLatencyPercentile = 0.99
+idmLatencyFactor = 1.5  # timeout = p99 * factor + margin
+idmLatencyMargin = 0.5  # seconds
+idmTimeoutMin = 1.0  # seconds, lower bound of an adaptive timeout
+# upper bound of an adaptive timeout in multiples of the configured one
+idmTimeoutMaxFactor = 3
+
+
+class IdmLatencyTracker:
+    """Keep the recent request durations of each endpoint and derive its timeout.
+
+    The timeout is the p99 of the last durations plus a margin, bounded by idmTimeoutMin
+    and a multiple of the configured timeout. A hanging request on a fast page fails
+    quickly, a slow but healthy page (statistics) still gets the time it needs. A
+    request ending with a timeout is counted with its full duration, so the timeout of
+    an endpoint grows again when it gets slower.
+    """
+
+    def __init__(self, timeout: float) -> None:
+        """Initialize the tracker, timeout = configured timeout in seconds."""
+        self.setTimeout(timeout)
+        self._samples = {}  # endpoint -> deque of durations in seconds
+
+    def setTimeout(self, timeout: float) -> None:
+        """Change the configured timeout, the measured durations are kept."""
+        self.timeout = timeout
+        self.maxTimeout = timeout * idmTimeoutMaxFactor
+
+    def observe(self, endpoint: str, duration: float) -> None:
+        """Add the duration of one request to the endpoint."""
+        samples = self._samples.get(endpoint)
+        if samples is None:
+            samples = self._samples[endpoint] = deque(maxlen=idmLatencySamples)
+        samples.append(duration)
+
+    def percentile(self, endpoint: str, fraction: float = idmLatencyPercentile):
+        """Return the percentile of the durations of endpoint, None without enough samples."""
+        samples = self._samples.get(endpoint)
+        if not samples or len(samples) < idmLatencyMinSamples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def timeoutFor(self, endpoint: str) -> float:
+        """Return the request timeout for endpoint in seconds."""
+        p99 = self.percentile(endpoint)
+        if p99 is None:
+            return self.timeout
+        return min(
+            self.maxTimeout,
+            max(idmTimeoutMin, p99 * idmLatencyFactor + idmLatencyMargin),
+        )
+
+    def summary(self) -> dict:
+        """Return p50, p99 and timeout per endpoint in seconds (diagnostics)."""
+        return {
+            endpoint: {
+                "samples": len(samples),
+                "p50": self.percentile(endpoint, 0.5),
+                "p99": self.percentile(endpoint),
+                "timeout": round(self.timeoutFor(endpoint), 3),
+            }
+            for endpoint, samples in self._samples.items()
+        }
@@ -0,0 +1,161 @@
+# Login rate limit and backoff per heatpump (lockout protection), kept over HA restarts
+
+import time
+import logging
+import threading
+
+from typing import TYPE_CHECKING
+
+from .const import DATA_LOGIN_GUARDS, STORE_LOGIN, STORE_VERSION, DEF_LOGIN_STORE_DELAY
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+idmLoginGap = 10  # seconds between two logins at least
+idmLoginWindow = 600  # seconds of the login history
+idmLoginMaxPerWindow = 5  # logins within the window, more risk a lockout of the idm web
+idmLoginBackoff = 30  # seconds after a failed login, doubled with each further failure
+idmLoginBackoffMax = 900  # seconds, upper bound of the backoff and of any wait
+
+LOGIN_SUCCESS = "success"
+LOGIN_CANNOT_CONNECT = "cannot_connect"  # the login did not reach the idm web
+LOGIN_BACKOFF = "login_backoff"  # login not tried, the guard asks to wait
+
+
+class IdmLoginGuard:
+    """Decide if a login to one heatpump may be tried now, from its recent logins.
+
+    All clients of a host share one guard: config flow, reconfigure and the
+    coordinator. A login is allowed idmLoginGap after the last one and only
+    idmLoginMaxPerWindow times within idmLoginWindow. Each failed login in a row
+    doubles the backoff before the next one. A login not reaching the heatpump
+    (cannot_connect) only waits the gap, it cannot count towards a lockout. Times
+    are wall clock times, the state is persisted, so a restart (or a crash loop)
+    continues the backoff instead of logging in again at once. The csrf token of
+    the last successful login is kept as well: after a restart it is used till the
+    idm web rejects it, without a login.
+    The guard is used from the executor, its methods are thread safe.
+    """
+
+    def __init__(self, state: dict | None = None) -> None:
+        """Initialize the guard, state = persisted state of asDict()."""
+        self._lock = threading.Lock()
+        state = state or {}
+        self.logins = list(state.get("logins", []))  # wall times of the logins tried
+        self.lastTry = state.get("lastTry", 0.0)  # wall time of the last login request
+        self.failures = state.get("failures", 0)  # failed logins in a row
+        self.blockedUntil = state.get("blockedUntil", 0.0)  # wall time, no login before
+        self.token = state.get("token")  # csrf token of the last successful login
+        self.listeners = []  # called after each login result (store)
+
+    def asDict(self) -> dict:
+        """Return the state to persist."""
+        with self._lock:
+            return {
+                "logins": list(self.logins),
+                "lastTry": self.lastTry,
+                "failures": self.failures,
+                "blockedUntil": self.blockedUntil,
+                "token": self.token,
+            }
+
+    def _wait(self, now: float) -> float:
+        """Return the seconds till a login is allowed, the lock is held."""
+        self.logins = [t for t in self.logins if 0 <= now - t < idmLoginWindow]
+        wait = max(self.blockedUntil, self.lastTry + idmLoginGap) - now
+        if len(self.logins) >= idmLoginMaxPerWindow:
+            wait = max(wait, self.logins[-idmLoginMaxPerWindow] + idmLoginWindow - now)
+        return min(max(0.0, wait), idmLoginBackoffMax)  # bounded, if the clock jumped
+
+    def wait(self, now: float | None = None) -> float:
+        """Return the seconds till a login is allowed, 0 = now."""
+        with self._lock:
+            return self._wait(time.time() if now is None else now)
+
+    def acquire(self, now: float | None = None) -> float:
+        """Count a login if it is allowed now and return 0, else the seconds to wait."""
+        now = time.time() if now is None else now
+        with self._lock:
+            wait = self._wait(now)
+            if wait == 0:
+                self.lastTry = now
+                self.logins.append(now)
+            return wait
+
+    def result(
+        self, result: str, token: str | None = None, now: float | None = None
+    ) -> None:
+        """Take the result of a login, a failure starts or extends the backoff."""
+        now = time.time() if now is None else now
+        with self._lock:
+            if result == LOGIN_SUCCESS:
+                self.failures = 0
+                self.blockedUntil = 0.0
+                self.token = token
+            elif result == LOGIN_CANNOT_CONNECT:
+                if self.logins:
+                    self.logins.pop()  # no login reached the idm web
+            else:
+                self.failures += 1
+                backoff = min(
+                    idmLoginBackoffMax, idmLoginBackoff * 2 ** (self.failures - 1)
+                )
+                self.blockedUntil = now + backoff
+                self.token = None
+                _LOGGER.warning(
+                    "Login failed (%s) %d times in a row, next login in %d seconds",
+                    result,
+                    self.failures,
+                    backoff,
+                )
+        for listener in self.listeners:
+            listener()
+
+    def summary(self) -> dict:
+        """Return the recent logins, failures and the wait (diagnostics)."""
+        now = time.time()
+        with self._lock:
+            wait = self._wait(now)
+            return {
+                "logins_in_window": len(self.logins),
+                "failures_in_row": self.failures,
+                "wait": round(wait, 1),
+            }
+
+
+# hass = Home Assistant, host = host name of the heatpump
+# return the guard of host, shared by all clients and persisted in the HA storage
+async def async_getLoginGuard(hass: "HomeAssistant", host: str) -> IdmLoginGuard:
+    registry = hass.data.get(DATA_LOGIN_GUARDS)
+    if registry is None:
+        # the first caller loads the store, all others wait for the same task
+        registry = hass.data[DATA_LOGIN_GUARDS] = hass.async_create_task(
+            _async_loadLoginGuards(hass)
+        )
+    (store, states, guards) = await registry
+    guard = guards.get(host)
+    if guard is None:
+        guard = guards[host] = IdmLoginGuard(states.get(host))
+
+        def _save() -> None:
+            store.async_delay_save(
+                # hosts not set up in this run are kept as loaded
+                lambda: states | {h: g.asDict() for h, g in guards.items()},
+                DEF_LOGIN_STORE_DELAY,
+            )
+
+        # login results come from the executor, the store is written on the event loop
+        guard.listeners.append(lambda: hass.loop.call_soon_threadsafe(_save))
+    return guard
+
+
+async def _async_loadLoginGuards(hass: "HomeAssistant") -> tuple:
+    """Load the persisted guards of all hosts."""
+    # imported here, the guard itself is plain Python (tools, tests)
+    from homeassistant.helpers.storage import Store  # noqa: PLC0415
+
+    store = Store(hass, STORE_VERSION, STORE_LOGIN)
+    states = await store.async_load() or {}
+    return (store, states, {})
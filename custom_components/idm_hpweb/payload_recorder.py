@@ -0,0 +1,246 @@
+# Recorder for raw idm web responses and a replay transport feeding them to the client
+
+import os
+import gzip
+import json
+import time
+import logging
+import threading
+
+from collections import deque
+from urllib.parse import urlsplit
+
+_LOGGER = logging.getLogger(__name__)
+
+idmRecordPrefix = "idm_payload_"
+idmRecordSuffix = ".jsonl.gz"
+# host name prefix to use the replay transport instead of a heatpump
+idmReplayPrefix = "replay:"
+idmReplayHost = "replay"  # host name used for the urls during replay
+# used if no login is recorded
+idmReplayLogin = '<html><script>csrf_token="replay"</script></html>'
+
+
+# url = full url of a request
+# return the path (and query) of the url, used as key for recording and replay
+def urlKey(url: str) -> str:
+    parts = urlsplit(url)
+    if parts.query:
+        return parts.path + "?" + parts.query
+    return parts.path
+
+
+class IdmPayloadRecorder:
+    """Store each raw response compressed in size bounded, rotating segment files.
+
+    Each line of a segment is a json object with time stamp, method, url path, status
+    code and the response text. Written from the executor thread only.
+    """
+
+    def __init__(self, directory: str, maxBytes: int, maxFiles: int) -> None:
+        """Initialize the recorder, maxBytes is the limit for all segments together."""
+        self.directory = directory
+        self.maxFiles = max(2, maxFiles)
+        self.segmentBytes = max(1, maxBytes // self.maxFiles)
+        self._lock = threading.Lock()
+        self._rawFile = None
+        self._gzFile = None
+
+    def record(self, method: str, url: str, status: int, text: str) -> None:
+        """Append one response to the current segment, rotate if the segment is full."""
+        line = json.dumps(
+            {
+                "ts": time.time(),
+                "method": method,
+                "url": urlKey(url),
+                "status": status,
+                "text": text,
+            },
+            ensure_ascii=False,
+        )
+        try:
+            with self._lock:
+                if self._gzFile is None:
+                    self._openSegment()
+                self._gzFile.write((line + "\n").encode("utf-8"))
+                self._gzFile.flush()  # keep segment readable, even if HA stops hard
+                if self._rawFile.tell() >= self.segmentBytes:
+                    self._closeSegment()
+        except OSError as e:
+            _LOGGER.warning("Recording of idm payload failed: " + str(e))
+
+    def _openSegment(self) -> None:
+        """Open a new segment and delete the oldest segments above the limit."""
+        os.makedirs(self.directory, exist_ok=True)
+        segments = listSegments(self.directory)
+        for oldFile in segments[: max(0, len(segments) - self.maxFiles + 1)]:
+            os.remove(oldFile)
+        fileName = os.path.join(
+            self.directory,
+            idmRecordPrefix + time.strftime("%Y%m%d_%H%M%S") + idmRecordSuffix,
+        )
+        index = 1
+        while os.path.exists(fileName):  # more than one segment within a second
+            fileName = os.path.join(
+                self.directory,
+                idmRecordPrefix
+                + time.strftime("%Y%m%d_%H%M%S")
+                + "_"
+                + str(index)
+                + idmRecordSuffix,
+            )
+            index += 1
+        self._rawFile = open(fileName, "wb")  # noqa: SIM115
+        self._gzFile = gzip.GzipFile(fileobj=self._rawFile, mode="wb")
+
+    def _closeSegment(self) -> None:
+        """Close the current segment."""
+        if self._gzFile is not None:
+            self._gzFile.close()
+            self._rawFile.close()
+        self._gzFile = None
+        self._rawFile = None
+
+    def close(self) -> None:
+        """Close the recorder."""
+        with self._lock:
+            self._closeSegment()
+
+
+# directory = directory containing recorded segments
+# return sorted list of segment file names, oldest first
+def listSegments(directory: str) -> list[str]:
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, f)
+        for f in os.listdir(directory)
+        if f.startswith(idmRecordPrefix) and f.endswith(idmRecordSuffix)
+    )
+
+
+# path = segment file or directory with segments
+# return list of recorded entries (dicts) in recording order
+def loadRecords(path: str) -> list[dict]:
+    files = listSegments(path) if os.path.isdir(path) else [path]
+    records = []
+    for fileName in files:
+        try:
+            with gzip.open(fileName, "rt", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        records.append(json.loads(line))
+        except (OSError, EOFError, ValueError) as e:
+            # the newest segment may be cut, when HA was stopped hard, keep what is readable
+            _LOGGER.debug("Segment %s not completely readable: %s", fileName, e)
+    return records
+
+
+class IdmReplayResponse:
+    """Minimal stand in for requests.Response."""
+
+    def __init__(self, status_code: int, text: str) -> None:
+        """Initialize the response."""
+        self.status_code = status_code
+        self.text = text
+
+    def raise_for_status(self) -> None:
+        """Nothing to raise for recorded frames, status is checked by the client."""
+
+
+class IdmReplaySession:
+    """Replay transport, used by idmHeatpumpWeb instead of a requests.Session.
+
+    Every request returns the next recorded response for the same method and url
+    path, a recorded put answer never reaches a get of the same page. The
+    responses are delayed like recorded, divided by speed (0 = no delay at all).
+    With loop enabled the recording starts again once all frames are used.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = True) -> None:
+        """Initialize the replay of a segment file or a directory with segments."""
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        # (method, url key) -> list of records, loaded with the first request
+        self._records = None
+        self._queues = {}  # (method, url key) -> deque of records not yet replayed
+        self._lastTs = None  # recorded time stamp of the last replayed frame
+        self._lastWall = 0.0  # monotonic time, when the last frame was replayed
+
+    def _load(self) -> None:
+        """Load the recording, blocking, therefore done with the first request in the executor."""
+        self._records = {}
+        for rec in loadRecords(self.path):
+            key = (rec.get("method", "GET").upper(), rec["url"])
+            self._records.setdefault(key, []).append(rec)
+        for key, recs in self._records.items():
+            self._queues[key] = deque(recs)
+        _LOGGER.info(
+            "Replay of %d recorded frames from %s",
+            sum(len(r) for r in self._records.values()),
+            self.path,
+        )
+
+    def _next(self, method: str, url: str) -> dict | None:
+        """Return the next recorded entry for method and url and wait like recorded."""
+        if self._records is None:
+            self._load()
+        key = (method, urlKey(url))
+        queue = self._queues.get(key)
+        if queue is None:
+            return None
+        if not queue:
+            if not self.loop:
+                return None
+            queue.extend(self._records[key])
+        rec = queue.popleft()
+        if self.speed > 0 and self._lastTs is not None:
+            # the time the client spent since the last frame (e.g. relax sleeps) counts as well
+            delay = self._lastWall + (rec["ts"] - self._lastTs) / self.speed
+            delay -= time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        self._lastTs = rec["ts"]
+        self._lastWall = time.monotonic()
+        return rec
+
+    def get(self, url, headers=None, timeout=None, **kwargs) -> IdmReplayResponse:
+        """Replay a get request."""
+        rec = self._next("GET", url)
+        if rec is None:
+            return IdmReplayResponse(404, "")
+        return IdmReplayResponse(rec["status"], rec["text"])
+
+    def post(self, url, data=None, **kwargs) -> IdmReplayResponse:
+        """Replay a post request (login), works also without a recorded login."""
+        rec = self._next("POST", url)
+        if rec is None:
+            return IdmReplayResponse(200, idmReplayLogin)
+        return IdmReplayResponse(rec["status"], rec["text"])
+
+    def put(self, url, data=None, **kwargs) -> IdmReplayResponse:
+        """Replay a put request, nothing is written, without a recording it is confirmed."""
+        rec = self._next("PUT", url)
+        if rec is None:
+            return IdmReplayResponse(200, '{"status": "OK"}')
+        return IdmReplayResponse(rec["status"], rec["text"])
+
+    def close(self) -> None:
+        """Nothing to close."""
+
+
+# host = host name as configured, e.g. "replay:/config/idm_record@10" for 10 times speed
+# return (path, speed) of the recording to replay
+def parseReplayHost(host: str) -> tuple[str, float]:
+    path = host[len(idmReplayPrefix) :]
+    speed = 1.0
+    atPos = path.rfind("@")
+    if atPos != -1:
+        try:
+            speed = float(path[atPos + 1 :])
+            path = path[:atPos]
+        except ValueError:
+            pass  # no speed given, @ is part of the path
+    return (path, speed)
@@ -0,0 +1,127 @@
+# Sampling profiler for the idm update cycle, active while a profile service call runs
+
+import sys
+import time
+import asyncio
+import logging
+import threading
+
+from collections import Counter
+from collections.abc import Callable
+from .const import DEF_PROFILE_TOP_ENTRIES
+
+_LOGGER = logging.getLogger(__name__)
+
+PHASE_EXECUTOR = "executor"
+PHASE_LOOP = "loop"
+
+
+class IdmCycleProfiler:
+    """Sample the stacks of the threads running the idm update cycle.
+
+    The executor thread is sampled while it fetches and parses the data, the event loop
+    thread while it writes the entity states. A helper thread takes the samples, so the
+    profiled code itself runs unchanged and other threads or tasks are never sampled.
+    """
+
+    def __init__(self, cycles: int, interval: float) -> None:
+        """Initialize the profiler for the next cycles, interval in seconds between samples."""
+        self.cyclesLeft = cycles
+        self.interval = interval
+        self.stacks = {PHASE_EXECUTOR: Counter(), PHASE_LOOP: Counter()}
+        self.cycleTimes = []  # list of dicts with wall times per phase
+        self._target = None  # (thread ident, phase) currently sampled
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(
+            target=self._sampleLoop, name="idm_hpweb_profiler", daemon=True
+        )
+        self._sampler.start()
+        self.finished = asyncio.get_running_loop().create_future()
+
+    def _sampleLoop(self) -> None:
+        """Take stack samples of the target thread until stopped."""
+        while not self._stop.wait(self.interval):
+            target = self._target
+            if target is None:
+                continue
+            (ident, phase) = target
+            frame = sys._current_frames().get(ident)  # noqa: SLF001
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    code.co_name
+                    + " ("
+                    + code.co_filename.rsplit("/", 1)[-1]
+                    + ":"
+                    + str(code.co_firstlineno)
+                    + ")"
+                )
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                self.stacks[phase][";".join(stack)] += 1
+
+    def runExecutor(self, func: Callable, *args):
+        """Run func in the executor thread while sampling it (job runner of the client)."""
+        self._target = (threading.get_ident(), PHASE_EXECUTOR)
+        try:
+            return func(*args)
+        finally:
+            self._target = None
+
+    def processCycle(self, fetchTime: float, process: Callable, data):
+        """Run process(data) on the loop while sampling it, fetchTime = wall time of the fetch."""
+        start = time.perf_counter()
+        self._target = (threading.get_ident(), PHASE_LOOP)
+        try:
+            return process(data)
+        finally:
+            self._target = None
+            self.cycleTimes.append(
+                {
+                    PHASE_EXECUTOR: round(fetchTime, 6),
+                    PHASE_LOOP: round(time.perf_counter() - start, 6),
+                }
+            )
+            self.cyclesLeft -= 1
+            if self.cyclesLeft <= 0:
+                self.stop()
+
+    def stop(self) -> None:
+        """Stop sampling and mark profiling as finished."""
+        self._stop.set()
+        if not self.finished.done():
+            self.finished.set_result(True)
+
+    def writeFiles(self, basePath: str) -> dict[str, str]:
+        """Write the samples in folded stack format (flamegraph.pl, speedscope), blocking."""
+        files = {}
+        for phase, stacks in self.stacks.items():
+            fileName = basePath + "_" + phase + ".folded"
+            with open(fileName, "w", encoding="utf-8") as f:
+                for stack, count in stacks.items():
+                    f.write(stack + " " + str(count) + "\n")
+            files[phase] = fileName
+        return files
+
+    def summary(self) -> dict:
+        """Summarize cycle times and the functions with most own samples per phase."""
+        result = {
+            "cycles": len(self.cycleTimes),
+            "sample_interval_ms": round(self.interval * 1000, 3),
+            "cycle_times": self.cycleTimes,
+        }
+        for phase, stacks in self.stacks.items():
+            own = Counter()
+            for stack, count in stacks.items():
+                own[stack.rsplit(";", 1)[-1]] += count
+            result[phase] = {
+                "total_time": round(sum(c[phase] for c in self.cycleTimes), 6),
+                "samples": sum(stacks.values()),
+                "top": [
+                    {"function": func, "samples": count}
+                    for func, count in own.most_common(DEF_PROFILE_TOP_ENTRIES)
+                ],
+            }
+        return result
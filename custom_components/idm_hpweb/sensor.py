@@ -3,6 +3,7 @@
 from __future__ import annotations
 from datetime import timedelta
 import logging
+import time
 
 from homeassistant.components.sensor import (
     SensorDeviceClass,
@@ -17,15 +18,15 @@ from homeassistant.const import (
     UnitOfVolumeFlowRate,
     UnitOfPower,
     UnitOfEnergy,
+    EntityCategory,
 )
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
-from functools import partial
+from functools import cache
+from collections.abc import Callable
 
 import async_timeout
 
-from homeassistant.components.light import LightEntity
 from homeassistant.core import callback
 from homeassistant.exceptions import ConfigEntryAuthFailed
 from homeassistant.helpers.update_coordinator import (
@@ -34,9 +35,10 @@ from homeassistant.helpers.update_coordinator import (
     UpdateFailed,
 )
 from homeassistant.helpers.device_registry import DeviceInfo
-from homeassistant.helpers.dispatcher import (
-    async_dispatcher_connect,
-    async_dispatcher_send,
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.event import (
+    async_track_time_change,
+    async_track_time_interval,
 )
 
 from homeassistant.const import CONF_HOST, CONF_PIN, CONF_TIMEOUT
@@ -51,10 +53,44 @@ from .const import (
     CONF_CLK_SET,
     CONF_CLK_HOUR,
     CONF_CLK_HOUR_DEFAULT,
+    DATA_COORDINATOR,
+    DATA_HANDOVER,
+    CONF_RECORD,
+    DEF_RECORD_FILES,
+    CONF_FAST_CYCLE_TIME,
+    CONF_FAST_KEYS,
+    DEF_FAST_KEYS,
+    CONF_AGGR_WINDOW,
+    CONF_AGGR_CLASSES,
+    CONF_TIMESERIES_DAYS,
+    DEF_TIMESERIES_FLUSH,
+    DEF_AGGR_CLASSES,
+    STORE_CYCLES,
+    STORE_VERSION,
+    DEF_STORE_DELAY,
+    CONF_ANOMALY_SIGMA,
+    EVENT_ANOMALY,
 )
 from .idmHeatpumpWeb import (
     idmHeatpumpWeb,
     IdmResponseData,
+    IDM_INVALID,
+)
+from .clock_sync import IdmClockSync
+from .profiler import IdmCycleProfiler
+from .payload_recorder import IdmPayloadRecorder
+from .aggregation import IdmWindow, parseAggregationClasses
+from .timeseries import IdmTimeSeriesSink
+from .impact import IdmImpactMonitor, IMPACT_LOOP, IMPACT_METRICS
+from .anomaly import IdmAnomalyDetector
+from .login_guard import async_getLoginGuard
+from .cycles import (
+    IdmCycleAnalytics,
+    CYCLE_METRICS,
+    CYCLE_STARTS_HOUR,
+    CYCLE_STARTS_TODAY,
+    DEFROST_TODAY,
+    DEFROST_INTERVAL,
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -77,27 +113,128 @@ async def async_setup_entry(
         CONF_CLK_HOUR, CONF_CLK_HOUR_DEFAULT
     )  # default defined in const, but logic is same as above
 
+    # the config flow hands over the session it validated, this saves a connect and a login
+    validated = hass.data.get(DATA_HANDOVER, {}).pop(config_entry.data[CONF_HOST], None)
     idmObj = idmHeatpumpWeb(
         hass,
         config_entry.data[CONF_HOST],
         config_entry.data[CONF_PIN],
         config_entry.data[CONF_TIMEOUT],
         stat_divider,
-        clk_set,
-        clk_set_hour,
+        validated.session if validated else None,
     )
+    idmObj.loginGuard = await async_getLoginGuard(hass, config_entry.data[CONF_HOST])
+    if validated:
+        idmObj.csrf_token = validated.csrf_token
+    elif idmObj.loginGuard.token:
+        # login of the last run, used till the idm web rejects it: no login at restart
+        idmObj.csrf_token = idmObj.loginGuard.token
+    idmObj.numericKeys = getNumericKeys()
+    # no sockets left after unload or reload
+    config_entry.async_on_unload(idmObj.async_close)
+
+    record_mb = config_entry.data.get(CONF_RECORD, 0)
+    if record_mb > 0:
+        # opt-in recording of all raw responses, e.g. to reproduce parser issues with the replay transport
+        recorder = IdmPayloadRecorder(
+            hass.config.path(
+                DOMAIN + "_record_" + config_entry.data[CONF_DISPLAY_NAME]
+            ),
+            record_mb * 1024 * 1024,
+            DEF_RECORD_FILES,
+        )
+        idmObj.recorder = recorder
+
+        async def _async_close_recorder() -> None:
+            # the gzip segment is closed in the executor, after a running write
+            await hass.async_add_executor_job(recorder.close)
+
+        config_entry.async_on_unload(_async_close_recorder)
+
+    # compressor and defrost cycles, the state survives restarts
+    store = Store(hass, STORE_VERSION, STORE_CYCLES + "." + config_entry.entry_id)
+    cycles = IdmCycleAnalytics(await store.async_load())
 
+    (update_interval, fast_keys, full_interval) = _laneSettings(config_entry.data)
     coordinator = IDM_Coordinator(
         hass,
         config_entry,
-        timedelta(seconds=config_entry.data[CONF_CYCLE_TIME]),
+        update_interval,
         idmObj,
         async_add_entities,
+        IdmClockSync(idmObj, clk_set, clk_set_hour),
+        fast_keys,
+        full_interval,
+        config_entry.data.get(CONF_AGGR_WINDOW, 0),
+        parseAggregationClasses(
+            config_entry.data.get(CONF_AGGR_CLASSES, DEF_AGGR_CLASSES)
+        ),
+        cycles,
     )
+
+    @callback
+    def _async_cycles_changed() -> None:
+        # written only after a counted start, run or defrost, not every cycle
+        if cycles.changed:
+            store.async_delay_save(cycles.asDict, DEF_STORE_DELAY)
+
+    cycles.listeners.append(_async_cycles_changed)
+    config_entry.async_on_unload(coordinator.async_subscribe(cycles))
+    config_entry.async_on_unload(lambda: store.async_save(cycles.asDict()))
+
+    timeseries_days = config_entry.data.get(CONF_TIMESERIES_DAYS, 0)
+    if timeseries_days > 0:
+        # opt-in full resolution store, buffered each cycle and written in batches
+        sink = IdmTimeSeriesSink(
+            hass,
+            hass.config.path(
+                DOMAIN + "_timeseries_" + config_entry.data[CONF_DISPLAY_NAME] + ".db"
+            ),
+            timeseries_days,
+        )
+        config_entry.async_on_unload(coordinator.async_subscribe(sink))
+        config_entry.async_on_unload(
+            async_track_time_interval(
+                hass, sink.async_flush, timedelta(seconds=DEF_TIMESERIES_FLUSH)
+            )
+        )
+        config_entry.async_on_unload(sink.async_close)
+
+    anomaly_sigma = config_entry.data.get(CONF_ANOMALY_SIGMA, 0)
+    if anomaly_sigma > 0:
+        # opt-in check of the refrigerant circuit, fires events instead of writing states
+        coordinator.my_anomalies = IdmAnomalyDetector(
+            hass, EVENT_ANOMALY, config_entry.entry_id, anomaly_sigma
+        )
+        config_entry.async_on_unload(
+            coordinator.async_subscribe(coordinator.my_anomalies)
+        )
+
     hass.data[DOMAIN] = coordinator  # probably not needed, but we keep it for now
+    config_entry.runtime_data[DATA_COORDINATOR] = coordinator  # used by the services
+    # websocket subscribers are bound to this coordinator, a reload creates a new one
+    config_entry.async_on_unload(coordinator.async_end_subscriptions)
     await coordinator.async_config_entry_first_refresh()
 
 
+# data = config entry data
+# return (update interval of the coordinator, fast lane keys or None, full cycle interval)
+def _laneSettings(data) -> tuple[timedelta, frozenset[str] | None, timedelta]:
+    full_interval = timedelta(seconds=data[CONF_CYCLE_TIME])
+    fast_cycle_time = data.get(CONF_FAST_CYCLE_TIME, 0)
+    fast_keys = None
+    if fast_cycle_time > 0:
+        # two lanes: the coordinator ticks with the fast cycle, every full cycle all values are read
+        fast_keys = frozenset(
+            k.strip()
+            for k in data.get(CONF_FAST_KEYS, DEF_FAST_KEYS).split(",")
+            if k.strip()
+        )
+    if fast_keys:
+        return (timedelta(seconds=fast_cycle_time), fast_keys, full_interval)
+    return (full_interval, None, full_interval)
+
+
 class IDM_Coordinator(DataUpdateCoordinator):
     """My custom coordinator."""
 
@@ -108,8 +245,14 @@ class IDM_Coordinator(DataUpdateCoordinator):
         update_interval,
         my_api: idmHeatpumpWeb,
         async_add_entities: AddEntitiesCallback,
+        clock_sync: IdmClockSync,
+        fast_keys: frozenset[str] | None = None,
+        full_interval: timedelta | None = None,
+        aggr_window: float = 0,
+        aggr_classes: dict[str, str] | None = None,
+        cycles: IdmCycleAnalytics | None = None,
     ) -> None:
-        """Initialize my coordinator."""
+        """Initialize my coordinator, with fast_keys the fast lane is enabled."""
         super().__init__(
             hass,
             _LOGGER,
@@ -120,6 +263,23 @@ class IDM_Coordinator(DataUpdateCoordinator):
             always_update=True,
         )
         self.my_api = my_api
+        self.my_clockSync = clock_sync
+        # only set while a profile service call runs
+        self.my_profiler: IdmCycleProfiler | None = None
+        self.my_fastKeys = fast_keys  # None = single lane, all values every cycle
+        self.my_fullInterval = full_interval or update_interval
+        # monotonic time of the next full update (slow lane)
+        self.my_nextFullUpdate = 0.0
+        self.my_aggrWindow = aggr_window  # 0 = every value is written
+        self.my_aggrClasses = aggr_classes or {}  # device class -> aggregation mode
+        # key -> window, None = not aggregated
+        self.my_windows: dict[str, IdmWindow | None] = {}
+        self.my_subscribers = []  # websocket subscriptions, get every cycle unthrottled
+        # cost of the cycles for the HA loop and executor
+        self.my_impact = IdmImpactMonitor()
+        self.my_cycles = cycles or IdmCycleAnalytics()  # compressor and defrost cycles
+        self.my_anomalies: IdmAnomalyDetector | None = None  # only set if enabled
+        self.my_clockUnsub = None  # removes the daily clock check
         # self._requisteredKeys = [str]   # we can now use _mySensors keys for that
         self._mySensors = {}
         self.async_add_entities = async_add_entities
@@ -128,802 +288,1023 @@ class IDM_Coordinator(DataUpdateCoordinator):
 
     async def _async_setup(self):
         """Handle initial setup tasks."""
-        result = await self.my_api.async_idm_async_login()
-        # we ignore the result here, errors will be handled during data fetch
+        if self.my_api.csrf_token is None:  # not yet logged in by the config flow
+            result = await self.my_api.async_idm_async_login()
+            # we ignore the result here, errors will be handled during data fetch
 
         # we add this sensor to drive the update cycle --> all other sensors get their data driven from that update cycle (which is fine, because all data comes together)
         self.async_add_entities([self.my_cycleSensor])
         self._mySensors[self.my_cycleSensor.getIdx()] = self.my_cycleSensor
+        # diagnostic sensors of the impact on HA, disabled by default
+        self.async_add_entities(
+            [
+                IDM_ImpactSensor(self, description)
+                for description in _impactSensorTypes()
+            ]
+        )
+        self.async_add_entities(
+            [IDM_CycleSensor(self, description) for description in _cycleSensorTypes()]
+        )
         # self._requisteredKeys.append(self.my_cycleSensor.getIdx())
 
         # we add two very popular sensors here directly, the rest is added, when data is received
         # It would not be needed, but prevents having no sensors at all at the beginning
-        entity_description = SENSORS.get("B32")
+        entity_description = getSensorDescriptions().get("B32")
         if entity_description:
             self._mySensors["B32"] = IDM_Entity(self, "B32", entity_description)
             self.async_add_entities([self._mySensors["B32"]])
             # self._requisteredKeys.append("B32")
 
-        entity_description = SENSORS.get("B33")
+        entity_description = getSensorDescriptions().get("B33")
         if entity_description:
             self._mySensors["B33"] = IDM_Entity(self, "B33", entity_description)
             self.async_add_entities([self._mySensors["B33"]])
             # self._requisteredKeys.append("B33")
 
+        self._scheduleClockSync()
+        self.config_entry.async_on_unload(self._unscheduleClockSync)
+
         _LOGGER.debug("IDM Coordinator setup complete")
 
+    @callback
+    def _scheduleClockSync(self) -> None:
+        """Start the daily clock check, if enabled."""
+        if self.my_clockSync.clkSet != 0:
+            # the clock check runs once a day at the begin of the configured hour, decoupled from the data update cycle
+            self.my_clockUnsub = async_track_time_change(
+                self.hass,
+                self._async_start_clock_sync,
+                hour=self.my_clockSync.clkSetHour,
+                minute=0,
+                second=0,
+            )
+
+    @callback
+    def _unscheduleClockSync(self) -> None:
+        """Stop the daily clock check."""
+        if self.my_clockUnsub:
+            self.my_clockUnsub()
+            self.my_clockUnsub = None
+
+    @callback
+    def async_apply_config(self, data) -> None:
+        """Apply changed poll settings to the running client and coordinator.
+
+        Session, login, detected language, entities and learned data are kept, so
+        there is neither a data gap nor an extra login. Host, pin and everything
+        set up once (name, recording, time series) need a reload instead.
+        """
+        self.my_api.setTimeout(data[CONF_TIMEOUT])
+        self.my_api.statDiv = data.get(CONF_STAT_DIV, 0)
+
+        self._unscheduleClockSync()
+        self.my_clockSync.clkSet = data.get(CONF_CLK_SET, 0)
+        self.my_clockSync.clkSetHour = data.get(CONF_CLK_HOUR, CONF_CLK_HOUR_DEFAULT)
+        self._scheduleClockSync()
+
+        (update_interval, fast_keys, full_interval) = _laneSettings(data)
+        self.update_interval = update_interval  # used from the next scheduled refresh
+        self.my_fastKeys = fast_keys
+        self.my_fullInterval = full_interval
+        self.my_nextFullUpdate = 0.0  # next cycle reads all values
+
+        self.my_aggrWindow = data.get(CONF_AGGR_WINDOW, 0)
+        self.my_aggrClasses = parseAggregationClasses(
+            data.get(CONF_AGGR_CLASSES, DEF_AGGR_CLASSES)
+        )
+        self.my_windows.clear()  # windows are created again with the new settings
+        _LOGGER.debug("Changed settings applied without reload")
+
+    @callback
+    def _async_start_clock_sync(self, now) -> None:
+        """Start the daily clock check as background task, it never delays the data update."""
+        self.config_entry.async_create_background_task(
+            self.hass,
+            self.my_clockSync.async_idm_clock_sync(),
+            "idm_hpweb clock sync",
+        )
+
     async def _async_update_data(self):
         """Fetch data from API endpoint."""
 
         try:
             # Note: asyncio.TimeoutError and aiohttp.ClientError are already
             # handled by the data update coordinator.
-            async with async_timeout.timeout(
-                self.config_entry.data[CONF_TIMEOUT] + 2
-            ):  # add 2 seconds for additional data frames which might be needed
-                data: IdmResponseData = await self.my_api.async_idm_async_get_data()
-
-                for i in range(data.lenResp()):
-                    (key, answer) = data.getResp(i)
-
-                    if key not in self._mySensors:
-                        entity_description = SENSORS.get(key)
-                        if entity_description:
-                            self._mySensors[key] = IDM_Entity(
-                                self, key, entity_description
-                            )
-                            self.async_add_entities([self._mySensors[key]])
-                            _LOGGER.debug("Added new sensor for key %s", key)
-                        else:
-                            _LOGGER.debug(
-                                "Small warning! No sensor description found for key %s",
-                                key,
-                            )
-
-                    sensor = self._mySensors.get(key)
-                    if sensor:
-                        if sensor.enabled:
-                            sensor.setValue(answer)
-                            sensor.async_write_ha_state()  # even value not changed, we need to inform HA to avoid stale data
-
-                if data.lenResp() == 0:
-                    _LOGGER.warning("No data received from iDM Heatpump")
-
-                _LOGGER.debug(
-                    "IDM Data update complete. Found: %d items", data.lenResp()
+            # the cycle may use its whole interval, but at least one request and the extra frames
+            budget = max(
+                self.config_entry.data[CONF_TIMEOUT] + 2,
+                self.update_interval.total_seconds(),
+            )
+            # the executor stops at the deadline, the timeout only catches a hanging request
+            deadline = time.monotonic() + budget
+            async with async_timeout.timeout(budget + 1):
+                keys = None  # full update
+                if self.my_fastKeys and time.monotonic() < self.my_nextFullUpdate:
+                    # fast lane, parse and write only these values
+                    keys = self.my_fastKeys
+                # profiling requested by service call, samples this cycle on its usual path
+                profiler = self.my_profiler
+                start = time.perf_counter()
+                data: IdmResponseData = await self.my_api.async_idm_async_get_data(
+                    keys, deadline, profiler.runExecutor if profiler else None
                 )
-                return ""
+                fetchTime = time.perf_counter() - start
+                self.my_impact.addJobTimes(self.my_api.lastJobTimes)
+                start = time.perf_counter()
+                if profiler:
+                    result = profiler.processCycle(fetchTime, self._processData, data)
+                else:
+                    result = self._processData(data)
+                self.my_impact.add(IMPACT_LOOP, time.perf_counter() - start)
+                self.my_impact.measureLoopLag()
+                return result
         except Exception as err:
             raise UpdateFailed(f"Error communicating with API: {err}") from err
 
+    @callback
+    def async_subscribe(self, subscriber) -> Callable[[], None]:
+        """Add a subscriber (push(data) with the data of each cycle), return the unsubscribe function."""
+        self.my_subscribers.append(subscriber)
 
-SENSOR_TYPES: tuple[SensorEntityDescription, ...] = (
-    SensorEntityDescription(
-        key="software_version",
-        translation_key="software_version",
-    ),
-    SensorEntityDescription(
-        key="regler_online",
-        translation_key="regler_online",
-        state_class=SensorStateClass.TOTAL_INCREASING,
-        device_class=SensorDeviceClass.DURATION,
-        native_unit_of_measurement=UnitOfTime.HOURS,
-    ),
-    SensorEntityDescription(
-        key="runtime_nb_1",
-        translation_key="runtime_nb_1",
-        state_class=SensorStateClass.TOTAL_INCREASING,
-        device_class=SensorDeviceClass.DURATION,
-        native_unit_of_measurement=UnitOfTime.HOURS,
-    ),
-    SensorEntityDescription(
-        key="switch_cycles_nb_1",
-        translation_key="switch_cycles_nb_1",
-        state_class=SensorStateClass.TOTAL_INCREASING,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="runtime_nb_2",
-        translation_key="runtime_nb_2",
-        state_class=SensorStateClass.TOTAL_INCREASING,
-        device_class=SensorDeviceClass.DURATION,
-        native_unit_of_measurement=UnitOfTime.HOURS,
-    ),
-    SensorEntityDescription(
-        key="switch_cycles_nb_2",
-        translation_key="switch_cycles_nb_2",
-        state_class=SensorStateClass.TOTAL_INCREASING,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="runtime_heating",
-        translation_key="runtime_heating",
-        state_class=SensorStateClass.TOTAL_INCREASING,
-        device_class=SensorDeviceClass.DURATION,
-        native_unit_of_measurement=UnitOfTime.HOURS,
-    ),
-    SensorEntityDescription(
-        key="runtime_cooling",
-        translation_key="runtime_cooling",
-        state_class=SensorStateClass.TOTAL_INCREASING,
-        device_class=SensorDeviceClass.DURATION,
-        native_unit_of_measurement=UnitOfTime.HOURS,
-    ),
-    SensorEntityDescription(
-        key="runtime_hotwater",
-        translation_key="runtime_hotwater",
-        state_class=SensorStateClass.TOTAL_INCREASING,
-        device_class=SensorDeviceClass.DURATION,
-        native_unit_of_measurement=UnitOfTime.HOURS,
-    ),
-    SensorEntityDescription(
-        key="runtime_defrosting",
-        translation_key="runtime_defrosting",
-        state_class=SensorStateClass.TOTAL_INCREASING,
-        device_class=SensorDeviceClass.DURATION,
-        native_unit_of_measurement=UnitOfTime.HOURS,
-    ),
-    # Input, Output and Sensor values
-    SensorEntityDescription(
-        key="B32",
-        translation_key="outdoor_temperature",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="B33",
-        translation_key="flow_temperature",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="B34",
-        translation_key="return_temperature",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="B48",
-        translation_key="water_temp_top",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="B41",
-        translation_key="water_temp_bottom",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="B53",
-        translation_key="flow_temp_heatcircuit_c",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="B71",
-        translation_key="hotgas_temperature",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="B37",
-        translation_key="airsource_temperature",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="B79",
-        translation_key="vaporize_start_temperature",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="B78",
-        translation_key="vaporize_pressure",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.PRESSURE,
-        native_unit_of_measurement=UnitOfPressure.BAR,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="B78v",
-        translation_key="vaporize_temperature",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="B86v",
-        translation_key="condense_temperature",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="B86",
-        translation_key="condense_pressure",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.PRESSURE,
-        native_unit_of_measurement=UnitOfPressure.BAR,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="B87",
-        translation_key="liquid_temperature",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="board_temperature",
-        translation_key="board_temperature",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="B2",
-        translation_key="flowmeter",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.VOLUME_FLOW_RATE,
-        native_unit_of_measurement=UnitOfVolumeFlowRate.LITERS_PER_MINUTE,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="battery_voltage_central_unit",
-        translation_key="voltage_mainboard",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.VOLTAGE,
-        native_unit_of_measurement=UnitOfElectricPotential.VOLT,
-        suggested_display_precision=2,
-    ),
-    # Digital Inputs
-    SensorEntityDescription(
-        key="external_request",
-        translation_key="external_trigger",
-    ),
-    SensorEntityDescription(
-        key="ext_switch_heating_cooling",
-        translation_key="ext_trig_heat_cool",
-    ),
-    SensorEntityDescription(
-        key="ew_evu_lock_contact",
-        translation_key="ewu_evu_lock_contact",
-    ),
-    SensorEntityDescription(
-        key="B15",
-        translation_key="problem_eheat",
-    ),
-    SensorEntityDescription(
-        key="B5",
-        translation_key="dewpoint_protection_active",
-    ),
-    SensorEntityDescription(
-        key="ext_hotwater_signal",
-        translation_key="ext_trig_hotwater",
-    ),
-    SensorEntityDescription(
-        key="B10",
-        translation_key="problem_high_pressure",
-    ),
-    SensorEntityDescription(
-        key="M73#1",
-        translation_key="flow_pumpe_active",
-    ),
-    # Analog Outputs
-    SensorEntityDescription(
-        key="M73#2",
-        translation_key="flow_pumpe_speed",
-        state_class=SensorStateClass.MEASUREMENT,
-        native_unit_of_measurement="%",
-        suggested_display_precision=0,
-    ),
-    SensorEntityDescription(
-        key="M13",
-        translation_key="fan_speed",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.VOLTAGE,
-        native_unit_of_measurement=UnitOfElectricPotential.VOLT,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="ainout_80_81",
-        translation_key="ainout_80_81",
-        state_class=SensorStateClass.MEASUREMENT,
-        native_unit_of_measurement="%",
-        suggested_display_precision=2,
-    ),
-    SensorEntityDescription(
-        key="ainout_82_83",
-        translation_key="ainout_82_83",
-        state_class=SensorStateClass.MEASUREMENT,
-        native_unit_of_measurement="%",
-        suggested_display_precision=2,
-    ),
-    SensorEntityDescription(
-        key="ainout_84_85",
-        translation_key="ainout_84_85",
-        state_class=SensorStateClass.MEASUREMENT,
-        native_unit_of_measurement="%",
-        suggested_display_precision=2,
-    ),
-    SensorEntityDescription(
-        key="ainout_86_87",
-        translation_key="ainout_86_87",
-        state_class=SensorStateClass.MEASUREMENT,
-        native_unit_of_measurement="%",
-        suggested_display_precision=2,
-    ),
-    SensorEntityDescription(
-        key="ainout_88_89",
-        translation_key="ainout_88_89",
-        state_class=SensorStateClass.MEASUREMENT,
-        native_unit_of_measurement="%",
-        suggested_display_precision=2,
-    ),
-    SensorEntityDescription(
-        key="ainout_180_181",
-        translation_key="ainout_180_181",
-        state_class=SensorStateClass.MEASUREMENT,
-        native_unit_of_measurement="%",
-        suggested_display_precision=2,
-    ),
-    # Digital Outputs
-    SensorEntityDescription(
-        key="M73#3",
-        translation_key="flow_pumpe_actstate",
-    ),
-    SensorEntityDescription(
-        key="M51",
-        translation_key="4_way_valve_circut1",
-    ),
-    SensorEntityDescription(
-        key="M31",
-        translation_key="flowpump_circuit_a",
-    ),
-    SensorEntityDescription(
-        key="M33",
-        translation_key="flowpump_circuit_c",
-    ),
-    SensorEntityDescription(
-        key="M43",
-        translation_key="mixer_circuit_c",
-    ),
-    SensorEntityDescription(
-        key="M64",
-        translation_key="hotwater_circulation_pump",
-    ),
-    SensorEntityDescription(
-        key="E31",
-        translation_key="siphon_heating",
-    ),
-    SensorEntityDescription(
-        key="e_heater_1kw_on",
-        translation_key="e_heater_1kw_on",
-    ),
-    SensorEntityDescription(
-        key="e_heater_2kw_on",
-        translation_key="e_heater_2kw_on",
-    ),
-    SensorEntityDescription(
-        key="e_heater_3kw_on",
-        translation_key="e_heater_3kw_on",
-    ),
-    SensorEntityDescription(
-        key="M61",
-        translation_key="valve_heating_cooling",
-    ),
-    SensorEntityDescription(
-        key="M62",
-        translation_key="valve_warm_cold",
-    ),
-    SensorEntityDescription(
-        key="M63",
-        translation_key="value_heating_hotwater",
-    ),
-    # idm Service Parameter
-    SensorEntityDescription(
-        key="super_heating_1",
-        translation_key="super_heating_1",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="sub_cooling",
-        translation_key="sub_cooling",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="valve_position",
-        translation_key="valve_position",
-        state_class=SensorStateClass.MEASUREMENT,
-        native_unit_of_measurement="%",
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="valve_pos_sub_cool",
-        translation_key="valve_pos_sub_cool",
-        state_class=SensorStateClass.MEASUREMENT,
-        native_unit_of_measurement="%",
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="valve_pos_evdmini",
-        translation_key="valve_pos_evdmini",
-        state_class=SensorStateClass.MEASUREMENT,
-        native_unit_of_measurement="%",
-        suggested_display_precision=1,
-    ),
-    # idm PV Parameter (if PV is configured in iDM)
-    SensorEntityDescription(
-        key="cur_exp_power_heating",
-        translation_key="cur_exp_power_heating",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.POWER,
-        native_unit_of_measurement=UnitOfPower.KILO_WATT,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="cur_exp_power_cooling",
-        translation_key="cur_exp_power_cooling",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.POWER,
-        native_unit_of_measurement=UnitOfPower.KILO_WATT,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="cur_exp_power_hotwater",
-        translation_key="cur_exp_power_hotwater",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.POWER,
-        native_unit_of_measurement=UnitOfPower.KILO_WATT,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="cur_el_power",
-        translation_key="cur_el_power",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.POWER,
-        native_unit_of_measurement=UnitOfPower.KILO_WATT,
-        suggested_display_precision=1,
-    ),
-    # statistics values if statistics are enabled
-    # first with runtime values
-    SensorEntityDescription(
-        key="stat_runtime_total_heating",
-        translation_key="stat_runtime_total_heating",
-        state_class=SensorStateClass.MEASUREMENT,
-        native_unit_of_measurement=UnitOfTime.HOURS,
-        suggested_display_precision=6,
-    ),
-    SensorEntityDescription(
-        key="stat_runtime_total_cooling",
-        translation_key="stat_runtime_total_cooling",
-        state_class=SensorStateClass.MEASUREMENT,
-        native_unit_of_measurement=UnitOfTime.HOURS,
-        suggested_display_precision=6,
-    ),
-    SensorEntityDescription(
-        key="stat_runtime_total_hotwater",
-        translation_key="stat_runtime_total_hotwater",
-        state_class=SensorStateClass.MEASUREMENT,
-        native_unit_of_measurement=UnitOfTime.HOURS,
-        suggested_display_precision=6,
-    ),
-    SensorEntityDescription(
-        key="stat_runtime_total_defrost",
-        translation_key="stat_runtime_total_defrost",
-        state_class=SensorStateClass.MEASUREMENT,
-        native_unit_of_measurement=UnitOfTime.HOURS,
-        suggested_display_precision=6,
-    ),
-    SensorEntityDescription(
-        key="stat_runtime_cur_year_heating",
-        translation_key="stat_runtime_cur_year_heating",
-        state_class=SensorStateClass.MEASUREMENT,
-        native_unit_of_measurement=UnitOfTime.HOURS,
-        suggested_display_precision=6,
-    ),
-    SensorEntityDescription(
-        key="stat_runtime_cur_year_cooling",
-        translation_key="stat_runtime_cur_year_cooling",
-        state_class=SensorStateClass.MEASUREMENT,
-        native_unit_of_measurement=UnitOfTime.HOURS,
-        suggested_display_precision=6,
-    ),
-    SensorEntityDescription(
-        key="stat_runtime_cur_year_hotwater",
-        translation_key="stat_runtime_cur_year_hotwater",
-        state_class=SensorStateClass.MEASUREMENT,
-        native_unit_of_measurement=UnitOfTime.HOURS,
-        suggested_display_precision=6,
-    ),
-    SensorEntityDescription(
-        key="stat_runtime_cur_year_defrost",
-        translation_key="stat_runtime_cur_year_defrost",
-        state_class=SensorStateClass.MEASUREMENT,
-        native_unit_of_measurement=UnitOfTime.HOURS,
-        suggested_display_precision=6,
-    ),
-    # now stats with generated heat
-    SensorEntityDescription(
-        key="stat_genheat_total_heating",
-        translation_key="stat_genheat_total_heating",
-        state_class=SensorStateClass.TOTAL,
-        device_class=SensorDeviceClass.ENERGY,
-        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-        icon="mdi:heat-wave",
-        suggested_display_precision=6,
-    ),
-    SensorEntityDescription(
-        key="stat_genheat_total_cooling",
-        translation_key="stat_genheat_total_cooling",
-        state_class=SensorStateClass.TOTAL,
-        device_class=SensorDeviceClass.ENERGY,
-        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-        icon="mdi:snowflake",
-        suggested_display_precision=6,
-    ),
-    SensorEntityDescription(
-        key="stat_genheat_total_hotwater",
-        translation_key="stat_genheat_total_hotwater",
-        state_class=SensorStateClass.TOTAL,
-        device_class=SensorDeviceClass.ENERGY,
-        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-        icon="mdi:heat-wave",
-        suggested_display_precision=6,
-    ),
-    SensorEntityDescription(
-        key="stat_genheat_total_defrost",
-        translation_key="stat_genheat_total_defrost",
-        state_class=SensorStateClass.TOTAL,
-        device_class=SensorDeviceClass.ENERGY,
-        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-        icon="mdi:snowflake-melt",
-        suggested_display_precision=6,
-    ),
-    SensorEntityDescription(
-        key="stat_genheat_cur_year_heating",
-        translation_key="stat_genheat_cur_year_heating",
-        state_class=SensorStateClass.TOTAL,
-        device_class=SensorDeviceClass.ENERGY,
-        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-        icon="mdi:heat-wave",
-        suggested_display_precision=6,
-    ),
-    SensorEntityDescription(
-        key="stat_genheat_cur_year_cooling",
-        translation_key="stat_genheat_cur_year_cooling",
-        state_class=SensorStateClass.TOTAL,
-        device_class=SensorDeviceClass.ENERGY,
-        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-        icon="mdi:snowflake",
-        suggested_display_precision=6,
-    ),
-    SensorEntityDescription(
-        key="stat_genheat_cur_year_hotwater",
-        translation_key="stat_genheat_cur_year_hotwater",
-        state_class=SensorStateClass.TOTAL,
-        device_class=SensorDeviceClass.ENERGY,
-        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-        icon="mdi:heat-wave",
-        suggested_display_precision=6,
-    ),
-    SensorEntityDescription(
-        key="stat_genheat_cur_year_defrost",
-        translation_key="stat_genheat_cur_year_defrost",
-        state_class=SensorStateClass.TOTAL,
-        device_class=SensorDeviceClass.ENERGY,
-        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-        icon="mdi:snowflake-melt",
-        suggested_display_precision=6,
-    ),
-    # now stats with electrical power consumption
-    SensorEntityDescription(
-        key="stat_elcons_total_heating",
-        translation_key="stat_elcons_total_heating",
-        state_class=SensorStateClass.TOTAL,
-        device_class=SensorDeviceClass.ENERGY,
-        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-        suggested_display_precision=6,
-    ),
-    SensorEntityDescription(
-        key="stat_elcons_total_cooling",
-        translation_key="stat_elcons_total_cooling",
-        state_class=SensorStateClass.TOTAL,
-        device_class=SensorDeviceClass.ENERGY,
-        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-        suggested_display_precision=6,
-    ),
-    SensorEntityDescription(
-        key="stat_elcons_total_hotwater",
-        translation_key="stat_elcons_total_hotwater",
-        state_class=SensorStateClass.TOTAL,
-        device_class=SensorDeviceClass.ENERGY,
-        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-        suggested_display_precision=6,
-    ),
-    SensorEntityDescription(
-        key="stat_elcons_total_defrost",
-        translation_key="stat_elcons_total_defrost",
-        state_class=SensorStateClass.TOTAL,
-        device_class=SensorDeviceClass.ENERGY,
-        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-        suggested_display_precision=6,
-    ),
-    SensorEntityDescription(
-        key="stat_elcons_cur_year_heating",
-        translation_key="stat_elcons_cur_year_heating",
-        state_class=SensorStateClass.TOTAL,
-        device_class=SensorDeviceClass.ENERGY,
-        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-        suggested_display_precision=6,
-    ),
-    SensorEntityDescription(
-        key="stat_elcons_cur_year_cooling",
-        translation_key="stat_elcons_cur_year_cooling",
-        state_class=SensorStateClass.TOTAL,
-        device_class=SensorDeviceClass.ENERGY,
-        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-        suggested_display_precision=6,
-    ),
-    SensorEntityDescription(
-        key="stat_elcons_cur_year_hotwater",
-        translation_key="stat_elcons_cur_year_hotwater",
-        state_class=SensorStateClass.TOTAL,
-        device_class=SensorDeviceClass.ENERGY,
-        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-        suggested_display_precision=6,
-    ),
-    SensorEntityDescription(
-        key="stat_elcons_cur_year_defrost",
-        translation_key="stat_elcons_cur_year_defrost",
-        state_class=SensorStateClass.TOTAL,
-        device_class=SensorDeviceClass.ENERGY,
-        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-        suggested_display_precision=6,
-    ),
-    # heatpump status values
-    SensorEntityDescription(
-        key="flow_temp_set_hc_A",
-        translation_key="flow_temp_set_hc_a",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="flow_temp_set_hc_B",
-        translation_key="flow_temp_set_hc_b",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="flow_temp_set_hc_C",
-        translation_key="flow_temp_set_hc_c",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="flow_temp_set_hc_D",
-        translation_key="flow_temp_set_hc_d",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="flow_temp_set_hc_E",
-        translation_key="flow_temp_set_hc_e",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="flow_temp_set_hc_F",
-        translation_key="flow_temp_set_hc_f",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="flow_temp_set_hc_G",
-        translation_key="flow_temp_set_hc_g",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.TEMPERATURE,
-        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="cur_el_power_pre",
-        translation_key="cur_el_power_pre",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.POWER,
-        native_unit_of_measurement=UnitOfPower.KILO_WATT,
-        suggested_display_precision=4,
-    ),
-    SensorEntityDescription(
-        key="mode_heatcirc_A",
-        translation_key="mode_heatcirc_a",
-    ),
-    SensorEntityDescription(
-        key="mode_heatcirc_B",
-        translation_key="mode_heatcirc_b",
-    ),
-    SensorEntityDescription(
-        key="mode_heatcirc_C",
-        translation_key="mode_heatcirc_c",
-    ),
-    SensorEntityDescription(
-        key="mode_heatcirc_D",
-        translation_key="mode_heatcirc_d",
-    ),
-    SensorEntityDescription(
-        key="mode_heatcirc_E",
-        translation_key="mode_heatcirc_e",
-    ),
-    SensorEntityDescription(
-        key="mode_heatcirc_F",
-        translation_key="mode_heatcirc_f",
-    ),
-    SensorEntityDescription(
-        key="mode_heatcirc_G",
-        translation_key="mode_heatcirc_g",
-    ),
-    SensorEntityDescription(
-        key="cur_heat_power",
-        translation_key="cur_heat_power",
-        state_class=SensorStateClass.MEASUREMENT,
-        device_class=SensorDeviceClass.POWER,
-        native_unit_of_measurement=UnitOfPower.KILO_WATT,
-        suggested_display_precision=1,
-    ),
-    SensorEntityDescription(
-        key="heatpump_op_mode",
-        translation_key="heatpump_op_mode",
-    ),
-    SensorEntityDescription(
-        key="heatpump_compressor",
-        translation_key="heatpump_compressor",
-        icon="mdi:play",
-    ),
-)
+        @callback
+        def async_unsubscribe() -> None:
+            self.my_subscribers.remove(subscriber)
+
+        return async_unsubscribe
+
+    @callback
+    def async_end_subscriptions(self) -> None:
+        """End the subscribers that can be ended (websocket), the coordinator unloads."""
+        for subscriber in list(self.my_subscribers):
+            end = getattr(subscriber, "async_end", None)
+            if end is not None:
+                end()
 
-SENSORS = {desc.key: desc for desc in SENSOR_TYPES}
+    def _getWindow(self, key: str, sensor) -> IdmWindow | None:
+        """Return the aggregation window of a sensor, None if its values are written directly."""
+        if key not in self.my_windows:
+            mode = None
+            if self.my_aggrWindow > 0 and isinstance(sensor, IDM_Entity):
+                mode = self.my_aggrClasses.get(sensor.entity_description.device_class)
+            self.my_windows[key] = IdmWindow(self.my_aggrWindow, mode) if mode else None
+        return self.my_windows[key]
+
+    def _processData(self, data: IdmResponseData) -> str:
+        """Create new entities and write the received values to them."""
+        for subscriber in self.my_subscribers:
+            subscriber.push(data)  # full rate, before aggregation
+        now = time.monotonic()
+        for i in range(data.lenResp()):
+            (key, answer, unit) = data.getResp(i)
+            if answer is IDM_INVALID:
+                # keep the last good state, a broken value never reaches the entity
+                _LOGGER.debug("Invalid value received for key %s", key)
+                continue
+
+            if key not in self._mySensors:
+                entity_description = getSensorDescriptions().get(key)
+                if entity_description:
+                    self._mySensors[key] = IDM_Entity(self, key, entity_description)
+                    self.async_add_entities([self._mySensors[key]])
+                    _LOGGER.debug("Added new sensor for key %s", key)
+                else:
+                    _LOGGER.debug(
+                        "Small warning! No sensor description found for key %s",
+                        key,
+                    )
+
+            sensor = self._mySensors.get(key)
+            if sensor:
+                if sensor.enabled:
+                    window = self._getWindow(key, sensor)
+                    if window:
+                        # aggregated sensor, only one state per window is written
+                        result = window.add(answer, now)
+                        if result is None:
+                            continue
+                        (answer, attributes) = result
+                        sensor.setAttributes(attributes)
+                    if isinstance(sensor, IDM_Entity):
+                        sensor.setAge(data.getAge(key))
+                    sensor.setValue(answer)
+                    sensor.async_write_ha_state()  # even value not changed, we need to inform HA to avoid stale data
+
+        if data.lenResp() == 0:
+            _LOGGER.warning("No data received from iDM Heatpump")
+        elif not data.isPartial():
+            # the slow lane is due again after the full cycle time, a failed full update is retried next tick
+            self.my_nextFullUpdate = (
+                time.monotonic() + self.my_fullInterval.total_seconds()
+            )
+
+        _LOGGER.debug("IDM Data update complete. Found: %d items", data.lenResp())
+        return ""
+
+
+def _impactSensorTypes() -> tuple[SensorEntityDescription, ...]:
+    """Build the descriptions of the impact sensors (milliseconds per cycle)."""
+    return tuple(
+        SensorEntityDescription(
+            key=metric,
+            translation_key=metric,
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.DURATION,
+            native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+            suggested_display_precision=1,
+            entity_category=EntityCategory.DIAGNOSTIC,
+            entity_registry_enabled_default=False,
+        )
+        for metric in IMPACT_METRICS
+    )
+
+
+def _cycleSensorTypes() -> tuple[SensorEntityDescription, ...]:
+    """Build the descriptions of the compressor and defrost cycle sensors."""
+    descriptions = []
+    for metric in CYCLE_METRICS:
+        if metric == CYCLE_STARTS_HOUR:
+            description = SensorEntityDescription(
+                key=metric,
+                translation_key=metric,
+                state_class=SensorStateClass.MEASUREMENT,
+                native_unit_of_measurement="1/h",
+                suggested_display_precision=1,
+            )
+        elif metric in (CYCLE_STARTS_TODAY, DEFROST_TODAY):
+            description = SensorEntityDescription(
+                key=metric,
+                translation_key=metric,
+                state_class=SensorStateClass.TOTAL_INCREASING,  # reset at midnight
+            )
+        else:
+            description = SensorEntityDescription(
+                key=metric,
+                translation_key=metric,
+                state_class=SensorStateClass.MEASUREMENT,
+                device_class=SensorDeviceClass.DURATION,
+                native_unit_of_measurement=(
+                    UnitOfTime.HOURS
+                    if metric == DEFROST_INTERVAL
+                    else UnitOfTime.MINUTES
+                ),
+                suggested_display_precision=1,
+            )
+        descriptions.append(description)
+    return tuple(descriptions)
+
+
+# the descriptions are built with the first use (first refresh), not at import, to keep HA boot fast
+def _sensorTypes() -> tuple[SensorEntityDescription, ...]:
+    """Build all sensor descriptions."""
+    return (
+        SensorEntityDescription(
+            key="software_version",
+            translation_key="software_version",
+        ),
+        SensorEntityDescription(
+            key="regler_online",
+            translation_key="regler_online",
+            state_class=SensorStateClass.TOTAL_INCREASING,
+            device_class=SensorDeviceClass.DURATION,
+            native_unit_of_measurement=UnitOfTime.HOURS,
+        ),
+        SensorEntityDescription(
+            key="runtime_nb_1",
+            translation_key="runtime_nb_1",
+            state_class=SensorStateClass.TOTAL_INCREASING,
+            device_class=SensorDeviceClass.DURATION,
+            native_unit_of_measurement=UnitOfTime.HOURS,
+        ),
+        SensorEntityDescription(
+            key="switch_cycles_nb_1",
+            translation_key="switch_cycles_nb_1",
+            state_class=SensorStateClass.TOTAL_INCREASING,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="runtime_nb_2",
+            translation_key="runtime_nb_2",
+            state_class=SensorStateClass.TOTAL_INCREASING,
+            device_class=SensorDeviceClass.DURATION,
+            native_unit_of_measurement=UnitOfTime.HOURS,
+        ),
+        SensorEntityDescription(
+            key="switch_cycles_nb_2",
+            translation_key="switch_cycles_nb_2",
+            state_class=SensorStateClass.TOTAL_INCREASING,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="runtime_heating",
+            translation_key="runtime_heating",
+            state_class=SensorStateClass.TOTAL_INCREASING,
+            device_class=SensorDeviceClass.DURATION,
+            native_unit_of_measurement=UnitOfTime.HOURS,
+        ),
+        SensorEntityDescription(
+            key="runtime_cooling",
+            translation_key="runtime_cooling",
+            state_class=SensorStateClass.TOTAL_INCREASING,
+            device_class=SensorDeviceClass.DURATION,
+            native_unit_of_measurement=UnitOfTime.HOURS,
+        ),
+        SensorEntityDescription(
+            key="runtime_hotwater",
+            translation_key="runtime_hotwater",
+            state_class=SensorStateClass.TOTAL_INCREASING,
+            device_class=SensorDeviceClass.DURATION,
+            native_unit_of_measurement=UnitOfTime.HOURS,
+        ),
+        SensorEntityDescription(
+            key="runtime_defrosting",
+            translation_key="runtime_defrosting",
+            state_class=SensorStateClass.TOTAL_INCREASING,
+            device_class=SensorDeviceClass.DURATION,
+            native_unit_of_measurement=UnitOfTime.HOURS,
+        ),
+        # Input, Output and Sensor values
+        SensorEntityDescription(
+            key="B32",
+            translation_key="outdoor_temperature",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="B33",
+            translation_key="flow_temperature",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="B34",
+            translation_key="return_temperature",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="B48",
+            translation_key="water_temp_top",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="B41",
+            translation_key="water_temp_bottom",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="B53",
+            translation_key="flow_temp_heatcircuit_c",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="B71",
+            translation_key="hotgas_temperature",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="B37",
+            translation_key="airsource_temperature",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="B79",
+            translation_key="vaporize_start_temperature",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="B78",
+            translation_key="vaporize_pressure",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.PRESSURE,
+            native_unit_of_measurement=UnitOfPressure.BAR,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="B78v",
+            translation_key="vaporize_temperature",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="B86v",
+            translation_key="condense_temperature",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="B86",
+            translation_key="condense_pressure",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.PRESSURE,
+            native_unit_of_measurement=UnitOfPressure.BAR,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="B87",
+            translation_key="liquid_temperature",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="board_temperature",
+            translation_key="board_temperature",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="B2",
+            translation_key="flowmeter",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.VOLUME_FLOW_RATE,
+            native_unit_of_measurement=UnitOfVolumeFlowRate.LITERS_PER_MINUTE,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="battery_voltage_central_unit",
+            translation_key="voltage_mainboard",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.VOLTAGE,
+            native_unit_of_measurement=UnitOfElectricPotential.VOLT,
+            suggested_display_precision=2,
+        ),
+        # Digital Inputs
+        SensorEntityDescription(
+            key="external_request",
+            translation_key="external_trigger",
+        ),
+        SensorEntityDescription(
+            key="ext_switch_heating_cooling",
+            translation_key="ext_trig_heat_cool",
+        ),
+        SensorEntityDescription(
+            key="ew_evu_lock_contact",
+            translation_key="ewu_evu_lock_contact",
+        ),
+        SensorEntityDescription(
+            key="B15",
+            translation_key="problem_eheat",
+        ),
+        SensorEntityDescription(
+            key="B5",
+            translation_key="dewpoint_protection_active",
+        ),
+        SensorEntityDescription(
+            key="ext_hotwater_signal",
+            translation_key="ext_trig_hotwater",
+        ),
+        SensorEntityDescription(
+            key="B10",
+            translation_key="problem_high_pressure",
+        ),
+        SensorEntityDescription(
+            key="M73#1",
+            translation_key="flow_pumpe_active",
+        ),
+        # Analog Outputs
+        SensorEntityDescription(
+            key="M73#2",
+            translation_key="flow_pumpe_speed",
+            state_class=SensorStateClass.MEASUREMENT,
+            native_unit_of_measurement="%",
+            suggested_display_precision=0,
+        ),
+        SensorEntityDescription(
+            key="M13",
+            translation_key="fan_speed",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.VOLTAGE,
+            native_unit_of_measurement=UnitOfElectricPotential.VOLT,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="ainout_80_81",
+            translation_key="ainout_80_81",
+            state_class=SensorStateClass.MEASUREMENT,
+            native_unit_of_measurement="%",
+            suggested_display_precision=2,
+        ),
+        SensorEntityDescription(
+            key="ainout_82_83",
+            translation_key="ainout_82_83",
+            state_class=SensorStateClass.MEASUREMENT,
+            native_unit_of_measurement="%",
+            suggested_display_precision=2,
+        ),
+        SensorEntityDescription(
+            key="ainout_84_85",
+            translation_key="ainout_84_85",
+            state_class=SensorStateClass.MEASUREMENT,
+            native_unit_of_measurement="%",
+            suggested_display_precision=2,
+        ),
+        SensorEntityDescription(
+            key="ainout_86_87",
+            translation_key="ainout_86_87",
+            state_class=SensorStateClass.MEASUREMENT,
+            native_unit_of_measurement="%",
+            suggested_display_precision=2,
+        ),
+        SensorEntityDescription(
+            key="ainout_88_89",
+            translation_key="ainout_88_89",
+            state_class=SensorStateClass.MEASUREMENT,
+            native_unit_of_measurement="%",
+            suggested_display_precision=2,
+        ),
+        SensorEntityDescription(
+            key="ainout_180_181",
+            translation_key="ainout_180_181",
+            state_class=SensorStateClass.MEASUREMENT,
+            native_unit_of_measurement="%",
+            suggested_display_precision=2,
+        ),
+        # Digital Outputs
+        SensorEntityDescription(
+            key="M73#3",
+            translation_key="flow_pumpe_actstate",
+        ),
+        SensorEntityDescription(
+            key="M51",
+            translation_key="4_way_valve_circut1",
+        ),
+        SensorEntityDescription(
+            key="M31",
+            translation_key="flowpump_circuit_a",
+        ),
+        SensorEntityDescription(
+            key="M33",
+            translation_key="flowpump_circuit_c",
+        ),
+        SensorEntityDescription(
+            key="M43",
+            translation_key="mixer_circuit_c",
+        ),
+        SensorEntityDescription(
+            key="M64",
+            translation_key="hotwater_circulation_pump",
+        ),
+        SensorEntityDescription(
+            key="E31",
+            translation_key="siphon_heating",
+        ),
+        SensorEntityDescription(
+            key="e_heater_1kw_on",
+            translation_key="e_heater_1kw_on",
+        ),
+        SensorEntityDescription(
+            key="e_heater_2kw_on",
+            translation_key="e_heater_2kw_on",
+        ),
+        SensorEntityDescription(
+            key="e_heater_3kw_on",
+            translation_key="e_heater_3kw_on",
+        ),
+        SensorEntityDescription(
+            key="M61",
+            translation_key="valve_heating_cooling",
+        ),
+        SensorEntityDescription(
+            key="M62",
+            translation_key="valve_warm_cold",
+        ),
+        SensorEntityDescription(
+            key="M63",
+            translation_key="value_heating_hotwater",
+        ),
+        # idm Service Parameter
+        SensorEntityDescription(
+            key="super_heating_1",
+            translation_key="super_heating_1",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="sub_cooling",
+            translation_key="sub_cooling",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="valve_position",
+            translation_key="valve_position",
+            state_class=SensorStateClass.MEASUREMENT,
+            native_unit_of_measurement="%",
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="valve_pos_sub_cool",
+            translation_key="valve_pos_sub_cool",
+            state_class=SensorStateClass.MEASUREMENT,
+            native_unit_of_measurement="%",
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="valve_pos_evdmini",
+            translation_key="valve_pos_evdmini",
+            state_class=SensorStateClass.MEASUREMENT,
+            native_unit_of_measurement="%",
+            suggested_display_precision=1,
+        ),
+        # idm PV Parameter (if PV is configured in iDM)
+        SensorEntityDescription(
+            key="cur_exp_power_heating",
+            translation_key="cur_exp_power_heating",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.POWER,
+            native_unit_of_measurement=UnitOfPower.KILO_WATT,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="cur_exp_power_cooling",
+            translation_key="cur_exp_power_cooling",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.POWER,
+            native_unit_of_measurement=UnitOfPower.KILO_WATT,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="cur_exp_power_hotwater",
+            translation_key="cur_exp_power_hotwater",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.POWER,
+            native_unit_of_measurement=UnitOfPower.KILO_WATT,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="cur_el_power",
+            translation_key="cur_el_power",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.POWER,
+            native_unit_of_measurement=UnitOfPower.KILO_WATT,
+            suggested_display_precision=1,
+        ),
+        # statistics values if statistics are enabled
+        # first with runtime values
+        SensorEntityDescription(
+            key="stat_runtime_total_heating",
+            translation_key="stat_runtime_total_heating",
+            state_class=SensorStateClass.MEASUREMENT,
+            native_unit_of_measurement=UnitOfTime.HOURS,
+            suggested_display_precision=6,
+        ),
+        SensorEntityDescription(
+            key="stat_runtime_total_cooling",
+            translation_key="stat_runtime_total_cooling",
+            state_class=SensorStateClass.MEASUREMENT,
+            native_unit_of_measurement=UnitOfTime.HOURS,
+            suggested_display_precision=6,
+        ),
+        SensorEntityDescription(
+            key="stat_runtime_total_hotwater",
+            translation_key="stat_runtime_total_hotwater",
+            state_class=SensorStateClass.MEASUREMENT,
+            native_unit_of_measurement=UnitOfTime.HOURS,
+            suggested_display_precision=6,
+        ),
+        SensorEntityDescription(
+            key="stat_runtime_total_defrost",
+            translation_key="stat_runtime_total_defrost",
+            state_class=SensorStateClass.MEASUREMENT,
+            native_unit_of_measurement=UnitOfTime.HOURS,
+            suggested_display_precision=6,
+        ),
+        SensorEntityDescription(
+            key="stat_runtime_cur_year_heating",
+            translation_key="stat_runtime_cur_year_heating",
+            state_class=SensorStateClass.MEASUREMENT,
+            native_unit_of_measurement=UnitOfTime.HOURS,
+            suggested_display_precision=6,
+        ),
+        SensorEntityDescription(
+            key="stat_runtime_cur_year_cooling",
+            translation_key="stat_runtime_cur_year_cooling",
+            state_class=SensorStateClass.MEASUREMENT,
+            native_unit_of_measurement=UnitOfTime.HOURS,
+            suggested_display_precision=6,
+        ),
+        SensorEntityDescription(
+            key="stat_runtime_cur_year_hotwater",
+            translation_key="stat_runtime_cur_year_hotwater",
+            state_class=SensorStateClass.MEASUREMENT,
+            native_unit_of_measurement=UnitOfTime.HOURS,
+            suggested_display_precision=6,
+        ),
+        SensorEntityDescription(
+            key="stat_runtime_cur_year_defrost",
+            translation_key="stat_runtime_cur_year_defrost",
+            state_class=SensorStateClass.MEASUREMENT,
+            native_unit_of_measurement=UnitOfTime.HOURS,
+            suggested_display_precision=6,
+        ),
+        # now stats with generated heat
+        SensorEntityDescription(
+            key="stat_genheat_total_heating",
+            translation_key="stat_genheat_total_heating",
+            state_class=SensorStateClass.TOTAL,
+            device_class=SensorDeviceClass.ENERGY,
+            native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+            icon="mdi:heat-wave",
+            suggested_display_precision=6,
+        ),
+        SensorEntityDescription(
+            key="stat_genheat_total_cooling",
+            translation_key="stat_genheat_total_cooling",
+            state_class=SensorStateClass.TOTAL,
+            device_class=SensorDeviceClass.ENERGY,
+            native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+            icon="mdi:snowflake",
+            suggested_display_precision=6,
+        ),
+        SensorEntityDescription(
+            key="stat_genheat_total_hotwater",
+            translation_key="stat_genheat_total_hotwater",
+            state_class=SensorStateClass.TOTAL,
+            device_class=SensorDeviceClass.ENERGY,
+            native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+            icon="mdi:heat-wave",
+            suggested_display_precision=6,
+        ),
+        SensorEntityDescription(
+            key="stat_genheat_total_defrost",
+            translation_key="stat_genheat_total_defrost",
+            state_class=SensorStateClass.TOTAL,
+            device_class=SensorDeviceClass.ENERGY,
+            native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+            icon="mdi:snowflake-melt",
+            suggested_display_precision=6,
+        ),
+        SensorEntityDescription(
+            key="stat_genheat_cur_year_heating",
+            translation_key="stat_genheat_cur_year_heating",
+            state_class=SensorStateClass.TOTAL,
+            device_class=SensorDeviceClass.ENERGY,
+            native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+            icon="mdi:heat-wave",
+            suggested_display_precision=6,
+        ),
+        SensorEntityDescription(
+            key="stat_genheat_cur_year_cooling",
+            translation_key="stat_genheat_cur_year_cooling",
+            state_class=SensorStateClass.TOTAL,
+            device_class=SensorDeviceClass.ENERGY,
+            native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+            icon="mdi:snowflake",
+            suggested_display_precision=6,
+        ),
+        SensorEntityDescription(
+            key="stat_genheat_cur_year_hotwater",
+            translation_key="stat_genheat_cur_year_hotwater",
+            state_class=SensorStateClass.TOTAL,
+            device_class=SensorDeviceClass.ENERGY,
+            native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+            icon="mdi:heat-wave",
+            suggested_display_precision=6,
+        ),
+        SensorEntityDescription(
+            key="stat_genheat_cur_year_defrost",
+            translation_key="stat_genheat_cur_year_defrost",
+            state_class=SensorStateClass.TOTAL,
+            device_class=SensorDeviceClass.ENERGY,
+            native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+            icon="mdi:snowflake-melt",
+            suggested_display_precision=6,
+        ),
+        # now stats with electrical power consumption
+        SensorEntityDescription(
+            key="stat_elcons_total_heating",
+            translation_key="stat_elcons_total_heating",
+            state_class=SensorStateClass.TOTAL,
+            device_class=SensorDeviceClass.ENERGY,
+            native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+            suggested_display_precision=6,
+        ),
+        SensorEntityDescription(
+            key="stat_elcons_total_cooling",
+            translation_key="stat_elcons_total_cooling",
+            state_class=SensorStateClass.TOTAL,
+            device_class=SensorDeviceClass.ENERGY,
+            native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+            suggested_display_precision=6,
+        ),
+        SensorEntityDescription(
+            key="stat_elcons_total_hotwater",
+            translation_key="stat_elcons_total_hotwater",
+            state_class=SensorStateClass.TOTAL,
+            device_class=SensorDeviceClass.ENERGY,
+            native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+            suggested_display_precision=6,
+        ),
+        SensorEntityDescription(
+            key="stat_elcons_total_defrost",
+            translation_key="stat_elcons_total_defrost",
+            state_class=SensorStateClass.TOTAL,
+            device_class=SensorDeviceClass.ENERGY,
+            native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+            suggested_display_precision=6,
+        ),
+        SensorEntityDescription(
+            key="stat_elcons_cur_year_heating",
+            translation_key="stat_elcons_cur_year_heating",
+            state_class=SensorStateClass.TOTAL,
+            device_class=SensorDeviceClass.ENERGY,
+            native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+            suggested_display_precision=6,
+        ),
+        SensorEntityDescription(
+            key="stat_elcons_cur_year_cooling",
+            translation_key="stat_elcons_cur_year_cooling",
+            state_class=SensorStateClass.TOTAL,
+            device_class=SensorDeviceClass.ENERGY,
+            native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+            suggested_display_precision=6,
+        ),
+        SensorEntityDescription(
+            key="stat_elcons_cur_year_hotwater",
+            translation_key="stat_elcons_cur_year_hotwater",
+            state_class=SensorStateClass.TOTAL,
+            device_class=SensorDeviceClass.ENERGY,
+            native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+            suggested_display_precision=6,
+        ),
+        SensorEntityDescription(
+            key="stat_elcons_cur_year_defrost",
+            translation_key="stat_elcons_cur_year_defrost",
+            state_class=SensorStateClass.TOTAL,
+            device_class=SensorDeviceClass.ENERGY,
+            native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+            suggested_display_precision=6,
+        ),
+        # heatpump status values
+        SensorEntityDescription(
+            key="flow_temp_set_hc_A",
+            translation_key="flow_temp_set_hc_a",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="flow_temp_set_hc_B",
+            translation_key="flow_temp_set_hc_b",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="flow_temp_set_hc_C",
+            translation_key="flow_temp_set_hc_c",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="flow_temp_set_hc_D",
+            translation_key="flow_temp_set_hc_d",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="flow_temp_set_hc_E",
+            translation_key="flow_temp_set_hc_e",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="flow_temp_set_hc_F",
+            translation_key="flow_temp_set_hc_f",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="flow_temp_set_hc_G",
+            translation_key="flow_temp_set_hc_g",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.TEMPERATURE,
+            native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="cur_el_power_pre",
+            translation_key="cur_el_power_pre",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.POWER,
+            native_unit_of_measurement=UnitOfPower.KILO_WATT,
+            suggested_display_precision=4,
+        ),
+        SensorEntityDescription(
+            key="mode_heatcirc_A",
+            translation_key="mode_heatcirc_a",
+        ),
+        SensorEntityDescription(
+            key="mode_heatcirc_B",
+            translation_key="mode_heatcirc_b",
+        ),
+        SensorEntityDescription(
+            key="mode_heatcirc_C",
+            translation_key="mode_heatcirc_c",
+        ),
+        SensorEntityDescription(
+            key="mode_heatcirc_D",
+            translation_key="mode_heatcirc_d",
+        ),
+        SensorEntityDescription(
+            key="mode_heatcirc_E",
+            translation_key="mode_heatcirc_e",
+        ),
+        SensorEntityDescription(
+            key="mode_heatcirc_F",
+            translation_key="mode_heatcirc_f",
+        ),
+        SensorEntityDescription(
+            key="mode_heatcirc_G",
+            translation_key="mode_heatcirc_g",
+        ),
+        SensorEntityDescription(
+            key="cur_heat_power",
+            translation_key="cur_heat_power",
+            state_class=SensorStateClass.MEASUREMENT,
+            device_class=SensorDeviceClass.POWER,
+            native_unit_of_measurement=UnitOfPower.KILO_WATT,
+            suggested_display_precision=1,
+        ),
+        SensorEntityDescription(
+            key="heatpump_op_mode",
+            translation_key="heatpump_op_mode",
+        ),
+        SensorEntityDescription(
+            key="heatpump_compressor",
+            translation_key="heatpump_compressor",
+            icon="mdi:play",
+        ),
+    )
+
+
+@cache
+def getSensorDescriptions() -> dict[str, SensorEntityDescription]:
+    """Return the sensor descriptions by key, built once."""
+    return {desc.key: desc for desc in _sensorTypes()}
+
+
+@cache
+def getNumericKeys() -> frozenset[str]:
+    """Return the keys of the sensors with a numeric state, their text values are invalid."""
+    return frozenset(
+        key
+        for key, desc in getSensorDescriptions().items()
+        if desc.native_unit_of_measurement is not None
+        or desc.state_class is not None
+        or desc.device_class
+        not in (
+            None,
+            SensorDeviceClass.ENUM,
+            SensorDeviceClass.TIMESTAMP,
+            SensorDeviceClass.DATE,
+        )
+    )
 
 
 class IDM_SoftwareVersionSensor(CoordinatorEntity, SensorEntity):
@@ -938,7 +1319,7 @@ class IDM_SoftwareVersionSensor(CoordinatorEntity, SensorEntity):
         super().__init__(coordinator)
         # self.idx = idx  # Index to identify the sensor (index string)
         self._async_remove_dispatcher = None
-        self.entity_description = SENSORS.get("software_version")
+        self.entity_description = getSensorDescriptions().get("software_version")
         self.idx = self.entity_description.key
         devId = coordinator.config_entry.data[CONF_DISPLAY_NAME]
         self._attr_unique_id = f"{devId}_{self.entity_description.translation_key}"
@@ -981,6 +1362,9 @@ class IDM_Entity(CoordinatorEntity, SensorEntity):
         self.idx = idx  # Index to identify the sensor (index string)
         self._async_remove_dispatcher = None
         self.entity_description = entity_description
+        self._wasAvailable = True
+        self._aggrAttributes = None
+        self._age = 0.0
         devId = coordinator.config_entry.data[CONF_DISPLAY_NAME]
         self._attr_unique_id = f"{devId}_{entity_description.translation_key}"
         self._attr_device_info = DeviceInfo(
@@ -988,10 +1372,97 @@ class IDM_Entity(CoordinatorEntity, SensorEntity):
             name=DEF_DEVICE_NAME,
         )
 
-    def setValue(self, val: str) -> None:
-        """Set the value of the sensor."""
+    def setValue(self, val) -> None:
+        """Set the typed value (int, float, IdmState or text) of the sensor."""
         self._attr_native_value = val
 
+    def setAttributes(self, attributes: dict | None) -> None:
+        """Set the aggregation attributes (min, max, last) of the sensor, None keeps them."""
+        if attributes is not None:
+            self._aggrAttributes = attributes
+
+    def setAge(self, age: float) -> None:
+        """Set the age of a value taken from the last-good cache, 0 for fresh values."""
+        self._age = age
+
+    @property
+    def extra_state_attributes(self) -> dict | None:
+        """Return the aggregation attributes and the age of cached values."""
+        if not self._age:
+            return self._aggrAttributes
+        return {**(self._aggrAttributes or {}), "data_age": round(self._age)}
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state only if the availability changed, values are written by the coordinator."""
+        # with the fast lane the coordinator ticks often, writing all states each tick is too expensive
+        if self.available != self._wasAvailable:
+            self._wasAvailable = self.available
+            self.async_write_ha_state()
+
     def getIdx(self) -> str:
         """Get the index of the sensor."""
         return self.idx
+
+
+class IDM_ImpactSensor(SensorEntity):
+    """Diagnostic sensor with the time one update cycle costs the event loop or executor."""
+
+    _attr_should_poll = False
+    _attr_has_entity_name = True
+
+    def __init__(self, coordinator, entity_description) -> None:
+        """Initialize the sensor."""
+        self.monitor = coordinator.my_impact
+        self.entity_description = entity_description
+        devId = coordinator.config_entry.data[CONF_DISPLAY_NAME]
+        self._attr_unique_id = f"{devId}_{entity_description.translation_key}"
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, devId)},
+            name=DEF_DEVICE_NAME,
+        )
+
+    async def async_added_to_hass(self) -> None:
+        """Update with each measured cycle."""
+        self.monitor.listeners.append(self._handle_cycle)
+        self.async_on_remove(lambda: self.monitor.listeners.remove(self._handle_cycle))
+
+    @callback
+    def _handle_cycle(self) -> None:
+        """Write the last measurement in milliseconds."""
+        seconds = self.monitor.last(self.entity_description.key)
+        if seconds is not None:
+            self._attr_native_value = round(seconds * 1000, 3)
+            self.async_write_ha_state()
+
+
+class IDM_CycleSensor(SensorEntity):
+    """Sensor with one compressor or defrost cycle metric, written only when it changes."""
+
+    _attr_should_poll = False
+    _attr_has_entity_name = True
+
+    def __init__(self, coordinator, entity_description) -> None:
+        """Initialize the sensor."""
+        self.cycles = coordinator.my_cycles
+        self.entity_description = entity_description
+        devId = coordinator.config_entry.data[CONF_DISPLAY_NAME]
+        self._attr_unique_id = f"{devId}_{entity_description.translation_key}"
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, devId)},
+            name=DEF_DEVICE_NAME,
+        )
+        self._attr_native_value = self.cycles.value(entity_description.key)
+
+    async def async_added_to_hass(self) -> None:
+        """Update with each received cycle."""
+        self.cycles.listeners.append(self._handle_cycle)
+        self.async_on_remove(lambda: self.cycles.listeners.remove(self._handle_cycle))
+
+    @callback
+    def _handle_cycle(self) -> None:
+        """Write the metric, if it changed."""
+        value = self.cycles.value(self.entity_description.key)
+        if value != self._attr_native_value:
+            self._attr_native_value = value
+            self.async_write_ha_state()
@@ -0,0 +1,142 @@
+"""Services for the iDM Heatpump Web integration."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+import voluptuous as vol
+
+from homeassistant.config_entries import ConfigEntry, ConfigEntryState
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+)
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    DATA_COORDINATOR,
+    SERVICE_PROFILE,
+    SERVICE_SET_VALUE,
+    DEF_PROFILE_CYCLES,
+    DEF_PROFILE_MAX_CYCLES,
+    DEF_PROFILE_INTERVAL_MS,
+)
+from .profiler import IdmCycleProfiler
+
+_LOGGER = logging.getLogger(__name__)
+
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_CYCLES = "cycles"
+ATTR_INTERVAL_MS = "interval_ms"
+ATTR_PARAMETER = "parameter"
+ATTR_VALUE = "value"
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_CYCLES, default=DEF_PROFILE_CYCLES): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=DEF_PROFILE_MAX_CYCLES)
+        ),
+        vol.Optional(ATTR_INTERVAL_MS, default=DEF_PROFILE_INTERVAL_MS): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=100)
+        ),
+    }
+)
+
+SET_VALUE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Required(ATTR_PARAMETER): cv.string,
+        vol.Required(ATTR_VALUE): cv.string,  # numbers are converted for numeric items
+    }
+)
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services of the integration."""
+
+    async def async_profile(call: ServiceCall) -> ServiceResponse:
+        """Profile the next update cycles of one or all heatpumps."""
+        entries = _get_loaded_entries(hass, call)
+        results = await asyncio.gather(
+            *(
+                _async_profile_entry(
+                    hass, entry, call.data[ATTR_CYCLES], call.data[ATTR_INTERVAL_MS]
+                )
+                for entry in entries
+            )
+        )
+        return {entry.title: result for entry, result in zip(entries, results)}
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE,
+        async_profile,
+        schema=PROFILE_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def async_set_value(call: ServiceCall) -> None:
+        """Queue a settings value, it is written and read back by the next cycles."""
+        for entry in _get_loaded_entries(hass, call):
+            entry.runtime_data[DATA_COORDINATOR].my_api.writes.set(
+                call.data[ATTR_PARAMETER], call.data[ATTR_VALUE]
+            )
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_SET_VALUE, async_set_value, schema=SET_VALUE_SCHEMA
+    )
+
+
+def _get_loaded_entries(hass: HomeAssistant, call: ServiceCall) -> list[ConfigEntry]:
+    """Return the entries addressed by the service call."""
+    entries = [
+        entry
+        for entry in hass.config_entries.async_entries(DOMAIN)
+        if entry.state is ConfigEntryState.LOADED
+        and DATA_COORDINATOR in entry.runtime_data
+    ]
+    entryId = call.data.get(ATTR_CONFIG_ENTRY_ID)
+    if entryId:
+        entries = [entry for entry in entries if entry.entry_id == entryId]
+    if not entries:
+        raise HomeAssistantError("No loaded iDM heatpump found for this service call")
+    return entries
+
+
+async def _async_profile_entry(
+    hass: HomeAssistant, entry: ConfigEntry, cycles: int, interval_ms: float
+) -> dict:
+    """Profile the next cycles of one coordinator and write the result files."""
+    coordinator = entry.runtime_data[DATA_COORDINATOR]
+    if coordinator.my_profiler:
+        raise HomeAssistantError("Profiling is already running for " + entry.title)
+
+    profiler = IdmCycleProfiler(cycles, interval_ms / 1000)
+    coordinator.my_profiler = profiler
+    # wait at most twice the expected time, a failing heatpump shall not block the call forever
+    timeout = cycles * coordinator.update_interval.total_seconds() * 2 + 30
+    try:
+        await asyncio.wait_for(asyncio.shield(profiler.finished), timeout)
+    except TimeoutError:
+        _LOGGER.warning("Profiling %s stopped after %d seconds", entry.title, timeout)
+    finally:
+        coordinator.my_profiler = None
+        profiler.stop()
+
+    basePath = hass.config.path(
+        DOMAIN
+        + "_profile_"
+        + entry.title
+        + "_"
+        + dt_util.now().strftime("%Y%m%d_%H%M%S")
+    )
+    result = profiler.summary()
+    result["files"] = await hass.async_add_executor_job(profiler.writeFiles, basePath)
+    return result
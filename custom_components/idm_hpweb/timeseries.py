@@ -0,0 +1,162 @@
+# Local time series store of all polled values, full resolution without the HA recorder
+
+import time
+import logging
+import threading
+
+from collections import deque
+from homeassistant.core import HomeAssistant, callback
+from .idmHeatpumpWeb import IdmResponseData, IDM_INVALID
+
+_LOGGER = logging.getLogger(__name__)
+
+idmSinkMaxBuffer = 200000  # rows kept in memory, if flushing fails (oldest are dropped)
+idmSinkPurgeInterval = 24 * 3600  # seconds between two retention runs
+idmSinkVacuumPages = 2000  # pages given back to the file system per retention run
+
+idmSinkSchema = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "CREATE TABLE IF NOT EXISTS series ("
+    "id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE, unit TEXT)",
+    # clustered by series and time: the values of one key are stored together (columnar)
+    "CREATE TABLE IF NOT EXISTS samples ("
+    "series INTEGER NOT NULL, ts INTEGER NOT NULL, value, "
+    "PRIMARY KEY (series, ts)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS samples_ts ON samples (ts)",
+)
+
+
+class IdmTimeSeriesSink:
+    """Append the typed values of each cycle to a SQLite database.
+
+    Subscribed to the coordinator like a websocket subscriber: push() runs on the event
+    loop and only buffers the rows. async_flush() writes the buffer in one transaction
+    from the executor, it is called periodically and on unload. Numbers are stored as
+    numbers, states (on, off, ...) as text, the time stamp in milliseconds. Values from
+    the last-good cache are no new samples and are skipped. Once a day rows older than
+    the retention are deleted and the freed pages are given back (incremental vacuum).
+    """
+
+    def __init__(self, hass: HomeAssistant, path: str, retentionDays: int) -> None:
+        """Initialize the sink, the database is opened with the first flush."""
+        self.hass = hass
+        self.path = path
+        self.retention = retentionDays * 24 * 3600
+        self._buffer = deque(maxlen=idmSinkMaxBuffer)  # (ts ms, key, value, unit)
+        self._lock = threading.Lock()  # flush and close run in executor threads
+        self._db = None
+        self._series = {}  # key -> (series id, unit)
+        self._nextPurge = 0.0  # monotonic time of the next retention run
+
+    @callback
+    def push(self, data: IdmResponseData) -> None:
+        """Buffer the values of one cycle."""
+        ts = int(time.time() * 1000)
+        for i in range(data.lenResp()):
+            (key, value, unit) = data.getResp(i)
+            if value is IDM_INVALID or data.getAge(key):
+                continue
+            if not isinstance(value, (int, float)):
+                value = str(value)
+            self._buffer.append((ts, key, value, unit))
+
+    async def async_flush(self, now=None) -> None:
+        """Write the buffered rows from the executor (also as time interval listener)."""
+        if not self._buffer:
+            return
+        rows = list(self._buffer)
+        self._buffer.clear()
+        if not await self.hass.async_add_executor_job(self.flush, rows):
+            # written again with the next flush, in front of the rows buffered meanwhile
+            newer = list(self._buffer)
+            self._buffer.clear()
+            self._buffer.extend(rows)
+            self._buffer.extend(newer)  # beyond maxlen the oldest rows are dropped
+
+    async def async_close(self) -> None:
+        """Write the rest of the buffer and close the database (unload)."""
+        await self.async_flush()
+        await self.hass.async_add_executor_job(self.close)
+
+    def _open(self) -> None:
+        """Open the database and load the known series."""
+        import sqlite3  # noqa: PLC0415 - lazy, the time series is opt-in
+
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        if self._db.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # incremental vacuum needs to be set before the first table is created
+            self._db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        for statement in idmSinkSchema:
+            self._db.execute(statement)
+        self._series = {
+            key: (seriesId, unit)
+            for seriesId, key, unit in self._db.execute(
+                "SELECT id, key, unit FROM series"
+            )
+        }
+
+    def _seriesId(self, key: str, unit: str | None) -> int:
+        """Return the series id of key, create it or update its unit if needed."""
+        known = self._series.get(key)
+        if known is None:
+            cursor = self._db.execute(
+                "INSERT INTO series (key, unit) VALUES (?, ?)", (key, unit)
+            )
+            known = (cursor.lastrowid, unit)
+            self._series[key] = known
+        elif unit is not None and known[1] != unit:
+            self._db.execute(
+                "UPDATE series SET unit = ? WHERE id = ?", (unit, known[0])
+            )
+            known = (known[0], unit)
+            self._series[key] = known
+        return known[0]
+
+    # return True if the rows are written, False if they shall be written again later
+    def flush(self, rows: list) -> bool:
+        """Write rows in one transaction, run the retention once a day, blocking."""
+        import sqlite3  # noqa: PLC0415 - lazy, see _open
+
+        with self._lock:
+            try:
+                if self._db is None:
+                    self._open()
+                with self._db:  # one transaction for the whole batch
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO samples (series, ts, value) VALUES (?, ?, ?)",
+                        [
+                            (self._seriesId(key, unit), ts, value)
+                            for ts, key, value, unit in rows
+                        ],
+                    )
+            except sqlite3.Error as e:
+                _LOGGER.warning("Writing the time series failed: " + str(e))
+                # series created in the rolled back transaction do not exist, reload them
+                self._series = {}
+                if self._db is not None:
+                    self._db.close()
+                    self._db = None
+                return False
+            if time.monotonic() >= self._nextPurge:
+                self._nextPurge = time.monotonic() + idmSinkPurgeInterval
+                try:
+                    self._purge()
+                except sqlite3.Error as e:
+                    _LOGGER.warning("Retention of the time series failed: " + str(e))
+            return True
+
+    def _purge(self) -> None:
+        """Delete rows older than the retention and give freed pages back."""
+        limit = int((time.time() - self.retention) * 1000)
+        with self._db:
+            deleted = self._db.execute("DELETE FROM samples WHERE ts < ?", (limit,))
+        self._db.execute("PRAGMA incremental_vacuum(%d)" % idmSinkVacuumPages)
+        _LOGGER.debug("Time series retention removed %d rows", deleted.rowcount)
+
+    def close(self) -> None:
+        """Close the database, blocking."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,147 @@
+"""Websocket API of the iDM Heatpump Web integration, live values for frontend cards."""
+
+from __future__ import annotations
+
+import time
+import logging
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DOMAIN, DATA_COORDINATOR, WS_SUBSCRIBE
+from .idmHeatpumpWeb import IdmResponseData, IDM_INVALID
+
+_LOGGER = logging.getLogger(__name__)
+
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_KEYS = "keys"
+ATTR_MIN_INTERVAL = "min_interval"
+
+
+class IdmSubscription:
+    """One websocket subscriber of the parsed values of a coordinator.
+
+    Each update cycle the values of the subscribed keys are sent as an event, not
+    limited by the aggregation or the state writes of the entities. With min_interval
+    the subscriber gets at most one event per interval, values received in between
+    are collected and the newest ones are sent with the next event. When the config
+    entry unloads (or reloads), the subscription ends with an error, the frontend
+    subscribes again to the new coordinator.
+    """
+
+    def __init__(
+        self,
+        connection: websocket_api.ActiveConnection,
+        msgId: int,
+        entryId: str,
+        keys: frozenset[str] | None,
+        minInterval: float,
+    ) -> None:
+        """Initialize the subscription, keys = None for all values."""
+        self.connection = connection
+        self.msgId = msgId
+        self.entryId = entryId
+        self.keys = keys
+        self.minInterval = minInterval
+        self._lastSent = 0.0  # monotonic time of the last event
+        self._pending = {}  # key -> value dict, not yet sent
+
+    @callback
+    def push(self, data: IdmResponseData) -> None:
+        """Send the values of one cycle, or keep them till the rate cap allows it."""
+        for i in range(data.lenResp()):
+            (key, value, unit) = data.getResp(i)
+            if value is IDM_INVALID or (self.keys is not None and key not in self.keys):
+                continue
+            item = {"value": value if isinstance(value, (int, float)) else str(value)}
+            if unit:
+                item["unit"] = unit
+            age = data.getAge(key)
+            if age:
+                item["age"] = round(age, 1)  # taken from the last-good cache
+            self._pending[key] = item
+        now = time.monotonic()
+        if not self._pending or now - self._lastSent < self.minInterval:
+            return
+        self.connection.send_message(
+            websocket_api.event_message(
+                self.msgId,
+                {
+                    ATTR_CONFIG_ENTRY_ID: self.entryId,
+                    "partial": data.isPartial(),
+                    "values": self._pending,
+                },
+            )
+        )
+        self._lastSent = now
+        self._pending = {}
+
+    @callback
+    def async_end(self) -> None:
+        """End the subscription, the coordinator of its entry unloads."""
+        unsubscribe = self.connection.subscriptions.pop(self.msgId, None)
+        if unsubscribe is None:
+            return  # already ended, e.g. by another unloaded entry
+        unsubscribe()  # from the coordinators of the other entries as well
+        self.connection.send_error(
+            self.msgId,
+            websocket_api.ERR_NOT_FOUND,
+            "iDM heatpump unloaded, subscribe again",
+        )
+
+
+@callback
+def async_setup_websocket(hass: HomeAssistant) -> None:
+    """Register the websocket commands of the integration."""
+    websocket_api.async_register_command(hass, ws_subscribe)
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): WS_SUBSCRIBE,
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): str,
+        vol.Optional(ATTR_KEYS): [str],
+        vol.Optional(ATTR_MIN_INTERVAL, default=0): vol.All(
+            vol.Coerce(float), vol.Range(min=0)
+        ),
+    }
+)
+@callback
+def ws_subscribe(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict
+) -> None:
+    """Subscribe to the parsed values of one or all heatpumps."""
+    entries = [
+        entry
+        for entry in hass.config_entries.async_entries(DOMAIN)
+        if entry.state is ConfigEntryState.LOADED
+        and DATA_COORDINATOR in entry.runtime_data
+        and msg.get(ATTR_CONFIG_ENTRY_ID, entry.entry_id) == entry.entry_id
+    ]
+    if not entries:
+        connection.send_error(
+            msg["id"], websocket_api.ERR_NOT_FOUND, "No loaded iDM heatpump found"
+        )
+        return
+
+    keys = frozenset(msg[ATTR_KEYS]) if ATTR_KEYS in msg else None
+    unsubscribers = [
+        entry.runtime_data[DATA_COORDINATOR].async_subscribe(
+            IdmSubscription(
+                connection, msg["id"], entry.entry_id, keys, msg[ATTR_MIN_INTERVAL]
+            )
+        )
+        for entry in entries
+    ]
+
+    @callback
+    def async_unsubscribe() -> None:
+        """Remove the subscription from all coordinators."""
+        for unsubscribe in unsubscribers:
+            unsubscribe()
+
+    connection.subscriptions[msg["id"]] = async_unsubscribe
+    connection.send_result(msg["id"])
@@ -0,0 +1,157 @@
+# Queue of the settings written to the idm web: coalesced, debounced, read back to check
+
+import json
+import time
+import logging
+import threading
+
+from collections import deque
+
+_LOGGER = logging.getLogger(__name__)
+
+idmWriteDebounce = 2.0  # seconds a value must be unchanged, before it is written
+idmWriteRetries = 2  # writes of a value, which is not read back, before it is given up
+idmWriteResults = 20  # last results kept (diagnostics)
+idmWriteFields = ("edesc", "id", "index", "name", "type")  # sent back like the web ui
+
+WRITE_VERIFIED = "verified"
+WRITE_FAILED = "failed"
+WRITE_UNKNOWN = "unknown_parameter"
+
+
+# txt = settings.php response, paramId = value of the "id" field of the item
+# return the item as dict or None if not found
+def extractSettingItem(txt: str, paramId: str) -> dict | None:
+    pos = txt.find('"id":"' + paramId + '"')
+    if pos == -1:
+        return None
+    start = txt.rfind("{", 0, pos)
+    end = txt.find("}", pos)
+    if start == -1 or end == -1:
+        return None
+    try:
+        return json.loads(txt[start : end + 1])
+    except ValueError:
+        return None  # not a flat item
+
+
+# wanted = value written, read = value of the item read back
+# return True if both are the same value
+def sameValue(wanted, read) -> bool:
+    try:
+        return abs(float(wanted) - float(read)) < 1e-6
+    except (TypeError, ValueError):
+        return str(wanted) == str(read)
+
+
+class IdmWriteQueue:
+    """Collect the values to write and hand them to the data cycle in batches.
+
+    set() may be called any time: a newer value of the same parameter replaces the
+    queued one, and a value is only written after it was unchanged for the debounce
+    time. The data cycle passes each settings.php response to observe(), which takes
+    the item of each queued parameter as template and compares written values with
+    the value read back. Afterwards due() returns the writes of this cycle, sent in the
+    same session lock, so they never race the poll. A value not read back is written
+    again, at most idmWriteRetries times.
+    """
+
+    def __init__(self, debounce: float = idmWriteDebounce) -> None:
+        """Initialize an empty queue."""
+        self.debounce = debounce
+        self._lock = threading.Lock()  # set() runs on the event loop, the rest not
+        self.pending = {}  # id -> (value, monotonic time of last change, writes done)
+        self.verifying = {}  # id -> (value, writes done), written, not yet read back
+        self.templates = {}  # id -> (fields of the item in settings.php, numeric value)
+        self.results = deque(maxlen=idmWriteResults)  # (id, value, result, wall time)
+
+    def __bool__(self) -> bool:
+        """True if writes are queued or wait for their read back."""
+        return bool(self.pending or self.verifying)
+
+    def set(self, paramId: str, value) -> None:
+        """Queue a value, replaces a value of the same parameter not yet written."""
+        with self._lock:
+            self.verifying.pop(paramId, None)
+            self.pending[paramId] = (value, time.monotonic(), 0)
+
+    def _result(self, paramId: str, value, result: str) -> None:
+        """Keep and log the result of a write."""
+        self.results.append((paramId, value, result, time.time()))
+        if result == WRITE_VERIFIED:
+            _LOGGER.debug("Write of %s = %s verified", paramId, value)
+        else:
+            _LOGGER.warning("Write of %s = %s %s", paramId, value, result)
+
+    def observe(self, txt: str) -> None:
+        """Take the items of the queued parameters from a parsed settings.php frame."""
+        with self._lock:
+            for paramId in list(self.pending) + list(self.verifying):
+                item = extractSettingItem(txt, paramId)
+                if item is None:
+                    if paramId in self.pending:
+                        (value, changed, writes) = self.pending.pop(paramId)
+                    else:
+                        (value, writes) = self.verifying.pop(paramId)
+                    self._result(paramId, value, WRITE_UNKNOWN)
+                    continue
+                self.templates[paramId] = (
+                    {field: item[field] for field in idmWriteFields if field in item},
+                    isinstance(item.get("value"), (int, float)),
+                )
+                if paramId not in self.verifying:
+                    continue
+                (value, writes) = self.verifying.pop(paramId)
+                if sameValue(value, item.get("value")):
+                    self._result(paramId, value, WRITE_VERIFIED)
+                elif writes >= idmWriteRetries:
+                    self._result(paramId, value, WRITE_FAILED)
+                else:
+                    self.pending[paramId] = (value, 0.0, writes)  # write again now
+
+    def due(self, now: float) -> list[tuple[str, dict]]:
+        """Return (id, request body) of the values to write in this cycle."""
+        writes = []
+        with self._lock:
+            for paramId, (value, changed, done) in list(self.pending.items()):
+                template = self.templates.get(paramId)
+                if template is None or now - changed < self.debounce:
+                    continue  # not seen in settings.php yet or still changing
+                (fields, numeric) = template
+                if numeric:
+                    try:
+                        value = float(value)
+                    except (TypeError, ValueError):
+                        del self.pending[paramId]
+                        self._result(paramId, value, WRITE_FAILED)
+                        continue
+                writes.append((paramId, dict(fields, value=value)))
+        return writes
+
+    def sent(self, paramId: str, body: dict, ok: bool) -> None:
+        """Mark a write as sent, it is verified with the next settings.php response."""
+        with self._lock:
+            queued = self.pending.get(paramId)
+            if queued is None or not sameValue(queued[0], body["value"]):
+                return  # changed again meanwhile, the new value is written next cycle
+            writes = queued[2] + 1
+            if ok:
+                del self.pending[paramId]
+                self.verifying[paramId] = (queued[0], writes)
+            elif writes >= idmWriteRetries:
+                del self.pending[paramId]
+                self._result(paramId, queued[0], WRITE_FAILED)
+            else:
+                self.pending[paramId] = (queued[0], 0.0, writes)  # again next cycle
+
+    def status(self) -> dict:
+        """Return queued, unverified and the last results (diagnostics)."""
+        with self._lock:
+            return {
+                "pending": {k: v[0] for k, v in self.pending.items()},
+                "verifying": {k: v[0] for k, v in self.verifying.items()},
+                "results": [
+                    {"id": r[0], "value": r[1], "result": r[2], "time": r[3]}
+                    for r in self.results
+                ],
+            }
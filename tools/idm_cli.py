@@ -0,0 +1,142 @@
+"""Command line client for iDM Navigator web interfaces, no Home Assistant needed.
+
+Polls one or more hosts with the client of the integration and writes each parsed
+cycle as one JSON line (host, cycle, time stamp, duration, values with unit and age).
+The cycle times are reported per host on stderr, with a summary at the end:
+
+    python tools/idm_cli.py 192.168.1.20 192.168.1.21 --pin 4444 --interval 10 --cycles 60 > values.jsonl
+
+A host "replay:<recording>[@speed]" replays responses recorded by the integration,
+e.g. to benchmark the parser: --interval 0 --cycles 1000 replay:/tmp/idm_record@0
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import statistics
+import sys
+import threading
+import time
+
+from idm_core import loadCore
+
+idmWeb = loadCore()
+
+_print_lock = threading.Lock()
+
+
+def jsonValue(value):
+    """Return value as json type, invalid values become null."""
+    if value is idmWeb.IDM_INVALID:
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    return str(value)
+
+
+def cycleRecord(host: str, cycle: int, duration: float, data) -> dict:
+    """Return the JSON line of one cycle."""
+    values = {}
+    for i in range(data.lenResp()):
+        (key, value, unit) = data.getResp(i)
+        values[key] = {"value": jsonValue(value), "unit": unit}
+        age = data.getAge(key)
+        if age:
+            values[key]["age"] = round(age, 1)  # taken from the last-good cache
+    return {
+        "host": host,
+        "cycle": cycle,
+        "ts": round(time.time(), 3),
+        "duration_ms": round(duration * 1000, 1),
+        "values": values,
+    }
+
+
+def pollHost(host: str, args, out, durations: list) -> None:
+    """Poll one host for the given number of cycles (0 = till interrupted)."""
+    idm = idmWeb.idmHeatpumpWeb(None, host, args.pin, args.timeout, args.stat_div)
+    keys = frozenset(args.keys.split(",")) if args.keys else None
+    if idm.idm_login() != "success":
+        print(f"{host}: login failed", file=sys.stderr)
+    cycle = 0
+    try:
+        while args.cycles == 0 or cycle < args.cycles:
+            start = time.monotonic()
+            # the cycle budget is its interval, but at least one request (as in the integration)
+            deadline = start + max(args.timeout + 2, args.interval)
+            data = idmWeb.blocking_idm_get_data_function(idm, keys, deadline)
+            duration = time.monotonic() - start
+            durations.append(duration)
+            line = json.dumps(
+                cycleRecord(host, cycle, duration, data), ensure_ascii=False
+            )
+            with _print_lock:
+                out.write(line + "\n")
+                out.flush()
+                if not args.quiet:
+                    print(
+                        f"{host}: cycle {cycle} {duration * 1000:8.1f} ms "
+                        f"{data.lenResp()} values",
+                        file=sys.stderr,
+                    )
+            cycle += 1
+            time.sleep(max(0.0, start + args.interval - time.monotonic()))
+    finally:
+        idm.close()
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Return the percentile of values (nearest rank)."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("hosts", nargs="+")
+    parser.add_argument("--pin", default="4444")
+    parser.add_argument("--timeout", type=int, default=3)
+    parser.add_argument("--interval", type=float, default=10.0)
+    parser.add_argument("--cycles", type=int, default=1, help="0 = till interrupted")
+    parser.add_argument("--stat-div", type=int, default=0, help="0 = no statistics")
+    parser.add_argument("--keys", default=None, help="comma separated, partial cycles")
+    parser.add_argument("--quiet", action="store_true", help="no per cycle report")
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING)
+
+    durations = [(host, []) for host in args.hosts]
+    threads = [
+        threading.Thread(
+            target=pollHost,
+            args=(host, args, sys.stdout, times),
+            name="idm " + host,
+            daemon=True,
+        )
+        for host, times in durations
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        pass
+
+    print("cycle times per host:", file=sys.stderr)
+    for host, times in durations:
+        if not times:
+            print(f"  {host}: no cycle", file=sys.stderr)
+            continue
+        print(
+            f"  {host}: {len(times)} cycles, median {statistics.median(times) * 1000:.1f} ms"
+            f", p95 {percentile(times, 0.95) * 1000:.1f} ms, max {max(times) * 1000:.1f} ms",
+            file=sys.stderr,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,34 @@
+"""Import the plain Python core of the iDM Heatpump Web integration without Home Assistant.
+
+The package __init__ of custom_components.idm_hpweb sets up the HA integration and
+imports Home Assistant. The client (idmHeatpumpWeb), the payload recorder, the
+latency tracker and the aggregation do not need it. loadCore() registers the
+package without running its __init__, so these modules can be imported on any
+Python 3.11 box. If Home Assistant is installed, the regular package is used.
+"""
+
+from __future__ import annotations
+
+import importlib
+import os
+import sys
+import types
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+PACKAGE = "custom_components.idm_hpweb"
+
+
+def loadCore():
+    """Return the idmHeatpumpWeb module, with or without Home Assistant installed."""
+    if PACKAGE not in sys.modules:
+        try:
+            importlib.import_module("homeassistant")
+        except ImportError:
+            # register the packages by path only, their __init__ is never executed
+            for name in ("custom_components", PACKAGE):
+                module = types.ModuleType(name)
+                module.__path__ = [os.path.join(ROOT, *name.split("."))]
+                sys.modules[name] = module
+        else:
+            sys.path.insert(0, ROOT)
+    return importlib.import_module(PACKAGE + ".idmHeatpumpWeb")
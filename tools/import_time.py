@@ -0,0 +1,124 @@
+"""Import time benchmark for the iDM Heatpump Web integration.
+
+Imports the integration modules in a fresh interpreter with -X importtime, after the
+modules Home Assistant has loaded anyway before it sets up a sensor platform. So only
+the contribution of the integration to the HA boot time is reported:
+
+* cumulative import time of each integration module
+* the heaviest modules pulled in by the integration (self time)
+* the time to build the sensor description tables with the first use
+
+Run from the repository root with Home Assistant installed (as for the integration):
+
+    python tools/import_time.py --repeats 7
+
+With --budget-ms the script exits with 1, if the median import time is above it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PACKAGE = "custom_components.idm_hpweb"
+
+# loaded by HA core before the platform of a config entry is set up
+PRELOAD = (
+    "homeassistant.core",
+    "homeassistant.config_entries",
+    "homeassistant.helpers.config_validation",
+    "homeassistant.helpers.entity_platform",
+    "homeassistant.helpers.update_coordinator",
+    "homeassistant.helpers.event",
+    "homeassistant.components.sensor",
+)
+MODULES = (PACKAGE, PACKAGE + ".config_flow", PACKAGE + ".sensor")
+MARKER = "idm_hpweb import start"
+
+CHILD = """
+import sys, time
+for name in {preload!r}:
+    __import__(name)
+sys.stderr.write({marker!r} + "\\n")
+for name in {modules!r}:
+    __import__(name)
+start = time.perf_counter()
+sys.modules[{sensor!r}].getSensorDescriptions()
+sys.stderr.write("idm_hpweb tables: %d\\n" % ((time.perf_counter() - start) * 1e6))
+"""
+
+
+def runOnce() -> tuple[dict[str, int], dict[str, int], int]:
+    """Run one import in a fresh interpreter.
+
+    Return cumulative times of the integration modules, self times of all modules
+    imported after the preload and the table build time, all in microseconds.
+    """
+    code = CHILD.format(
+        preload=PRELOAD, marker=MARKER, modules=MODULES, sensor=PACKAGE + ".sensor"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    cumulative, selfTimes, tables = {}, {}, 0
+    started = False
+    for line in proc.stderr.splitlines():
+        if line == MARKER:
+            started = True
+        elif line.startswith("idm_hpweb tables:"):
+            tables = int(line.split(":")[1])
+        elif started and line.startswith("import time:") and "|" in line:
+            # import time: self [us] | cumulative | imported package
+            fields = line[len("import time:") :].split("|")
+            if not fields[0].strip().isdigit():
+                continue  # header line
+            name = fields[2].strip()
+            selfTimes[name] = int(fields[0])
+            if name in MODULES:
+                cumulative[name] = int(fields[1])
+    return cumulative, selfTimes, tables
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    runs = [runOnce() for _ in range(args.repeats)]
+
+    print(f"median of {args.repeats} runs, HA core modules preloaded")
+    for name in MODULES:
+        times = [r[0].get(name, 0) for r in runs]
+        print(f"  {name:40s} {statistics.median(times) / 1000:8.2f} ms cumulative")
+    total = statistics.median(sum(r[1].values()) for r in runs) / 1000
+    print(f"  {'all modules loaded by the integration':40s} {total:8.2f} ms")
+    tables = statistics.median(r[2] for r in runs) / 1000
+    print(f"  {'sensor descriptions (first use)':40s} {tables:8.2f} ms")
+
+    print(f"heaviest modules pulled in (self time, top {args.top}):")
+    selfMedian = {
+        name: statistics.median(r[1].get(name, 0) for r in runs) for name in runs[0][1]
+    }
+    for name, us in sorted(selfMedian.items(), key=lambda x: -x[1])[: args.top]:
+        print(f"  {name:60s} {us / 1000:8.2f} ms")
+
+    if args.budget_ms is not None and total > args.budget_ms:
+        print(f"FAIL import time {total:.2f} ms > budget {args.budget_ms} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
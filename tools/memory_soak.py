@@ -0,0 +1,371 @@
+"""Long-run memory soak of the client and the coordinator of the iDM Heatpump Web integration.
+
+Drives idmHeatpumpWeb (fetch, parse, last-good cache, write queue) and, with Home
+Assistant installed, IDM_Coordinator._processData (entities, aggregation windows,
+subscribers, cycle analytics, anomaly detection) for many cycles, without a heatpump
+and without the relax times between requests. The payloads come from a recording
+(--host replay:<folder>@0) or are generated like in parser_fuzz.py: rotating
+settings pages, heatpump pages (some without heat circuit) and statistics pages with
+new values each cycle. Under tracemalloc it reports:
+
+* steady state RSS and traced memory after the warmup
+* allocations per cycle (tracemalloc peak above the memory before the cycle)
+* growth: slope of the traced memory over the second half of the cycles,
+  extrapolated to 30 days of 2 second polling, and the source lines which grew most
+  (with --frames > 1 their whole traceback), checked from 50000 cycles on
+
+Entity state writes are kept in a dict instead of the HA state machine, the soak
+covers the memory of the integration, not of Home Assistant. Run from the repository
+root:
+
+    python tools/memory_soak.py --cycles 200000
+    python tools/memory_soak.py --cycles 300000 --host replay:/config/idm_hpweb_record_iDM_Web@0
+
+Exits with 1 if a limit is exceeded.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+from datetime import timedelta
+
+from idm_core import loadCore
+
+idmWeb = loadCore()
+
+import parser_fuzz  # noqa: E402 - needs the package registered by loadCore
+
+DEF_CYCLES = 200000
+DEF_WARMUP = 2000
+DEF_VARIANTS = 16  # generated payload sets, rotated with new values
+DEF_SAMPLE_EVERY = 100  # cycles between two per cycle allocation measurements
+DEF_REPORTS = 50  # traced memory samples over the run
+DEF_MAX_GROWTH_KB_MONTH = 1024.0  # extrapolated growth in 30 days of 2 second polling
+DEF_MAX_CYCLE_KB = 8192.0  # allocations of one cycle
+# below this the slope is dominated by the first allocations of the run, not by growth
+DEF_MIN_GROWTH_CYCLES = 50000
+CYCLES_PER_MONTH = 30 * 24 * 3600 // 2
+
+# the samples of the soak itself are not part of the measured memory
+idmSoakExclude = (
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+)
+
+
+class SoakResponse:
+    """Response of the generated payloads."""
+
+    def __init__(self, status_code: int, text: str) -> None:
+        self.status_code = status_code
+        self.text = text
+
+
+class SoakSession:
+    """Session answering with generated settings, heatpump and statistics pages."""
+
+    def __init__(self, rnd: random.Random, variants: int) -> None:
+        self.rnd = rnd
+        extras = parser_fuzz.extraRows(rnd)
+        self.settings = []
+        for _ in range(variants):
+            io, service, pv = parser_fuzz.sensorRows(rnd, True)
+            self.settings.append(parser_fuzz.buildPayload(extras, io, service, pv))
+        self.cycle = 0
+
+    def heatpump(self) -> str:
+        """Return a heatpump.php page, a heating stage is on in 2 of 3 cycles.
+
+        Every 4th page has no heat circuit block, like a heatpump without circuits.
+        """
+        running = self.cycle % 3 != 0
+        circuit = ""
+        if self.cycle % 4 != 0:
+            circuit = (
+                '{"flow":{"hcmode":1,"temperatures":{"set":"'
+                + str(round(30 + self.rnd.random() * 5, 1))
+                + '"},"hk":"A"}}'
+            )
+        return (
+            '{"circuits":['
+            + circuit
+            + '],"pv":{"hp":"'
+            + str(round(self.rnd.random() * 3, 2))
+            + '"},"system":{"q":{"value":"'
+            + str(round(self.rnd.random() * 8, 2))
+            + '"}},'
+            + ('"stages":1,' if running else "")
+            + '"sysmode":'
+            + ("1" if running else "0")
+            + "}"
+        )
+
+    def statistics(self) -> str:
+        """Return a statistics.php page."""
+        names = parser_fuzz.idmWeb.idmStatDefinitions_en
+        total = ",".join(
+            "{" + name + ',"value":' + str(round(self.rnd.random() * 1000, 1)) + "}"
+            for name in names
+        )
+        yearly = ",".join(str(round(self.rnd.random() * 100, 1)) for _ in names)
+        return (
+            '{"unit":"kWh","total":['
+            + total
+            + '],"yearly":[{"values":[['
+            + yearly
+            + "]]}]}"
+        )
+
+    def get(self, url, headers=None, timeout=None, **kwargs) -> SoakResponse:
+        if url.endswith(idmWeb.idmURL_Settings):
+            self.cycle += 1
+            return SoakResponse(200, self.settings[self.cycle % len(self.settings)])
+        if url.endswith(idmWeb.idmURL_Heatpump):
+            return SoakResponse(200, self.heatpump())
+        if "statistics.php" in url:
+            return SoakResponse(200, self.statistics())
+        return SoakResponse(404, "")
+
+    def post(self, url, data=None, **kwargs) -> SoakResponse:
+        return SoakResponse(200, 'csrf_token="soak"')
+
+    def put(self, url, data=None, **kwargs) -> SoakResponse:
+        return SoakResponse(200, '{"status": "OK"}')
+
+    def close(self) -> None:
+        pass
+
+
+def rssBytes() -> int:
+    """Return the current RSS, the peak RSS where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def tracedBytes() -> int:
+    """Return the traced memory without the allocations of this tool and tracemalloc."""
+    snapshot = tracemalloc.take_snapshot().filter_traces(idmSoakExclude)
+    return sum(stat.size for stat in snapshot.statistics("filename"))
+
+
+def slope(samples: list[tuple[int, int]]) -> float:
+    """Return the least squares slope (bytes per cycle) of (cycle, bytes) samples."""
+    if len(samples) < 2:
+        return 0.0
+    n = len(samples)
+    meanX = sum(x for x, _ in samples) / n
+    meanY = sum(y for _, y in samples) / n
+    varX = sum((x - meanX) ** 2 for x, _ in samples)
+    if varX == 0:
+        return 0.0
+    return sum((x - meanX) * (y - meanY) for x, y in samples) / varX
+
+
+def createClient(args) -> idmWeb.idmHeatpumpWeb:
+    """Create the client with the generated session or the replay of a recording."""
+    session = None
+    if not args.host.startswith(idmWeb.idmReplayPrefix):
+        session = SoakSession(random.Random(args.seed), args.variants)
+    idm = idmWeb.idmHeatpumpWeb(None, args.host, "0", 3, args.stat_div, session)
+    idm.csrf_token = "soak"
+    idm.relax = lambda seconds: None  # no relax times, the heatpump is not real
+    return idm
+
+
+def createCoordinator(idm: idmWeb.idmHeatpumpWeb, states: dict):
+    """Create the coordinator with subscribers, None without Home Assistant."""
+    try:
+        from homeassistant.core import HomeAssistant
+    except ImportError:
+        return None
+    from homeassistant.const import CONF_TIMEOUT
+    from custom_components.idm_hpweb.sensor import IDM_Coordinator
+    from custom_components.idm_hpweb.clock_sync import IdmClockSync
+    from custom_components.idm_hpweb.aggregation import parseAggregationClasses
+    from custom_components.idm_hpweb.anomaly import IdmAnomalyDetector
+    from custom_components.idm_hpweb.const import (
+        CONF_DISPLAY_NAME,
+        DEF_AGGR_CLASSES,
+        EVENT_ANOMALY,
+    )
+
+    hass = HomeAssistant(tempfile.mkdtemp(prefix="idm_soak_"))
+    entry = types.SimpleNamespace(
+        entry_id="soak",
+        title="soak",
+        data={CONF_DISPLAY_NAME: "soak", CONF_TIMEOUT: 3},
+        runtime_data={},
+        async_on_unload=lambda func: None,
+    )
+
+    def addEntities(entities) -> None:
+        for entity in entities:
+            entity.hass = hass
+            entity.entity_id = "sensor.soak_" + entity.entity_description.key.lower()
+            entity.async_write_ha_state = lambda entity=entity: states.__setitem__(
+                entity.entity_id,
+                (entity.native_value, entity.extra_state_attributes),
+            )
+
+    coordinator = IDM_Coordinator(
+        hass,
+        entry,
+        timedelta(seconds=2),
+        idm,
+        addEntities,
+        IdmClockSync(idm, 0),
+        aggr_window=60,
+        aggr_classes=parseAggregationClasses(DEF_AGGR_CLASSES),
+    )
+    coordinator.async_subscribe(coordinator.my_cycles)
+    coordinator.my_anomalies = IdmAnomalyDetector(hass, EVENT_ANOMALY, "soak", 4)
+    coordinator.async_subscribe(coordinator.my_anomalies)
+    return coordinator
+
+
+async def soak(args) -> int:
+    """Run warmup and soak, print the report, return the exit code."""
+    idm = createClient(args)
+    states = {}
+    coordinator = None if args.client_only else createCoordinator(idm, states)
+    print(
+        "soak of the client"
+        + (" and the coordinator" if coordinator else " only (no Home Assistant)")
+    )
+
+    def cycle() -> None:
+        data = idmWeb.blocking_idm_get_data_function(idm)
+        if coordinator:
+            coordinator._processData(data)
+
+    tracemalloc.start(args.frames)
+    start = time.perf_counter()
+    for _ in range(args.warmup):
+        cycle()
+    if not idmWeb.blocking_idm_get_data_function(idm).lenResp():
+        print("FAIL no values received, check --host")
+        return 1
+    gc.collect()
+    baseline = tracedBytes()
+    baselineRss = rssBytes()
+    snapshot = tracemalloc.take_snapshot().filter_traces(idmSoakExclude)
+    print(
+        f"after {args.warmup} warmup cycles: traced {baseline / 1024:.1f} KB, "
+        f"RSS {baselineRss / 1048576:.1f} MB, {len(states)} entities"
+    )
+
+    reportEvery = max(1, args.cycles // args.reports)
+    samples = [(0, baseline)]
+    perCycle = []
+    for i in range(1, args.cycles + 1):
+        if i % args.sample_every == 0:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            cycle()
+            perCycle.append(tracemalloc.get_traced_memory()[1] - before)
+        else:
+            cycle()
+        if i % reportEvery == 0:
+            gc.collect()
+            current = tracedBytes()
+            samples.append((i, current))
+            if not args.quiet:
+                print(
+                    f"  cycle {i:8d}: traced {current / 1024:10.1f} KB "
+                    f"({(current - baseline) / 1024:+8.1f} KB), "
+                    f"RSS {rssBytes() / 1048576:7.1f} MB"
+                )
+    duration = time.perf_counter() - start
+    gc.collect()
+    final = tracedBytes()
+    growth = (
+        tracemalloc.take_snapshot()
+        .filter_traces(idmSoakExclude)
+        .compare_to(snapshot, "traceback" if args.frames > 1 else "lineno")
+    )
+    tracemalloc.stop()
+
+    bytesPerCycle = slope(samples[len(samples) // 2 :])  # steady state, second half
+    monthKb = bytesPerCycle * CYCLES_PER_MONTH / 1024
+    perCycle.sort()
+    cycleKb = perCycle[-1] / 1024 if perCycle else 0.0
+    print(f"{args.cycles} cycles in {duration:.0f} s ({args.cycles / duration:.0f}/s)")
+    print(
+        f"steady state: traced {final / 1024:.1f} KB ({(final - baseline) / 1024:+.1f} KB), "
+        f"RSS {rssBytes() / 1048576:.1f} MB ({(rssBytes() - baselineRss) / 1048576:+.1f} MB)"
+    )
+    if perCycle:
+        print(
+            f"allocations per cycle: median {perCycle[len(perCycle) // 2] / 1024:.1f} KB, "
+            f"p95 {perCycle[int(len(perCycle) * 0.95)] / 1024:.1f} KB, max {cycleKb:.1f} KB"
+        )
+    print(
+        f"growth: {bytesPerCycle:.3f} bytes per cycle, "
+        f"{monthKb:.1f} KB in 30 days of 2 second polling"
+    )
+    for stat in [s for s in growth if s.size_diff > 0][: args.top]:
+        print(f"  {stat.size_diff / 1024:+9.1f} KB {stat.count_diff:+7d} blocks")
+        print(
+            "\n".join(
+                "    " + line for line in stat.traceback.format(most_recent_first=True)
+            )
+        )
+
+    errors = []
+    if args.cycles < DEF_MIN_GROWTH_CYCLES:
+        print(
+            f"WARNING {args.cycles} cycles are too few to extrapolate the growth, "
+            f"at least {DEF_MIN_GROWTH_CYCLES} are needed, the growth is not checked"
+        )
+    elif monthKb > args.max_growth_kb:
+        errors.append(f"growth {monthKb:.1f} KB per month > {args.max_growth_kb} KB")
+    if cycleKb > args.max_cycle_kb:
+        errors.append(
+            f"allocations per cycle {cycleKb:.1f} KB > {args.max_cycle_kb} KB"
+        )
+    if args.max_rss_mb and rssBytes() / 1048576 > args.max_rss_mb:
+        errors.append(f"RSS {rssBytes() / 1048576:.1f} MB > {args.max_rss_mb} MB")
+    for error in errors:
+        print("FAIL " + error)
+    return 1 if errors else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=DEF_CYCLES)
+    parser.add_argument("--warmup", type=int, default=DEF_WARMUP)
+    parser.add_argument(
+        "--host", default="soak", help="replay:<recording>@0 or generated"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--variants", type=int, default=DEF_VARIANTS)
+    parser.add_argument("--stat-div", type=int, default=3, help="0 = no statistics")
+    parser.add_argument("--client-only", action="store_true")
+    parser.add_argument("--frames", type=int, default=1, help="traceback depth")
+    parser.add_argument("--sample-every", type=int, default=DEF_SAMPLE_EVERY)
+    parser.add_argument("--reports", type=int, default=DEF_REPORTS)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--max-growth-kb", type=float, default=DEF_MAX_GROWTH_KB_MONTH)
+    parser.add_argument("--max-cycle-kb", type=float, default=DEF_MAX_CYCLE_KB)
+    parser.add_argument("--max-rss-mb", type=float, default=None)
+    parser.add_argument("--quiet", action="store_true", help="no intermediate reports")
+    args = parser.parse_args()
+    return asyncio.run(soak(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
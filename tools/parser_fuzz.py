@@ -0,0 +1,383 @@
+"""Generative fuzz harness for the settings.php parser of the iDM Heatpump Web integration.
+
+Builds synthetic settings.php payloads from the sensor definitions of the client,
+mutates them (reordered rows, missing keys, huge service sections, duplicate M73 keys,
+general values spread over two sections)
+and feeds them through idmHeatpumpWeb.parseSettings. Generated heatpump.php pages with
+none to three heat circuits go through idmHeatpumpWeb.parseHeatpump. Checks:
+
+* completeness: an unmutated payload returns every defined key
+* learning: absent keys are skipped after a few parses and found again by the re-probe,
+  partial parses in service mode keep what the full parses learned
+* soundness: a returned value always belongs to its key, never invalid or an error text
+* heatpump.php: power, compressor and operating mode are found with and without heat circuits
+* time budget: parse time per KB of payload stays below the budget
+* growth: doubling the payload must not (nearly) quadruple the parse time
+* allocation budget: tracemalloc peak stays below a multiple of the payload size
+
+Home Assistant is not needed, the client is imported with idm_core.loadCore(). Run
+from the repository root:
+
+    python tools/parser_fuzz.py --iterations 300 --seed 1
+
+Exits with 1 if any check fails.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+
+from idm_core import loadCore
+
+idmWeb = loadCore()
+
+DIGITAL_LABELS = {"on", "off", "OK", "Problem!"}  # mapped digital values
+DEF_BUDGET_US_PER_KB = 400.0  # parse time budget per KB payload
+DEF_MAX_GROWTH = 3.0  # max. time factor per doubled payload (quadratic is 4)
+DEF_MAX_ALLOC_FACTOR = 8.0  # max. tracemalloc peak in multiples of the payload size
+
+
+class Row:
+    """One generated table row and the answer the parser shall return for it."""
+
+    def __init__(self, html: str, answerKey: str | None, value: str) -> None:
+        self.html = html
+        self.answerKey = answerKey  # None for junk rows
+        self.value = value
+
+
+def sensorRows(rnd: random.Random, serviceMode: bool) -> tuple[list, list, list]:
+    """Generate io, service and pv rows from the english sensor definitions."""
+    ioRows, serviceRows, pvRows = [], [], []
+    target = ioRows
+    for index, (k, v) in enumerate(idmWeb.idmSensorDefinitions_en.items()):
+        if v == "super_heating_1":
+            target = serviceRows
+        elif v == "cur_exp_power_heating":
+            target = pvRows
+        if v.startswith(("flow_pump_on", "failure_", "dewpoint", "high_pressure")):
+            value = str(rnd.randint(0, 1))
+        else:
+            value = str(index) + "." + str(rnd.randint(0, 999))  # unique per key
+        if len(k) <= 5:
+            searchK = k.split("#")[0]
+            html = "<tr><td>" + searchK + "</td><td>descr " + v + "</td><td>"
+            answerKey = k
+        else:
+            html = "<tr><td>-</td><td>" + k + "</td><td>"
+            answerKey = v
+        target.append(Row(html + value + "</td><td>unit</td></tr>", answerKey, value))
+    if not serviceMode:
+        # AInOut values are only sent in service mode, they switch the parser to service mode
+        ioRows = [r for r in ioRows if not r.answerKey.startswith("ainout")]
+        serviceRows = []
+    return ioRows, serviceRows, pvRows
+
+
+def extraRows(rnd: random.Random) -> list:
+    """Generate the rows of the general settings part."""
+    rows = []
+    for key, startDel, endDel, sensorKey in idmWeb.iDMExtraData_en:
+        value = str(rnd.randint(1, 99999))
+        rows.append(Row(key + startDel + value + endDel, sensorKey, value))
+    return rows
+
+
+def junkRows(rnd: random.Random, count: int) -> list:
+    """Generate rows, which must never be returned."""
+    return [
+        Row(
+            "<tr><td>X"
+            + str(i)
+            + "</td><td>junk parameter "
+            + str(i)
+            + "</td><td>"
+            + str(rnd.random())
+            + "</td><td>-</td></tr>",
+            None,
+            "",
+        )
+        for i in range(count)
+    ]
+
+
+def buildPayload(
+    extras: list, io: list, service: list, pv: list, splitGeneral: bool = False
+) -> str:
+    """Assemble a settings.php like payload, splitGeneral = extras in two sections."""
+    half = len(extras) // 2 if splitGeneral else len(extras)
+    parts = [
+        '[{"edesc":"_GENERAL",'
+        + idmWeb.iDM_IdentificationString_en
+        + ',"value":"<table>',
+        "".join(r.html for r in extras[:half]),
+    ]
+    if splitGeneral:
+        # the layout of the general values is not fixed, they may span more sections
+        parts.append('</table>"},{"edesc":"_GENERAL_2","name":"More","value":"<table>')
+    parts += [
+        "".join(r.html for r in extras[half:]),
+        '</table>"},{"edesc":"_INPUTS_OUTPUTS_INFO","name":"I/O","value":"<table>',
+        "".join(r.html for r in io),
+        "".join(r.html for r in service),
+        '</table>"}',
+    ]
+    if pv:
+        parts.append(',{"edesc":"_PV","name":"PV","value":"<table>')
+        parts.append("".join(r.html for r in pv))
+        parts.append('</table>"}')
+    parts.append("]")
+    return "".join(parts)
+
+
+def parse(payload: str, idm: idmWeb.idmHeatpumpWeb | None = None) -> list:
+    """Run the client parser on payload, return list of (key, value)."""
+    if idm is None:
+        idm = idmWeb.idmHeatpumpWeb(None, "127.0.0.1", "0", 3, 0)
+    data = idmWeb.IdmResponseData()
+    idm.parseSettings(payload, data)
+    return [data.getResp(i)[:2] for i in range(data.lenResp())]  # (key, value)
+
+
+def sameValue(value, expected: str) -> bool:
+    """Compare a typed parser value with the generated raw string."""
+    if isinstance(value, (int, float)):
+        return value == float(expected)
+    return str(value) == expected or (
+        expected in ("0", "1") and value in DIGITAL_LABELS
+    )
+
+
+def checkResult(
+    name: str, result: list, rows: list, complete: bool, positional: bool
+) -> list:
+    """Compare the parser answer with the generated rows, return list of errors."""
+    errors = []
+    expected = {r.answerKey: r.value for r in rows if r.answerKey}
+    seen = set()
+    for key, value in result:
+        seen.add(key)
+        if key not in expected:
+            continue  # not generated here (e.g. heatpump.php values)
+        if "#" in key and not positional:
+            # keys used more than once (M73#1..3) are told apart by their position only,
+            # with removed or reordered rows the parser cannot know which one it found
+            continue
+        if value is idmWeb.IDM_INVALID or value == "":
+            errors.append(f"{name}: invalid value returned for {key}: {value!r}")
+        elif not sameValue(value, expected[key]):
+            errors.append(f"{name}: wrong value for {key}: {value} != {expected[key]}")
+    if complete:
+        missing = [k for k in expected if k not in seen]
+        if missing:
+            errors.append(f"{name}: keys not found: {missing}")
+    return errors
+
+
+def fuzzOnce(rnd: random.Random) -> list:
+    """Generate one mutated payload, parse it and check the result."""
+    serviceMode = rnd.random() < 0.5
+    extras = extraRows(rnd)
+    io, service, pv = sensorRows(rnd, serviceMode)
+    if rnd.random() < 0.3:
+        pv = []
+    mutation = rnd.choice(
+        ["none", "missing", "reorder", "huge_service", "dup_m73", "split_general"]
+    )
+    complete = mutation in ("none", "split_general")
+    if mutation == "missing":
+        io = [r for r in io if rnd.random() > 0.3]
+        service = [r for r in service if rnd.random() > 0.3]
+        pv = [r for r in pv if rnd.random() > 0.3]
+    elif mutation == "reorder":
+        rnd.shuffle(io)
+    elif mutation == "huge_service" and serviceMode:
+        pos = rnd.randint(0, len(service))
+        service = service[:pos] + junkRows(rnd, rnd.randint(100, 2000)) + service[pos:]
+    elif mutation == "dup_m73":
+        dups = [Row(r.html, None, "") for r in io if r.answerKey.startswith("M73")]
+        io = io + dups  # duplicates behind the originals must not change the result
+    rows = extras + io + service + pv
+    payload = buildPayload(extras, io, service, pv, mutation == "split_general")
+    name = f"{mutation}/{'service' if serviceMode else 'normal'}"
+    positional = mutation not in ("missing", "reorder")
+    return checkResult(name, parse(payload), rows, complete, positional)
+
+
+def checkLearning(rnd: random.Random) -> list:
+    """Parse with one client: absent keys are learned, skipped and found again later."""
+    errors = []
+    idm = idmWeb.idmHeatpumpWeb(None, "127.0.0.1", "0", 3, 0)
+    extras = extraRows(rnd)
+    io, service, pv = sensorRows(rnd, False)
+    present = [r for r in io if "#" in r.answerKey or rnd.random() > 0.3]
+    payload = buildPayload(extras, present, service, pv)
+    for i in range(idmWeb.idmAbsentMisses + 3):
+        errors.extend(
+            checkResult(
+                f"learning/{i}", parse(payload, idm), extras + present + pv, True, True
+            )
+        )
+    keyOf = {v: k for k, v in idmWeb.idmSensorDefinitions_en.items()}  # long keys
+    absent = [keyOf.get(r.answerKey, r.answerKey) for r in io if r not in present]
+    if any(idm.keyMisses.get(k, 0) < idmWeb.idmAbsentMisses for k in absent):
+        errors.append("learning: absent keys not learned")
+    # the keys come back (e.g. new hardware), they must be found with the next re-probe
+    full = buildPayload(extras, io, service, pv)
+    for _ in range(idmWeb.idmAbsentReprobe):
+        result = parse(full, idm)
+    errors.extend(checkResult("learning/reprobe", result, extras + io + pv, True, True))
+
+    # in service mode a partial parse (fast lane) must not reset what full parses learned
+    idm = idmWeb.idmHeatpumpWeb(None, "127.0.0.1", "0", 3, 0)
+    io, service, pv = sensorRows(rnd, True)
+    payload = buildPayload(extras, io, service, pv)
+    parse(payload, idm)  # switches to service mode, the learned state is reset
+    parse(payload, idm)
+    learned = len(idm.keyOffsets)
+    idm.parseSettings(payload, idmWeb.IdmResponseData(frozenset(["B33", "B34"])))
+    parse(payload, idm)
+    if not idm.lastServiceMode or len(idm.keyOffsets) < learned:
+        errors.append(
+            f"learning/service: {len(idm.keyOffsets)} of {learned} offsets kept"
+        )
+    return errors
+
+
+def heatpumpPage(rnd: random.Random, circuits: str) -> tuple[str, dict]:
+    """Return a heatpump.php page with the heat circuits and the expected values."""
+    expected = {}
+    flows = []
+    for letter in circuits:
+        setTemp = str(round(25 + rnd.random() * 20, 1))
+        flows.append(
+            '{"flow":{"hcmode":1,"temperatures":{"set":"'
+            + setTemp
+            + '"},"hk":"'
+            + letter
+            + '"}}'
+        )
+        expected["flow_temp_set_hc_" + letter] = setTemp
+    power = str(round(rnd.random() * 3, 2))
+    heat = str(round(rnd.random() * 8, 2))
+    expected.update(
+        cur_el_power_pre=power,
+        cur_heat_power=heat,
+        heatpump_compressor="on",
+        heatpump_op_mode="heating",
+    )
+    page = (
+        '{"circuits":['
+        + ",".join(flows)
+        + '],"pv":{"hp":"'
+        + power
+        + '"},"system":{"q":{"value":"'
+        + heat
+        + '"}},"stages":1,"sysmode":1}'
+    )
+    return page, expected
+
+
+def checkHeatpump(rnd: random.Random) -> list:
+    """Parse heatpump.php pages with none to three heat circuits."""
+    errors = []
+    for circuits in ("", "A", "AB", "ACG"):
+        page, expected = heatpumpPage(rnd, circuits)
+        name = f"heatpump/{circuits or 'no_circuit'}"
+        data = idmWeb.IdmResponseData()
+        try:
+            idmWeb.idmHeatpumpWeb(None, "127.0.0.1", "0", 3, 0).parseHeatpump(
+                page, data
+            )
+        except Exception as e:  # noqa: BLE001
+            errors.append(f"{name}: parser raised {e!r}")
+            continue
+        result = {data.getResp(i)[0]: data.getResp(i)[1] for i in range(data.lenResp())}
+        for key, value in expected.items():
+            if key not in result:
+                errors.append(f"{name}: key not found: {key}")
+            elif not sameValue(result[key], value):
+                errors.append(
+                    f"{name}: wrong value for {key}: {result[key]} != {value}"
+                )
+    return errors
+
+
+def measure(payload: str, repeats: int) -> tuple[float, int]:
+    """Return best parse time in seconds and tracemalloc peak in bytes."""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        parse(payload)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    tracemalloc.start()
+    parse(payload)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def checkBudgets(rnd: random.Random, args) -> list:
+    """Check time, growth and allocation budgets with growing service sections."""
+    errors = []
+    extras = extraRows(rnd)
+    io, service, pv = sensorRows(rnd, True)
+    lastTime = None
+    for junk in (500, 1000, 2000, 4000, 8000):
+        payload = buildPayload(extras, io, junkRows(rnd, junk) + service, pv)
+        sizeKb = len(payload) / 1024
+        duration, peak = measure(payload, args.repeats)
+        usPerKb = duration * 1e6 / sizeKb
+        print(
+            f"  junk rows {junk:5d}: {sizeKb:8.1f} KB {duration * 1000:8.2f} ms "
+            f"{usPerKb:7.1f} us/KB peak {peak / 1024:8.1f} KB"
+        )
+        if usPerKb > args.budget:
+            errors.append(f"time budget exceeded: {usPerKb:.1f} us/KB > {args.budget}")
+        if peak > args.alloc_factor * len(payload):
+            errors.append(
+                f"allocation budget exceeded: {peak} bytes > {args.alloc_factor} x {len(payload)}"
+            )
+        if lastTime and duration / lastTime > args.growth:
+            errors.append(
+                f"super linear growth: {duration / lastTime:.2f} x for doubled payload"
+            )
+        lastTime = duration
+    return errors
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=DEF_BUDGET_US_PER_KB)
+    parser.add_argument("--growth", type=float, default=DEF_MAX_GROWTH)
+    parser.add_argument("--alloc-factor", type=float, default=DEF_MAX_ALLOC_FACTOR)
+    args = parser.parse_args()
+
+    seed = args.seed if args.seed is not None else random.randrange(1 << 30)
+    rnd = random.Random(seed)
+    print(f"seed {seed}")
+
+    errors = []
+    for _ in range(args.iterations):
+        errors.extend(fuzzOnce(rnd))
+    errors.extend(checkLearning(rnd))
+    errors.extend(checkHeatpump(rnd))
+    print(f"{args.iterations} mutated payloads checked, {len(errors)} errors")
+    print("performance budgets:")
+    errors.extend(checkBudgets(rnd, args))
+
+    for error in errors[:50]:
+        print("FAIL " + error)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())